@@ -0,0 +1,236 @@
+"""Sales rollups and the admin analytics reads built on them.
+
+Every booking adds to two rollup rows in its own transaction:
+
+- sales_hourly (movie, UTC hour): bookings and seats sold,
+- user_sales (user): bookings and seats bought.
+
+ORM bookings are counted by a `before_flush` listener, and the write-behind
+batcher's Core insert calls `record` itself. The sales_hourly row belongs to
+the movie whose row the booking already locks, so the upsert adds no new
+contention. Reports then read O(buckets) rows instead of scanning bookings.
+
+    python -m app.analytics verify     # compare rollups with raw bookings
+    python -m app.analytics rebuild    # recompute them from raw bookings
+"""
+import argparse
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import DateTime, delete, event, func, insert, select, type_coerce, update
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+
+# (movie_id, user_id, seats, booking_time)
+Sale = Tuple[int, int, int, datetime]
+
+def naive_utc(moment: datetime) -> datetime:
+    # Matching how DateTime columns round-trip on SQLite and Postgres
+    if moment.tzinfo is not None:
+        return moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+def hour_of(moment: datetime) -> datetime:
+    return naive_utc(moment).replace(minute=0, second=0, microsecond=0)
+
+def _upsert(connection, model, keys: Tuple[str, ...], rows: List[dict]) -> None:
+    """Add each row's bookings and seats to the rollup row with the same keys."""
+    table = model.__table__
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + stmt.excluded[name] for name in ("bookings", "seats")}
+        ), rows)
+        return
+    for row in rows:
+        updated = connection.execute(
+            update(table)
+            .where(*(table.c[key] == row[key] for key in keys))
+            .values(bookings=table.c.bookings + row["bookings"], seats=table.c.seats + row["seats"])
+        )
+        if not updated.rowcount:
+            connection.execute(insert(table), row)
+
+def record(connection, sales: Iterable[Sale]) -> None:
+    """Add bookings to the rollups, on the connection of their transaction."""
+    if not settings.ANALYTICS_ROLLUPS_ENABLED:
+        return
+    hourly: Dict[Tuple[int, datetime], List[int]] = defaultdict(lambda: [0, 0])
+    users: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+    for movie_id, user_id, seats, booking_time in sales:
+        for totals in (hourly[movie_id, hour_of(booking_time)], users[user_id]):
+            totals[0] += 1
+            totals[1] += seats
+    if not hourly:
+        return
+    # Sorted, so concurrent transactions take the row locks in the same order
+    _upsert(connection, models.SalesHourly, ("movie_id", "hour"), [
+        {"movie_id": movie_id, "hour": hour, "bookings": bookings, "seats": seats}
+        for (movie_id, hour), (bookings, seats) in sorted(hourly.items())
+    ])
+    _upsert(connection, models.UserSales, ("user_id",), [
+        {"user_id": user_id, "bookings": bookings, "seats": seats}
+        for user_id, (bookings, seats) in sorted(users.items())
+    ])
+
+@event.listens_for(Session, "before_flush")
+def _record_new_bookings(session, flush_context, instances):
+    sales = []
+    for obj in session.new:
+        if isinstance(obj, models.Booking):
+            if obj.booking_time is None:
+                obj.booking_time = datetime.now(timezone.utc)
+            sales.append((obj.movie_id, obj.user_id, obj.seats, obj.booking_time))
+    if sales:
+        record(session.connection(), sales)
+
+# Reads
+
+def sales(db: Session, movie_id: Optional[int] = None, since: Optional[datetime] = None,
+          until: Optional[datetime] = None) -> List[models.SalesHourly]:
+    """Hourly rollup rows, oldest first; `since`/`until` bound the hour."""
+    stmt = select(models.SalesHourly).order_by(models.SalesHourly.hour, models.SalesHourly.movie_id)
+    if movie_id is not None:
+        stmt = stmt.where(models.SalesHourly.movie_id == movie_id)
+    if since is not None:
+        stmt = stmt.where(models.SalesHourly.hour >= hour_of(since))
+    if until is not None:
+        stmt = stmt.where(models.SalesHourly.hour < naive_utc(until))
+    return db.execute(stmt).scalars().all()
+
+def buckets(rows: Iterable[models.SalesHourly], bucket: str) -> List[dict]:
+    """Hourly rows as "hour" or "day" buckets per movie."""
+    totals: Dict[Tuple[datetime, int], List[int]] = defaultdict(lambda: [0, 0])
+    for row in rows:
+        start = row.hour if bucket == "hour" else row.hour.replace(hour=0)
+        totals[start, row.movie_id][0] += row.bookings
+        totals[start, row.movie_id][1] += row.seats
+    return [
+        {"movie_id": movie_id, "start": start, "bookings": bookings, "seats": seats}
+        for (start, movie_id), (bookings, seats) in sorted(totals.items())
+    ]
+
+def top_users(db: Session, limit: int, user_ids: Optional[List[int]] = None) -> List[Tuple[int, int, int]]:
+    """(user_id, bookings, seats), most bookings first; a walk of the bookings index."""
+    stmt = select(models.UserSales.user_id, models.UserSales.bookings, models.UserSales.seats)
+    if user_ids is not None:
+        return [tuple(row) for row in db.execute(stmt.where(models.UserSales.user_id.in_(user_ids)))]
+    stmt = stmt.order_by(models.UserSales.bookings.desc(), models.UserSales.user_id).limit(limit)
+    return [tuple(row) for row in db.execute(stmt)]
+
+def name_users(db: Session, ranked: List[Tuple[int, int, int]]) -> List[dict]:
+    names = dict(db.execute(
+        select(models.User.id, models.User.username).where(models.User.id.in_([row[0] for row in ranked]))
+    ).all())
+    return [
+        {"user_id": user_id, "username": names.get(user_id), "bookings": bookings, "seats": seats}
+        for user_id, bookings, seats in ranked
+    ]
+
+# Verification and rebuilds from raw bookings
+
+def _hour_expression(db: Session):
+    booking_time = models.Booking.booking_time
+    if db.get_bind().dialect.name == "sqlite":
+        # The same text SQLite's DateTime storage format uses for a whole hour
+        return type_coerce(func.strftime("%Y-%m-%d %H:00:00.000000", booking_time), DateTime)
+    return func.date_trunc("hour", booking_time)
+
+def expected_rollups(db: Session, user_ids: Optional[List[int]] = None):
+    """The rollups recomputed from bookings: ({(movie, hour): (b, s)}, {user: (b, s)})."""
+    hourly = {}
+    if user_ids is None:
+        hour = _hour_expression(db).label("hour")
+        hourly = {
+            (movie_id, hour_of(start)): (bookings, seats)
+            for movie_id, start, bookings, seats in db.execute(
+                select(models.Booking.movie_id, hour, func.count(), func.sum(models.Booking.seats))
+                .group_by(models.Booking.movie_id, hour)
+            )
+        }
+    stmt = select(models.Booking.user_id, func.count(), func.sum(models.Booking.seats)).group_by(models.Booking.user_id)
+    if user_ids is not None:
+        stmt = stmt.where(models.Booking.user_id.in_(user_ids))
+    users = {user_id: (bookings, seats) for user_id, bookings, seats in db.execute(stmt)}
+    return hourly, users
+
+def current_rollups(db: Session):
+    hourly = {
+        (row.movie_id, row.hour): (row.bookings, row.seats)
+        for row in db.execute(select(models.SalesHourly)).scalars()
+    }
+    users = {
+        row.user_id: (row.bookings, row.seats)
+        for row in db.execute(select(models.UserSales)).scalars()
+    }
+    return hourly, users
+
+def verify(db: Session) -> Dict[str, int]:
+    """Rollup rows that differ from the raw bookings, per table."""
+    expected, actual = expected_rollups(db), current_rollups(db)
+    return {
+        table: sum(1 for key in want.keys() | have.keys() if want.get(key) != have.get(key))
+        for table, want, have in zip(("sales_hourly", "user_sales"), expected, actual)
+    }
+
+def rebuild(db: Session, user_ids: Optional[List[int]] = None) -> Dict[str, int]:
+    """Replace the rollups (or just these users' rows) with recomputed ones."""
+    hourly, users = expected_rollups(db, user_ids)
+    if user_ids is None:
+        db.execute(delete(models.SalesHourly))
+        db.execute(delete(models.UserSales))
+    else:
+        db.execute(delete(models.UserSales).where(models.UserSales.user_id.in_(user_ids)))
+    if hourly:
+        db.execute(insert(models.SalesHourly), [
+            {"movie_id": movie_id, "hour": hour, "bookings": bookings, "seats": seats}
+            for (movie_id, hour), (bookings, seats) in hourly.items()
+        ])
+    if users:
+        db.execute(insert(models.UserSales), [
+            {"user_id": user_id, "bookings": bookings, "seats": seats}
+            for user_id, (bookings, seats) in users.items()
+        ])
+    db.commit()
+    return {"sales_hourly": len(hourly), "user_sales": len(users)}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verify or rebuild the sales rollups from raw bookings")
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL, or every shard when sharded")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        session_factories = {"database": sessionmaker(bind=create_engine(args.database_url))}
+    else:
+        from .sharding import shards
+        from .database import SessionLocal
+        session_factories = (
+            {f"shard{shard.index}": shard.sessionmaker for shard in shards} if shards
+            else {"database": SessionLocal}
+        )
+
+    results, mismatched = {}, False
+    for name, session_factory in session_factories.items():
+        with session_factory() as db:
+            if args.command == "verify":
+                results[name] = verify(db)
+                mismatched = mismatched or any(results[name].values())
+            else:
+                results[name] = rebuild(db)
+    print(json.dumps(results, indent=2))
+    return 1 if mismatched else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
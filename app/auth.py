@@ -1,35 +1,205 @@
+import asyncio
+import hashlib
+import logging
+import secrets
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Dict, Optional, TYPE_CHECKING
 from fastapi import Depends, HTTPException, status, Response, Cookie
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
 from sqlalchemy.orm import Session
-from . import models, schemas
-from .database import get_db
+from . import models, schemas, instrumentation, passwords
+from .database import get_async_db, primary_db, read_db
 from .config import settings
+from .cache import TTLCache
+from .holds import utcnow
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as described by the token, without a DB row."""
+    id: int
+    username: str
+    is_admin: bool
+
+# Each sync re-reads rows this far back, for transactions that committed late
+# and workers on hosts whose clocks disagree
+REVOCATION_SYNC_OVERLAP_SECONDS = 60
+
+class TokenRevocations:
+    """Denylist of token ids plus per-user token versions.
+
+    Revocations are written to the token_revocations table and applied to
+    this worker as soon as they commit; a background task replays the table
+    every TOKEN_REVOCATION_SYNC_SECONDS, so the other workers follow within
+    that interval. Denied ids are kept only until the token would have
+    expired anyway, and bumping a user's version invalidates every token
+    issued before it.
+    """
+
+    def __init__(self, session_factory=None, interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.interval = interval if interval is not None else settings.TOKEN_REVOCATION_SYNC_SECONDS
+        self._lock = threading.Lock()
+        self._denied: Dict[str, float] = {}
+        self._versions: Dict[int, int] = {}
+        self._synced_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def revoke_token(self, token_id: str, expires_at: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._denied[token_id] = expires_at
+            if len(self._denied) > 1024:
+                self._denied = {k: v for k, v in self._denied.items() if v > now}
+
+    def revoke_user(self, user_id: int, version: Optional[int] = None) -> None:
+        with self._lock:
+            current = self._versions.get(user_id, 0)
+            self._versions[user_id] = current + 1 if version is None else max(current, version)
+
+    def is_revoked(self, token_data: schemas.TokenData) -> bool:
+        if token_data.token_id is not None and token_data.token_id in self._denied:
+            return True
+        return token_data.user_id is not None and token_data.version < self.version(token_data.user_id)
+
+    def record(self, db: Session, expires_at: float, **revocation) -> None:
+        """Add a row to `db`'s transaction, purging rows whose tokens have all expired."""
+        now = utcnow()
+        db.execute(delete(models.TokenRevocation).where(models.TokenRevocation.expires_at <= now))
+        db.add(models.TokenRevocation(
+            created_at=now,
+            expires_at=datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None),
+            **revocation
+        ))
+
+    def sync(self) -> int:
+        """Apply the rows written since the last sync, by any worker."""
+        now = utcnow()
+        query = select(models.TokenRevocation).where(models.TokenRevocation.expires_at > now)
+        if self._synced_at is not None:
+            since = self._synced_at - timedelta(seconds=REVOCATION_SYNC_OVERLAP_SECONDS)
+            query = query.where(models.TokenRevocation.created_at >= since)
+        with self._session_factory()() as db:
+            rows = db.execute(query).scalars().all()
+        for row in rows:
+            if row.token_id is not None:
+                self.revoke_token(row.token_id, row.expires_at.replace(tzinfo=timezone.utc).timestamp())
+            if row.user_id is not None:
+                self.revoke_user(row.user_id, row.version)
+        self._synced_at = now
+        return len(rows)
+
+    def _session_factory(self):
+        if self.session_factory is not None:
+            return self.session_factory
+        from .database import SessionLocal
+        return SessionLocal
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await run_in_threadpool(self.sync)
+            except Exception:
+                logger.exception("Token revocation sync failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._denied.clear()
+            self._versions.clear()
+            self._synced_at = None
+
+revocations = TokenRevocations()
+
+# Decoded tokens and the principal they resolved to, keyed by token digest
+# and expiring with the token itself
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE)
+
 def verify_password(plain_password: str, stored_password: str) -> bool:
-    return plain_password == stored_password
+    return passwords.verify(plain_password, stored_password)
 
 def get_password_hash(password: str) -> str:
-    return password
+    return passwords.pool.call(passwords.hash_password, password)
+
+def _find_user(db: Session, username: str) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.username == username).first()
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[models.User]:
-    user = db.query(models.User).filter(models.User.username == username).first()
+    user = _find_user(db, username)
     if not user or not verify_password(password, user.password):
         return None
     return user
 
+def _store_password(db: Session, user: models.User, hashed_password: str) -> None:
+    user.password = hashed_password
+    db.commit()
+    db.refresh(user)
+
+async def authenticate(db, username: str, password: str) -> Optional[models.User]:
+    """Login check that never blocks the event loop: the query runs on the
+    threadpool (or AsyncSession) and hashing on the bounded password pool."""
+    is_async = hasattr(db, "run_sync")
+    if is_async:
+        result = await db.execute(select(models.User).where(models.User.username == username))
+        user = result.scalars().first()
+    else:
+        user = await run_in_threadpool(_find_user, db, username)
+
+    if user is None:
+        await passwords.pool.run(passwords.verify, password, passwords.dummy_hash())
+        return None
+    if not await passwords.pool.run(passwords.verify, password, user.password):
+        return None
+
+    if passwords.needs_rehash(user.password):
+        hashed_password = await passwords.pool.run(passwords.hash_password, password)
+        if is_async:
+            user.password = hashed_password
+            await db.commit()
+            await db.refresh(user)
+        else:
+            await run_in_threadpool(_store_password, db, user, hashed_password)
+    return user
+
 def create_access_token(data: dict, user_is_admin: bool) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({
         "exp": expire,
         "is_admin": user_is_admin,
-        "iat": datetime.now(timezone.utc)
+        "iat": datetime.now(timezone.utc),
+        "jti": secrets.token_urlsafe(12)
     })
+    if "uid" in to_encode:
+        to_encode.setdefault("ver", revocations.version(to_encode["uid"]))
+    # python-jose loads cryptography (~50 ms), so it is imported with the first token
+    from jose import jwt
     encoded_jwt = jwt.encode(
         to_encode,
         settings.SECRET_KEY,
@@ -47,16 +217,14 @@ def set_auth_cookie(response: Response, token: str) -> None:
         max_age=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
     )
 
-def get_current_user(
-    access_token: str = Cookie(None),
-    db: Session = Depends(get_db)
-) -> models.User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid authentication credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+def decode_access_token(access_token: Optional[str]) -> schemas.TokenData:
     if not access_token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,29 +232,137 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    from jose import JWTError, jwt
     try:
-        payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with instrumentation.phase("jwt"):
+            payload = jwt.decode(access_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = schemas.TokenData(
             username=username,
-            is_admin=payload.get("is_admin", False)
+            is_admin=payload.get("is_admin", False),
+            user_id=payload.get("uid"),
+            token_id=payload.get("jti"),
+            version=payload.get("ver", 0),
+            expires_at=payload.get("exp")
         )
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    if revocations.is_revoked(token_data):
+        raise _credentials_exception()
+    return token_data
+
+def revoke_access_token(db: Session, access_token: Optional[str]) -> None:
+    try:
+        token_data = decode_access_token(access_token)
+    except HTTPException:
+        return
+    if token_data.token_id is not None:
+        expires_at = token_data.expires_at or time.time()
+        revocations.record(db, expires_at, token_id=token_data.token_id)
+        db.commit()
+        revocations.revoke_token(token_data.token_id, expires_at)
+    token_cache.pop(_token_key(access_token))
+
+def revoke_user_tokens(db: Session, user_id: int) -> bool:
+    """Invalidate every token issued to `user_id` so far; False if there is no such user."""
+    result = db.execute(
+        update(models.User)
+        .where(models.User.id == user_id)
+        .values(token_version=models.User.token_version + 1)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        return False
+    version = db.execute(select(models.User.token_version).where(models.User.id == user_id)).scalar_one()
+    # Tokens issued before now expire within one token lifetime
+    revocations.record(db, time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60, user_id=user_id, version=version)
+    db.commit()
+    revocations.revoke_user(user_id, version)
+    return True
+
+def _token_key(access_token: str) -> bytes:
+    return hashlib.sha256(access_token.encode()).digest()
+
+def _cached_principal(access_token: Optional[str]) -> Optional[Principal]:
+    if not access_token or token_cache.maxsize <= 0:
+        return None
+    entry = token_cache.get(_token_key(access_token))
+    if entry is None:
+        return None
+    token_data, principal = entry
+    if revocations.is_revoked(token_data):
+        token_cache.pop(_token_key(access_token))
+        raise _credentials_exception()
+    return principal
+
+def _cache_principal(access_token: str, token_data: schemas.TokenData, principal: Principal) -> None:
+    if token_data.expires_at is not None:
+        token_cache.set(_token_key(access_token), (token_data, principal), token_data.expires_at)
+
+def _stateless_principal(access_token: str, token_data: schemas.TokenData) -> Optional[Principal]:
+    if not settings.AUTH_STATELESS or token_data.user_id is None:
+        return None
+    principal = Principal(id=token_data.user_id, username=token_data.username, is_admin=token_data.is_admin)
+    _cache_principal(access_token, token_data, principal)
+    return principal
+
+def get_current_user(
+    access_token: str = Cookie(None),
+    db: Session = Depends(read_db)
+) -> models.User:
+    principal = _cached_principal(access_token)
+    if principal is not None:
+        return principal
+
+    token_data = decode_access_token(access_token)
+    principal = _stateless_principal(access_token, token_data)
+    if principal is not None:
+        return principal
 
     user = db.query(models.User).filter(
         models.User.username == token_data.username
     ).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     user.is_admin = token_data.is_admin
+    _cache_principal(access_token, token_data, Principal(id=user.id, username=user.username, is_admin=user.is_admin))
     return user
 
+async def get_current_user_async(
+    access_token: str = Cookie(None),
+    db: "AsyncSession" = Depends(get_async_db)
+) -> models.User:
+    principal = _cached_principal(access_token)
+    if principal is not None:
+        return principal
+
+    token_data = decode_access_token(access_token)
+    principal = _stateless_principal(access_token, token_data)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(models.User).where(models.User.username == token_data.username)
+    )
+    user = result.scalars().first()
+    if user is None:
+        raise _credentials_exception()
+
+    user.is_admin = token_data.is_admin
+    _cache_principal(access_token, token_data, Principal(id=user.id, username=user.username, is_admin=user.is_admin))
+    return user
+
+# Dependencies used by the routes. Token lookups share the route's read
+# session, so a request holds one connection either way
+auth_db = primary_db
+current_user = get_current_user_async if read_db is get_async_db else get_current_user
+
 def get_current_admin_user(
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(current_user)
 ) -> models.User:
     if not current_user.is_admin:
         raise HTTPException(
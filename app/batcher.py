@@ -0,0 +1,241 @@
+"""Write-behind booking: group concurrent bookings into one transaction.
+
+With BOOKING_BATCH_ENABLED, POST /movies/{id}/book queues the request and
+awaits a future. Every BOOKING_BATCH_WINDOW_MS the batcher takes up to
+BOOKING_BATCH_MAX_SIZE queued requests and, in a single transaction:
+
+- reserves each showtime's seats with one conditional UPDATE for the whole
+  group, falling back to first-come first-fit when the group does not fit,
+- claims best seats per booking on showtimes with a seat map,
+- inserts all bookings with one executemany and commits once.
+
+Each future then gets its own booking or its own HTTPException, exactly
+as the per-request path would have answered. Only one batch is in flight
+at a time; requests arriving meanwhile form the next batch.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from . import models, schemas, analytics, catalogue, seatmap, sharding
+from . import booking as booking_engine
+from .config import settings
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+MAX_RESERVE_ATTEMPTS = 3
+
+batch_size = REGISTRY.histogram(
+    "booking_batch_size", "Bookings per write-behind batch", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+batch_seconds = REGISTRY.histogram("booking_batch_seconds", "Time to apply and commit one booking batch")
+
+@dataclass
+class BookingRequest:
+    user_id: int
+    movie_id: int
+    seats: int
+    future: Optional[asyncio.Future] = None
+
+Outcome = Union[schemas.Booking, HTTPException]
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Showtime is busy, please retry"
+    )
+
+def reserve_group(db: Session, movie_id: int, requests: List[BookingRequest]):
+    """Take seats for as many requests as fit, in arrival order.
+
+    Returns (accepted positions, {position: error}, has seat map).
+    """
+    row = booking_engine.reserve(db, movie_id, sum(request.seats for request in requests))
+    if row is not None:
+        return list(range(len(requests))), {}, row[1]
+
+    for _ in range(MAX_RESERVE_ATTEMPTS):
+        available = db.execute(
+            select(models.Movie.available_seats).where(models.Movie.id == movie_id)
+        ).scalar_one_or_none()
+        if available is None:
+            return [], {i: booking_engine.unavailable_error(db, movie_id) for i in range(len(requests))}, False
+
+        remaining, accepted, errors = available, [], {}
+        for i, request in enumerate(requests):
+            if request.seats <= remaining:
+                accepted.append(i)
+                remaining -= request.seats
+            else:
+                errors[i] = HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Only {remaining} seats available"
+                )
+        if not accepted:
+            return [], errors, False
+        row = booking_engine.reserve(db, movie_id, sum(requests[i].seats for i in accepted))
+        if row is not None:
+            return accepted, errors, row[1]
+        # Another worker took seats between the read and the update
+    return [], {i: _busy() for i in range(len(requests))}, False
+
+def apply_batch(db: Session, batch: List[BookingRequest]) -> List[Outcome]:
+    outcomes: Dict[int, Outcome] = {}
+    by_movie = defaultdict(list)
+    for index, request in enumerate(batch):
+        by_movie[request.movie_id].append(index)
+
+    booked = []
+    labels: Dict[int, str] = {}
+    seated_movies = set()
+    for movie_id, indexes in by_movie.items():
+        accepted, errors, has_seat_map = reserve_group(db, movie_id, [batch[i] for i in indexes])
+        for position, error in errors.items():
+            outcomes[indexes[position]] = error
+        for position in accepted:
+            index = indexes[position]
+            if has_seat_map:
+                seated_movies.add(movie_id)
+                seats = batch[index].seats
+                try:
+                    labels[index] = ",".join(
+                        booking_engine.claim_or_release(db, movie_id, seats, seatmap.choose_best(seats))
+                    )
+                except HTTPException as exc:
+                    outcomes[index] = exc
+                    continue
+            booked.append(index)
+
+    if booked:
+        booking_time = datetime.now(timezone.utc).replace(tzinfo=None)
+        params = [
+            {"user_id": batch[i].user_id, "movie_id": batch[i].movie_id, "seats": batch[i].seats,
+             "booking_time": booking_time, "seat_labels": labels.get(i)}
+            for i in booked
+        ]
+        sharding.assign_ids(db, "bookings", params)
+        ids = db.execute(
+            insert(models.Booking).returning(models.Booking.id, sort_by_parameter_order=True), params
+        ).scalars().all()
+        for index, booking_id, values in zip(booked, ids, params):
+            outcomes[index] = schemas.Booking(**{**values, "id": booking_id})
+        analytics.record(db.connection(), [
+            (values["movie_id"], values["user_id"], values["seats"], booking_time) for values in params
+        ])
+    db.commit()
+    if booked:
+        catalogue.invalidate()
+    for movie_id in seated_movies:
+        seatmap.forget(movie_id)
+    return [outcomes[i] for i in range(len(batch))]
+
+class BookingBatcher:
+    def __init__(self, session_factory=None, window: Optional[float] = None, max_size: Optional[int] = None):
+        self.session_factory = session_factory
+        self.window = window if window is not None else settings.BOOKING_BATCH_WINDOW_MS / 1000
+        self.max_size = max_size or settings.BOOKING_BATCH_MAX_SIZE
+        self._queue: List[BookingRequest] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def _session_factory(self):
+        if self.session_factory is None:
+            from .database import SessionLocal
+            return SessionLocal
+        return self.session_factory
+
+    def _apply(self, batch: List[BookingRequest]) -> List[Outcome]:
+        if sharding.shards and self.session_factory is None:
+            return self._apply_sharded(batch)
+        with self._session_factory()() as db:
+            try:
+                return apply_batch(db, batch)
+            except Exception:
+                db.rollback()
+                raise
+
+    def _apply_sharded(self, batch: List[BookingRequest]) -> List[Outcome]:
+        # One transaction per owning shard
+        outcomes: List[Optional[Outcome]] = [None] * len(batch)
+        by_shard = defaultdict(list)
+        with sharding.shards.primary_session() as primary:
+            for index, request in enumerate(batch):
+                try:
+                    by_shard[sharding.shards.owner(primary, request.movie_id)].append(index)
+                except HTTPException as exc:
+                    outcomes[index] = exc
+        for shard, indexes in by_shard.items():
+            with sharding.shards[shard].session() as db:
+                try:
+                    results = apply_batch(db, [batch[i] for i in indexes])
+                except Exception:
+                    db.rollback()
+                    raise
+            for index, outcome in zip(indexes, results):
+                outcomes[index] = outcome
+        return outcomes
+
+    async def book(self, user_id: int, movie_id: int, seats: int) -> schemas.Booking:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self.start()
+        request = BookingRequest(user_id, movie_id, seats, loop.create_future())
+        self._queue.append(request)
+        self._wakeup.set()
+        return await request.future
+
+    async def _flush(self, batch: List[BookingRequest]) -> None:
+        start = asyncio.get_running_loop().time()
+        try:
+            outcomes = await run_in_threadpool(self._apply, batch)
+        except Exception as exc:
+            logger.exception("Booking batch of %d failed", len(batch))
+            outcomes = [exc] * len(batch)
+        batch_size.observe(len(batch))
+        batch_seconds.observe(asyncio.get_running_loop().time() - start)
+        for request, outcome in zip(batch, outcomes):
+            if request.future.done():
+                continue
+            if isinstance(outcome, Exception):
+                request.future.set_exception(outcome)
+            else:
+                request.future.set_result(outcome)
+
+    async def _drain(self) -> None:
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_size], self._queue[self.max_size:]
+            await self._flush(batch)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await self._wakeup.wait()
+            # Let concurrent requests join the batch
+            await asyncio.sleep(self.window)
+            await self._drain()
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Finish queued bookings rather than dropping their futures
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+        self._task = None
+        self._loop = None
+
+batcher = BookingBatcher()
@@ -0,0 +1,104 @@
+from typing import List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import update, select, exists
+from sqlalchemy.orm import Session
+from . import models, catalogue, seatmap, live
+
+def reserve(db: Session, movie_id: int, seats: int):
+    """Conditional decrement returning (seats left, has seat map), or None."""
+    row = db.execute(
+        update(models.Movie)
+        .where(models.Movie.id == movie_id, models.Movie.available_seats >= seats)
+        .values(available_seats=models.Movie.available_seats - seats)
+        .returning(
+            models.Movie.available_seats,
+            exists().where(models.SeatMap.movie_id == models.Movie.id)
+        )
+    ).first()
+    if row is not None:
+        live.stage(db, movie_id, row[0])
+    return row
+
+def reserve_seats(db: Session, movie_id: int, seats: int) -> Optional[int]:
+    """Atomically take `seats` from a movie, returning the seats left or None.
+
+    The availability check and the decrement happen in one conditional UPDATE,
+    so concurrent buyers can never oversell and no row lock is held across a
+    Python round trip.
+    """
+    row = reserve(db, movie_id, seats)
+    return None if row is None else row[0]
+
+def unavailable_error(db: Session, movie_id: int) -> HTTPException:
+    available = db.execute(
+        select(models.Movie.available_seats).where(models.Movie.id == movie_id)
+    ).scalar_one_or_none()
+    if available is None:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Movie not found"
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Only {available} seats available"
+    )
+
+def _commit_booking(db: Session, user_id: int, movie_id: int, seats: int,
+                    labels: Optional[List[str]] = None) -> models.Booking:
+    db_booking = models.Booking(
+        user_id=user_id,
+        movie_id=movie_id,
+        seats=seats,
+        seat_labels=",".join(labels) if labels else None
+    )
+    db.add(db_booking)
+    db.commit()
+    db.refresh(db_booking)
+    catalogue.invalidate()
+    return db_booking
+
+def release_seats(db: Session, movie_id: int, seats: int) -> None:
+    available = db.execute(
+        update(models.Movie)
+        .where(models.Movie.id == movie_id)
+        .values(available_seats=models.Movie.available_seats + seats)
+        .returning(models.Movie.available_seats)
+    ).scalar_one_or_none()
+    if available is not None:
+        live.stage(db, movie_id, available)
+
+def claim_or_release(db: Session, movie_id: int, seats: int, choose) -> List[str]:
+    try:
+        return seatmap.claim(db, movie_id, choose)
+    except HTTPException:
+        # Hand the reserved count back instead of rolling back, so the
+        # caller's session stays usable
+        release_seats(db, movie_id, seats)
+        raise
+
+def book_seats(db: Session, user_id: int, movie_id: int, seats: int) -> models.Booking:
+    row = reserve(db, movie_id, seats)
+    if row is None:
+        raise unavailable_error(db, movie_id)
+
+    has_seat_map = row[1]
+    labels = None
+    if has_seat_map:
+        # Count-only bookings on a seated showtime get the best seats together
+        labels = claim_or_release(db, movie_id, seats, seatmap.choose_best(seats))
+
+    db_booking = _commit_booking(db, user_id, movie_id, seats, labels)
+    if has_seat_map:
+        seatmap.forget(movie_id)
+    return db_booking
+
+def book_specific_seats(db: Session, user_id: int, movie_id: int, labels: List[str]) -> models.Booking:
+    # Taking the seat count first locks the movie row, so concurrent buyers of
+    # this showtime queue behind it and the seat map CAS rarely has to retry
+    if reserve(db, movie_id, len(labels)) is None:
+        raise unavailable_error(db, movie_id)
+    claimed = claim_or_release(db, movie_id, len(labels), seatmap.choose_labels(labels))
+
+    db_booking = _commit_booking(db, user_id, movie_id, len(labels), claimed)
+    seatmap.forget(movie_id)
+    return db_booking
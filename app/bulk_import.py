@@ -0,0 +1,202 @@
+"""Bulk movie import from NDJSON or CSV.
+
+    python -m app.bulk_import schedule.csv
+    python -m app.bulk_import schedule.ndjson --batch-size 5000
+
+Rows are validated against schemas.MovieCreate and inserted in chunked
+transactions: executemany everywhere, COPY on PostgreSQL.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from typing import AsyncIterable, Iterable, Iterator, List, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from . import models, schemas, catalogue, sharding
+
+MAX_REPORTED_ERRORS = 1000
+COLUMNS = ("title", "showtime", "available_seats")
+
+def detect_format(content_type: Optional[str], filename: str = "") -> str:
+    if (content_type and "csv" in content_type) or filename.endswith(".csv"):
+        return "csv"
+    return "ndjson"
+
+class RowParser:
+    """Turns raw text lines into (line number, row dict) pairs.
+
+    CSV input is parsed line by line, so quoted fields may not span lines.
+    """
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.line_no = 0
+        self.header: Optional[List[str]] = None
+
+    def parse(self, line: str) -> Optional[Tuple[int, object]]:
+        self.line_no += 1
+        if not line.strip():
+            return None
+        if self.fmt == "csv":
+            values = next(csv.reader([line]))
+            if self.header is None:
+                self.header = [name.strip() for name in values]
+                return None
+            return self.line_no, dict(zip(self.header, values))
+        try:
+            return self.line_no, json.loads(line)
+        except ValueError as exc:
+            return self.line_no, exc
+
+    def parse_bytes(self, line: bytes) -> Optional[Tuple[int, object]]:
+        try:
+            text = line.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            self.line_no += 1
+            return self.line_no, exc
+        return self.parse(text.rstrip("\r"))
+
+class MovieImporter:
+    def __init__(self, db: Session, batch_size: int = 1000):
+        self.db = db
+        self.batch_size = batch_size
+        self.report = schemas.ImportReport()
+        self._batch: List[dict] = []
+        self._batch_rows: List[int] = []
+
+    def _error(self, row: int, error: str, count: int = 1) -> None:
+        self.report.failed += count
+        if len(self.report.errors) < MAX_REPORTED_ERRORS:
+            self.report.errors.append(schemas.ImportRowError(row=row, error=error))
+
+    def add(self, row_no: int, row) -> None:
+        if isinstance(row, UnicodeDecodeError):
+            self._error(row_no, f"Invalid UTF-8: {row}")
+            return
+        if isinstance(row, Exception):
+            self._error(row_no, f"Invalid JSON: {row}")
+            return
+        try:
+            movie = schemas.MovieCreate.model_validate(row)
+        except ValidationError as exc:
+            self._error(row_no, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors()
+            ))
+            return
+        self._batch.append(movie.model_dump())
+        self._batch_rows.append(row_no)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, rows: Iterable[Tuple[int, object]]) -> None:
+        for row_no, row in rows:
+            self.add(row_no, row)
+
+    def flush(self) -> None:
+        if not self._batch:
+            return
+        batch, rows = self._batch, self._batch_rows
+        self._batch, self._batch_rows = [], []
+        try:
+            if sharding.shards:
+                sharding.insert_movies(self.db, batch)
+            elif self.db.get_bind().dialect.name == "postgresql":
+                self._copy(batch)
+            else:
+                self.db.execute(insert(models.Movie), batch)
+            self.db.commit()
+        except Exception as exc:
+            self.db.rollback()
+            self._error(rows[0], f"Rows {rows[0]}-{rows[-1]} not inserted: {exc}", count=len(batch))
+            return
+        self.report.inserted += len(batch)
+
+    def _copy(self, batch: List[dict]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for movie in batch:
+            writer.writerow([movie[column] for column in COLUMNS])
+        buffer.seek(0)
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY movies ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        finally:
+            cursor.close()
+
+    def finish(self) -> schemas.ImportReport:
+        self.flush()
+        if self.report.inserted:
+            catalogue.invalidate()
+        return self.report
+
+def iter_rows(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    parser = RowParser(fmt)
+    for line in lines:
+        parsed = parser.parse(line)
+        if parsed is not None:
+            yield parsed
+
+async def import_stream(importer: MovieImporter, chunks: AsyncIterable[bytes], fmt: str) -> schemas.ImportReport:
+    # Parse on the event loop, validate and insert each batch on the threadpool
+    parser = RowParser(fmt)
+    rows: List[Tuple[int, object]] = []
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            parsed = parser.parse_bytes(line)
+            if parsed is not None:
+                rows.append(parsed)
+        if len(rows) >= importer.batch_size:
+            await run_in_threadpool(importer.add_many, rows)
+            rows = []
+    parsed = parser.parse_bytes(pending)
+    if parsed is not None:
+        rows.append(parsed)
+    await run_in_threadpool(importer.add_many, rows)
+    return await run_in_threadpool(importer.finish)
+
+def import_file(db: Session, path: str, fmt: Optional[str] = None, batch_size: int = 1000) -> schemas.ImportReport:
+    importer = MovieImporter(db, batch_size=batch_size)
+    with open(path, newline="", encoding="utf-8") as handle:
+        importer.add_many(iter_rows(handle, fmt or detect_format(None, path)))
+    return importer.finish()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import movies from NDJSON or CSV")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL")
+    args = parser.parse_args(argv)
+
+    from .database import Base, SessionLocal, engine
+    if args.database_url:
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        engine = create_engine(args.database_url)
+        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine, tables=[models.Movie.__table__])
+
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        report = import_file(db, args.path, args.format, args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        **report.model_dump(),
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round((report.inserted + report.failed) / elapsed, 1) if elapsed else None,
+    }, indent=2))
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
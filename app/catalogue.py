@@ -0,0 +1,110 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from fastapi import Response, status
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from . import models, schemas, serialization
+from .cache import TTLCache
+from .config import settings
+from .pagination import encode_cursor, decode_cursor
+
+# Columns in schemas.Movie field order, encoded without building ORM objects
+MOVIE_FIELDS = serialization.fields(schemas.Movie)
+MOVIE_COLUMNS = [getattr(models.Movie, name) for name in MOVIE_FIELDS]
+
+@dataclass(frozen=True)
+class MovieQuery:
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    title: Optional[str] = None
+    starts_after: Optional[datetime] = None
+    starts_before: Optional[datetime] = None
+    has_seats: Optional[bool] = None
+
+class CatalogueCache:
+    """Rendered /movies pages keyed by (catalogue version, query).
+
+    Any write to movies bumps the version, which orphans every cached page at
+    once. Entries also expire after CATALOGUE_CACHE_TTL_SECONDS because seats
+    booked through other worker processes do not bump this process' version.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._lock = threading.Lock()
+        self._pages = TTLCache(maxsize)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+
+    def get(self, query: MovieQuery):
+        return self._pages.get((self.version, query))
+
+    def set(self, version: int, query: MovieQuery, page) -> None:
+        self._pages.set((version, query), page, time.time() + self.ttl)
+
+    def clear(self) -> None:
+        self._pages.clear()
+
+cache = CatalogueCache(settings.CATALOGUE_CACHE_SIZE, settings.CATALOGUE_CACHE_TTL_SECONDS)
+
+def invalidate() -> None:
+    cache.invalidate()
+
+def fetch_movies(db: Session, query: MovieQuery):
+    stmt = select(*MOVIE_COLUMNS).order_by(models.Movie.showtime, models.Movie.id)
+    if query.title:
+        stmt = stmt.where(models.Movie.title.startswith(query.title, autoescape=True))
+    if query.starts_after is not None:
+        stmt = stmt.where(models.Movie.showtime >= query.starts_after)
+    if query.starts_before is not None:
+        stmt = stmt.where(models.Movie.showtime < query.starts_before)
+    if query.has_seats is not None:
+        stmt = stmt.where(
+            models.Movie.available_seats > 0 if query.has_seats else models.Movie.available_seats <= 0
+        )
+    if query.cursor:
+        stmt = stmt.where(
+            tuple_(models.Movie.showtime, models.Movie.id) > tuple_(*decode_cursor(query.cursor))
+        )
+    if query.limit is None:
+        return db.execute(stmt).all(), None
+
+    movies = db.execute(stmt.limit(query.limit + 1)).all()
+    if len(movies) > query.limit:
+        movies = movies[:query.limit]
+        return movies, encode_cursor(movies[-1].showtime, movies[-1].id)
+    return movies, None
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def _response(page, if_none_match: Optional[str]) -> Response:
+    body, etag, next_cursor = page
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return serialization.JSONBytesResponse(content=body, headers=headers)
+
+def render(db: Session, query: MovieQuery, if_none_match: Optional[str] = None, fetch=fetch_movies) -> Response:
+    # Unchanged polls are answered from the cache without a query or serialization
+    page = cache.get(query)
+    if page is None:
+        version = cache.version
+        movies, next_cursor = fetch(db, query)
+        body = serialization.rows_json(movies, MOVIE_FIELDS)
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        page = (body, etag, next_cursor)
+        cache.set(version, query, page)
+    return _response(page, if_none_match)
@@ -12,14 +12,112 @@ load_dotenv(dotenv_path=dotenv_path)
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    # Connection pool (per worker process)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    # Set when DATABASE_URL points at pgbouncer/Supavisor in transaction mode:
+    # disables client-side pooling and prepared statement caches
+    DB_EXTERNAL_POOLER: bool = os.getenv("DB_EXTERNAL_POOLER", "False").lower() == "true"
+    # Serve auth, catalogue, booking and history routes through an AsyncSession
+    # (aiosqlite/asyncpg) instead of the blocking engine; ignored when sharded
+    DB_ASYNC: bool = os.getenv("DB_ASYNC", "False").lower() == "true"
+    # Comma-separated read replica URLs; read-only routes use them once set
+    DB_REPLICA_URLS: str = os.getenv("DB_REPLICA_URLS", "")
+    # Reads go to the primary for this long after a client's write
+    DB_REPLICA_PIN_SECONDS: float = float(os.getenv("DB_REPLICA_PIN_SECONDS", "10"))
+    DB_REPLICA_HEALTH_INTERVAL_SECONDS: float = float(os.getenv("DB_REPLICA_HEALTH_INTERVAL_SECONDS", "5"))
+    DB_REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+    # Comma-separated shard URLs; each showtime and its bookings live on one
+    DB_SHARD_URLS: str = os.getenv("DB_SHARD_URLS", "")
+    DB_SHARD_PLACEMENT_TTL_SECONDS: float = float(os.getenv("DB_SHARD_PLACEMENT_TTL_SECONDS", "5"))
+    # Schema step at startup: create_all (missing tables only), migrate
+    # (alembic upgrade head) or none (app.serve runs it once before forking)
+    DB_SCHEMA_SETUP: str = os.getenv("DB_SCHEMA_SETUP", "create_all")
 
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "simple-secret-key")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Password hashing: "scrypt" or "pbkdf2_sha256". Raising a cost only affects new
+    # hashes; older ones are upgraded on the next successful login
+    PASSWORD_HASH_SCHEME: str = os.getenv("PASSWORD_HASH_SCHEME", "scrypt")
+    PASSWORD_SCRYPT_N: int = int(os.getenv("PASSWORD_SCRYPT_N", "16384"))
+    PASSWORD_SCRYPT_R: int = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+    PASSWORD_SCRYPT_P: int = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+    PASSWORD_PBKDF2_ITERATIONS: int = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", "600000"))
+    # Hashing threads per worker process, and how many hashes may wait before 503s
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+    # Token-bucket limits on the auth endpoints, as "requests/seconds"
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_LOGIN_PER_IP: str = os.getenv("RATE_LIMIT_LOGIN_PER_IP", "20/60")
+    RATE_LIMIT_LOGIN_PER_USERNAME: str = os.getenv("RATE_LIMIT_LOGIN_PER_USERNAME", "5/60")
+    RATE_LIMIT_SIGNUP_PER_IP: str = os.getenv("RATE_LIMIT_SIGNUP_PER_IP", "5/60")
+    # "memory" (per worker) or "redis" (shared, needs the redis package)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    RATE_LIMIT_SHARDS: int = int(os.getenv("RATE_LIMIT_SHARDS", "16"))
+    # Take the client IP from X-Forwarded-For; only behind a trusted proxy
+    RATE_LIMIT_TRUST_FORWARDED: bool = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "False").lower() == "true"
+    # Trust the user id and admin claim in the token instead of loading the user row
+    AUTH_STATELESS: bool = os.getenv("AUTH_STATELESS", "False").lower() == "true"
+    # Decoded tokens cached in-process until they expire; 0 disables the cache
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    # How often each worker picks up logouts and revocations made by the others
+    TOKEN_REVOCATION_SYNC_SECONDS: float = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
+
+    # Movie catalogue cache
+    CATALOGUE_CACHE_SIZE: int = int(os.getenv("CATALOGUE_CACHE_SIZE", "256"))
+    CATALOGUE_CACHE_TTL_SECONDS: float = float(os.getenv("CATALOGUE_CACHE_TTL_SECONDS", "5"))
+    CATALOGUE_MAX_PAGE_SIZE: int = int(os.getenv("CATALOGUE_MAX_PAGE_SIZE", "500"))
+    SEAT_MAP_CACHE_SIZE: int = int(os.getenv("SEAT_MAP_CACHE_SIZE", "1024"))
+    SEAT_MAP_CACHE_TTL_SECONDS: float = float(os.getenv("SEAT_MAP_CACHE_TTL_SECONDS", "2"))
+    # Seat holds while a customer pays
+    HOLD_TTL_SECONDS: int = int(os.getenv("HOLD_TTL_SECONDS", "600"))
+    HOLD_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("HOLD_SWEEP_INTERVAL_SECONDS", "30"))
+    HOLD_SWEEP_BATCH_SIZE: int = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", "500"))
+    # Write-behind bookings: queue POST /movies/{id}/book and commit in batches
+    BOOKING_BATCH_ENABLED: bool = os.getenv("BOOKING_BATCH_ENABLED", "False").lower() == "true"
+    BOOKING_BATCH_WINDOW_MS: float = float(os.getenv("BOOKING_BATCH_WINDOW_MS", "5"))
+    BOOKING_BATCH_MAX_SIZE: int = int(os.getenv("BOOKING_BATCH_MAX_SIZE", "256"))
+    HISTORY_MAX_PAGE_SIZE: int = int(os.getenv("HISTORY_MAX_PAGE_SIZE", "500"))
+    # Sales rollups updated in each booking's transaction, for /admin/analytics
+    ANALYTICS_ROLLUPS_ENABLED: bool = os.getenv("ANALYTICS_ROLLUPS_ENABLED", "True").lower() == "true"
+    ANALYTICS_TOP_USERS_MAX: int = int(os.getenv("ANALYTICS_TOP_USERS_MAX", "100"))
+    # Idempotency-Key replays for booking, signup and movie creation
+    IDEMPOTENCY_ENABLED: bool = os.getenv("IDEMPOTENCY_ENABLED", "True").lower() == "true"
+    IDEMPOTENCY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+    IDEMPOTENCY_CACHE_SIZE: int = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+    # How long an unfinished claim blocks retries; a crashed request's key frees up after it
+    IDEMPOTENCY_CLAIM_LEASE_SECONDS: int = int(os.getenv("IDEMPOTENCY_CLAIM_LEASE_SECONDS", "60"))
+    # Live seat counts over SSE/WebSocket, per worker
+    LIVE_MAX_SUBSCRIBERS: int = int(os.getenv("LIVE_MAX_SUBSCRIBERS", "20000"))
+    LIVE_MAX_MOVIES: int = int(os.getenv("LIVE_MAX_MOVIES", "100"))
+    LIVE_COALESCE_MS: float = float(os.getenv("LIVE_COALESCE_MS", "100"))
+    LIVE_KEEPALIVE_SECONDS: float = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
 
     # Server
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    # Per-request timing middleware; with DEBUG it also sends Server-Timing headers
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    # Admin sampling profiler (off unless enabled) and slow-query log (0 disables)
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILE_MAX_SECONDS: float = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+    SLOW_QUERY_MS: float = float(os.getenv("SLOW_QUERY_MS", "100"))
+    SLOW_QUERY_LOG_SIZE: int = int(os.getenv("SLOW_QUERY_LOG_SIZE", "200"))
+    # Production launcher (python -m app.serve); 0 workers means one per CPU.
+    # Keep-alive outlasts a load balancer's idle timeout (60 s on most)
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "0"))
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+    SERVER_KEEPALIVE_SECONDS: int = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "75"))
+    SERVER_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    SERVER_ACCESS_LOG: bool = os.getenv("SERVER_ACCESS_LOG", "False").lower() == "true"
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000"]
 
     # Admin
@@ -1,15 +1,311 @@
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from typing import List, Optional
+from fastapi import Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.requests import HTTPConnection
 from .config import settings
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+pool_checkout_seconds = REGISTRY.histogram(
+    "db_pool_checkout_seconds", "Time spent waiting to check a connection out of the pool", ["pool"]
+)
+pool_overflow_total = REGISTRY.counter(
+    "db_pool_overflow_total", "Checkouts that opened an overflow connection beyond pool_size", ["pool"]
+)
+pool_timeouts_total = REGISTRY.counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT", ["pool"]
+)
+pool_connections_in_use = REGISTRY.gauge(
+    "db_pool_connections_in_use", "Connections currently checked out", ["pool"]
+)
+
+class InstrumentedPoolMixin:
+    """Times every checkout, records overflow and timeout events, and counts
+    connections in use, all under the pool's `metrics_label`."""
+    metrics_label = "primary"
+
+    def _do_get(self):
+        overflow_before = self._overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts_total.inc(pool=self.metrics_label)
+            raise
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - start, pool=self.metrics_label)
+        if self._overflow > overflow_before and self._overflow > 0:
+            pool_overflow_total.inc(pool=self.metrics_label)
+        pool_connections_in_use.inc(pool=self.metrics_label)
+        return connection
+
+    def _do_return_conn(self, record):
+        pool_connections_in_use.dec(pool=self.metrics_label)
+        super()._do_return_conn(record)
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+
+    if settings.DB_EXTERNAL_POOLER:
+        # pgbouncer-style transaction pooling: the pooler owns the connections,
+        # and server-side prepared statements cannot survive between transactions
+        options = {"poolclass": NullPool}
+        if is_async and backend == "postgresql":
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def create_labelled_engine(url: str, label: str):
+    """An engine for another database whose pool metrics carry `label`."""
+    options = engine_options(url)
+    if options.get("poolclass") is InstrumentedQueuePool:
+        options["poolclass"] = type("LabelledQueuePool", (InstrumentedQueuePool,), {"metrics_label": label})
+    return create_engine(url, **options)
 
-# Create database engine
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
+# The primary engine is built on first use rather than at import, so a cold
+# start does not load the database driver before it serves anything.
+# `from .database import engine` still works through the module __getattr__.
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+    return _engine
+
+def __getattr__(name: str):
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class LazySessionmaker(sessionmaker):
+    """Binds to the primary engine when it opens its first session."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    if "+" in parsed.drivername and parsed.drivername.split("+")[1] in ("aiosqlite", "asyncpg"):
+        return url
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} databases")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+# The async engine is only built when the async path is used, so the sync
+# deployment does not need aiosqlite/asyncpg installed.
+async_engine = None
+AsyncSessionLocal = None
+
+def get_async_sessionmaker():
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        url = async_database_url(settings.DATABASE_URL)
+        async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
+# Read replicas. Read-only routes take `read_db`; everything else keeps the
+# primary through `get_db`, whose commits also pin the client's reads to the
+# primary for DB_REPLICA_PIN_SECONDS so it reads its own writes.
+PIN_COOKIE = "db_pin"
+# Zero when the standby has replayed everything it received
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+reads_total = REGISTRY.counter("db_reads_total", "Read-only sessions opened, by target", ("target",))
+replica_healthy = REGISTRY.gauge("db_replica_healthy", "1 while a replica passes its health check", ("replica",))
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_labelled_engine(url, name)
+        self.sessionmaker = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = True
+        replica_healthy.set(1, replica=name)
+        event.listen(self.engine, "handle_error", self._on_error)
+
+    def _on_error(self, context) -> None:
+        # Stop routing here at the first lost connection; the monitor brings it back
+        if context.is_disconnect:
+            self.mark(False)
+
+    def mark(self, healthy: bool) -> None:
+        if healthy != self.healthy:
+            logger.warning("Read replica %s is now %s", self.name, "healthy" if healthy else "unhealthy")
+        self.healthy = healthy
+        replica_healthy.set(int(healthy), replica=self.name)
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+                lag = None
+                if connection.dialect.name == "postgresql":
+                    lag = connection.execute(REPLICA_LAG_SQL).scalar()
+        except exc.SQLAlchemyError:
+            self.mark(False)
+            return False
+        healthy = lag is None or float(lag) <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        self.mark(healthy)
+        return healthy
+
+class ReplicaSet:
+    """Round-robin over healthy replicas, falling back to the primary."""
+
+    def __init__(self, urls: List[str], interval: Optional[float] = None):
+        self.replicas = [Replica(f"replica{i}", url) for i, url in enumerate(urls)]
+        self.interval = interval if interval is not None else settings.DB_REPLICA_HEALTH_INTERVAL_SECONDS
+        self._next = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._task: Optional[asyncio.Task] = None
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self) -> Optional[Replica]:
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._next)]
+            if replica.healthy:
+                return replica
+        return None
+
+    def check(self) -> None:
+        for replica in self.replicas:
+            replica.check()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self.check)
+            except Exception:
+                logger.exception("Replica health check failed")
+
+    def start(self) -> None:
+        if self.replicas:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+replicas = ReplicaSet([url.strip() for url in settings.DB_REPLICA_URLS.split(",") if url.strip()])
+
+def pin_primary(response: Response) -> None:
+    if replicas:
+        pin = settings.DB_REPLICA_PIN_SECONDS
+        response.set_cookie(
+            PIN_COOKIE,
+            str(int(time.time() + pin)),
+            max_age=int(pin),
+            httponly=True,
+            samesite=settings.COOKIE_SAMESITE,
+            secure=settings.COOKIE_SECURE
+        )
+
+def pin_on_commit(db, response: Response) -> None:
+    """Set the pin cookie when `db` commits; requests that only read or
+    roll back leave the client's reads on the replicas."""
+    if replicas:
+        event.listen(db, "after_commit", lambda session: pin_primary(response))
+
+def pinned(connection: HTTPConnection) -> bool:
+    try:
+        return float(connection.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def get_db(response: Response):
     db = SessionLocal()
+    pin_on_commit(db, response)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_read_db(connection: HTTPConnection):
+    replica = None if pinned(connection) else replicas.pick()
+    reads_total.inc(target="replica" if replica else "primary")
+    db = (replica.sessionmaker if replica else SessionLocal)()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db(response: Response):
+    async with get_async_sessionmaker()() as db:
+        pin_on_commit(db.sync_session, response)
+        yield db
+
+# DB_ASYNC hands the routes an AsyncSession on the primary instead. Shards
+# have only sync engines, so a sharded deployment keeps sync sessions
+primary_db = get_async_db if settings.DB_ASYNC and not settings.DB_SHARD_URLS.strip() else get_db
+# Without replicas, reads share the request's primary session
+read_db = get_read_db if replicas else primary_db
+
+def is_async(db) -> bool:
+    return hasattr(db, "run_sync")
+
+async def call(db, fn, *args, **kwargs):
+    """`fn(session, *args)` without blocking the event loop: on the
+    AsyncSession's own connection, or a sync session on the threadpool."""
+    if is_async(db):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def close(db) -> None:
+    if is_async(db):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
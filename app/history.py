@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
+from sqlalchemy import Row, select, tuple_
+from sqlalchemy.orm import Session
+from . import models, schemas, serialization
+from .database import is_async
+from .pagination import encode_cursor, decode_cursor
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+EXPORT_COLUMNS = ("id", "user_id", "movie_id", "seats", "booking_time")
+# Page columns in schemas.Booking field order; seat_labels comes last
+BOOKING_FIELDS = serialization.fields(schemas.Booking)
+EXPORT_BATCH_SIZE = 1000
+
+def _history_statement(stmt, user_id: int, cursor: Optional[str]):
+    # Newest first; served by the (user_id, booking_time) index
+    stmt = stmt.where(models.Booking.user_id == user_id).order_by(
+        models.Booking.booking_time.desc(), models.Booking.id.desc()
+    )
+    if cursor:
+        stmt = stmt.where(
+            tuple_(models.Booking.booking_time, models.Booking.id) < tuple_(*decode_cursor(cursor))
+        )
+    return stmt
+
+def fetch_page(db: Session, user_id: int, limit: Optional[int], cursor: Optional[str] = None
+               ) -> Tuple[List[Row], Optional[str]]:
+    columns = [getattr(models.Booking, name) for name in BOOKING_FIELDS]
+    stmt = _history_statement(select(*columns), user_id, cursor)
+    if limit is None:
+        return db.execute(stmt).all(), None
+
+    bookings = db.execute(stmt.limit(limit + 1)).all()
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        return bookings, encode_cursor(bookings[-1].booking_time, bookings[-1].id)
+    return bookings, None
+
+def page_json(bookings: Iterable[Row]) -> bytes:
+    # seat_labels is stored comma-separated and listed in the response
+    return serialization.rows_json(
+        ((*row[:-1], row[-1].split(",") if row[-1] else None) for row in bookings), BOOKING_FIELDS
+    )
+
+def _export_statement(user_id: int):
+    columns = [getattr(models.Booking, name) for name in EXPORT_COLUMNS]
+    return _history_statement(select(*columns), user_id, None).execution_options(
+        yield_per=EXPORT_BATCH_SIZE
+    )
+
+def history_rows(db: Session, user_id: int) -> Iterator[Row]:
+    """The user's whole history, newest first, from a server-side cursor."""
+    yield from db.execute(_export_statement(user_id))
+
+def _encode(partition: List[Row], fmt: str) -> str:
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        for row in partition:
+            writer.writerow([*row[:-1], row[-1].isoformat()])
+    else:
+        for row in partition:
+            record = dict(zip(EXPORT_COLUMNS, row))
+            record["booking_time"] = record["booking_time"].isoformat()
+            buffer.write(json.dumps(record))
+            buffer.write("\n")
+    return buffer.getvalue()
+
+def _header(fmt: str) -> Optional[str]:
+    return ",".join(EXPORT_COLUMNS) + "\r\n" if fmt == "csv" else None
+
+def render_export(rows: Iterable[Row], fmt: str) -> Iterator[str]:
+    """Encode history rows as NDJSON or CSV text, EXPORT_BATCH_SIZE rows per chunk."""
+    if _header(fmt):
+        yield _header(fmt)
+    rows = iter(rows)
+    while True:
+        partition = list(islice(rows, EXPORT_BATCH_SIZE))
+        if not partition:
+            return
+        yield _encode(partition, fmt)
+
+async def _export_rows_async(db: "AsyncSession", user_id: int, fmt: str) -> AsyncIterator[str]:
+    if _header(fmt):
+        yield _header(fmt)
+    result = await db.stream(_export_statement(user_id))
+    async for partition in result.partitions():
+        yield _encode(partition, fmt)
+
+def export_rows(db, user_id: int, fmt: str) -> Union[Iterator[str], AsyncIterator[str]]:
+    """Yield the user's whole history as NDJSON or CSV text chunks.
+
+    Rows come from a server-side cursor in batches of EXPORT_BATCH_SIZE, so
+    memory stays flat however long the history is. An AsyncSession streams
+    them without the threadpool.
+    """
+    if is_async(db):
+        return _export_rows_async(db, user_id, fmt)
+    return render_export(history_rows(db, user_id), fmt)
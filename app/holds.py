@@ -0,0 +1,249 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from . import models, catalogue, seatmap
+from . import booking as booking_engine
+from .config import settings
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HELD = "held"
+CONFIRMED = "confirmed"
+RELEASED = "released"
+EXPIRED = "expired"
+
+holds_active = REGISTRY.gauge("seat_holds_active", "Seat holds not yet settled, counted at the last sweep")
+holds_expired_total = REGISTRY.counter("seat_holds_expired_total", "Seat holds returned by the sweeper")
+hold_sweep_seconds = REGISTRY.histogram("seat_hold_sweep_seconds", "Duration of one expiry sweep")
+
+def utcnow() -> datetime:
+    # Naive UTC, matching how DateTime columns round-trip on SQLite and Postgres
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def create_hold(db: Session, user_id: int, movie_id: int, seats: int) -> models.SeatHold:
+    row = booking_engine.reserve(db, movie_id, seats)
+    if row is None:
+        raise booking_engine.unavailable_error(db, movie_id)
+
+    labels = None
+    if row[1]:
+        labels = booking_engine.claim_or_release(db, movie_id, seats, seatmap.choose_best(seats))
+
+    now = utcnow()
+    hold = models.SeatHold(
+        user_id=user_id,
+        movie_id=movie_id,
+        seats=seats,
+        seat_labels=",".join(labels) if labels else None,
+        status=HELD,
+        created_at=now,
+        expires_at=now + timedelta(seconds=settings.HOLD_TTL_SECONDS)
+    )
+    db.add(hold)
+    db.commit()
+    db.refresh(hold)
+    catalogue.invalidate()
+    sweeper.schedule(hold.expires_at)
+    return hold
+
+def _settle(db: Session, criteria, new_status: str):
+    return db.execute(
+        update(models.SeatHold)
+        .where(models.SeatHold.status == HELD, *criteria)
+        .values(status=new_status)
+        .returning(models.SeatHold.id, models.SeatHold.movie_id, models.SeatHold.seats, models.SeatHold.seat_labels)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+def _return_seats(db: Session, settled) -> None:
+    seats_by_movie = defaultdict(int)
+    labels_by_movie = defaultdict(list)
+    for _, movie_id, seats, labels in settled:
+        seats_by_movie[movie_id] += seats
+        if labels:
+            labels_by_movie[movie_id].extend(labels.split(","))
+    for movie_id, seats in seats_by_movie.items():
+        booking_engine.release_seats(db, movie_id, seats)
+        if labels_by_movie[movie_id]:
+            seatmap.release(db, movie_id, labels_by_movie[movie_id])
+
+def _hold_error(db: Session, hold_id: int, user_id: int) -> HTTPException:
+    hold = db.get(models.SeatHold, hold_id)
+    if hold is None or hold.user_id != user_id:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Hold not found"
+        )
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Hold is {hold.status if hold.status != HELD else EXPIRED}"
+    )
+
+def confirm_hold(db: Session, hold_id: int, user_id: int) -> models.Booking:
+    settled = _settle(db, (
+        models.SeatHold.id == hold_id,
+        models.SeatHold.user_id == user_id,
+        models.SeatHold.expires_at > utcnow()
+    ), CONFIRMED)
+    if not settled:
+        raise _hold_error(db, hold_id, user_id)
+
+    _, movie_id, seats, labels = settled[0]
+    db_booking = models.Booking(user_id=user_id, movie_id=movie_id, seats=seats, seat_labels=labels)
+    db.add(db_booking)
+    db.commit()
+    db.refresh(db_booking)
+    return db_booking
+
+def release_hold(db: Session, hold_id: int, user_id: int) -> None:
+    settled = _settle(db, (models.SeatHold.id == hold_id, models.SeatHold.user_id == user_id), RELEASED)
+    if not settled:
+        raise _hold_error(db, hold_id, user_id)
+    _return_seats(db, settled)
+    db.commit()
+    catalogue.invalidate()
+
+def expire_due(db: Session, now: Optional[datetime] = None, limit: Optional[int] = None) -> int:
+    """Return the seats of holds past their deadline; one range scan of the
+    (status, expires_at) index plus one seat update per movie."""
+    now = now or utcnow()
+    due = (
+        select(models.SeatHold.id)
+        .where(models.SeatHold.status == HELD, models.SeatHold.expires_at <= now)
+        .order_by(models.SeatHold.expires_at)
+        .limit(limit or settings.HOLD_SWEEP_BATCH_SIZE)
+    )
+    settled = _settle(db, (models.SeatHold.id.in_(due.scalar_subquery()),), EXPIRED)
+    if not settled:
+        return 0
+    _return_seats(db, settled)
+    db.commit()
+    catalogue.invalidate()
+    holds_expired_total.inc(len(settled))
+    return len(settled)
+
+def count_held(db: Session) -> int:
+    return db.execute(
+        select(func.count()).select_from(models.SeatHold).where(models.SeatHold.status == HELD)
+    ).scalar_one()
+
+def next_expiry(db: Session) -> Optional[datetime]:
+    return db.execute(
+        select(func.min(models.SeatHold.expires_at)).where(models.SeatHold.status == HELD)
+    ).scalar_one_or_none()
+
+class HoldSweeper:
+    """Background task that expires holds when they fall due.
+
+    Deadlines of holds created in this worker sit in a min-heap, so the task
+    sleeps exactly until the next one. It also wakes every
+    HOLD_SWEEP_INTERVAL_SECONDS to pick up holds created by other workers.
+    Each wake-up is a range scan of the (status, expires_at) index, never a
+    full table scan, and also refreshes the seat_holds_active gauge from the
+    table, so it covers holds from every worker.
+    """
+
+    def __init__(self, session_factory=None, interval: Optional[float] = None):
+        self.session_factory = session_factory
+        self.interval = interval if interval is not None else settings.HOLD_SWEEP_INTERVAL_SECONDS
+        self._deadlines: List[float] = []
+        # Mirrors the heap, so each sweep's next_expiry is pushed only once
+        self._pending: Set[float] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, expires_at: datetime) -> None:
+        deadline = expires_at.replace(tzinfo=timezone.utc).timestamp()
+        if self._loop is None:
+            self._push(deadline)
+            return
+        self._loop.call_soon_threadsafe(self._push, deadline)
+
+    def _push(self, deadline: float) -> None:
+        if deadline in self._pending:
+            return
+        self._pending.add(deadline)
+        earliest = self._deadlines[0] if self._deadlines else None
+        heapq.heappush(self._deadlines, deadline)
+        if self._wakeup is not None and (earliest is None or deadline < earliest):
+            self._wakeup.set()
+
+    def next_delay(self, now: float) -> float:
+        if not self._deadlines:
+            return self.interval
+        return max(0.0, min(self.interval, self._deadlines[0] - now))
+
+    def _sweep(self) -> int:
+        expired = held = 0
+        for session_factory in self._session_factories():
+            with session_factory() as db:
+                expired += expire_due(db)
+                held += count_held(db)
+                if self._loop is not None:
+                    upcoming = next_expiry(db)
+                    if upcoming is not None:
+                        self.schedule(upcoming)
+        holds_active.set(held)
+        return expired
+
+    def _session_factories(self):
+        if self.session_factory is not None:
+            return [self.session_factory]
+        from .sharding import shards
+        if shards:
+            # Holds live on their showtime's shard
+            return [shard.sessionmaker for shard in shards]
+        from .database import SessionLocal
+        return [SessionLocal]
+
+    async def sweep(self) -> int:
+        now = time.time()
+        while self._deadlines and self._deadlines[0] <= now:
+            self._pending.discard(heapq.heappop(self._deadlines))
+        start = time.perf_counter()
+        try:
+            return await run_in_threadpool(self._sweep)
+        finally:
+            hold_sweep_seconds.observe(time.perf_counter() - start)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.next_delay(time.time()))
+                continue
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Seat hold sweep failed")
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        # Catch up on holds that expired while no worker was running
+        self._push(0.0)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._loop = None
+
+sweeper = HoldSweeper()
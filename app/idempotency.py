@@ -0,0 +1,324 @@
+"""Idempotency-Key support for booking, signup and movie creation.
+
+A POST to one of IDEMPOTENT_ROUTES with an `Idempotency-Key` header runs at
+most once per caller and key within IDEMPOTENCY_TTL_SECONDS:
+
+- Keys are scoped to the caller (the token's username, or the client IP
+  without a token) and the route, and stored hashed as the primary key of
+  `idempotency_keys`, so a lookup is a single primary-key read.
+- The first request claims the key with a placeholder row leased for
+  IDEMPOTENCY_CLAIM_LEASE_SECONDS, runs, then stores its status, headers and
+  body for the full TTL. A claim left behind by a crashed worker lapses and
+  can be taken over. Retries get that response back with an
+  `Idempotent-Replayed: true` header. Finished responses are also kept in a
+  per-worker LRU, so hot retries skip the database.
+- Duplicates arriving while the first request is still running wait for it
+  and share its response when they hit the same worker; on another worker
+  they get a 409 with Retry-After.
+- Reusing a key for a different request (path, query or body) is a 422.
+
+Server errors and answers that may change on retry (TRANSIENT_STATUSES) are
+not stored: their claim is dropped so the same key can be tried again.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from starlette.requests import Request
+from . import models, auth, ratelimit
+from .cache import TTLCache
+from .config import settings
+from .holds import utcnow
+from .metrics import REGISTRY
+from .profiling import matched_route
+
+logger = logging.getLogger(__name__)
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+IDEMPOTENT_ROUTES = {"/movies/{movie_id}/book", "/auth/signup", "/admin/movies"}
+# Answers that may differ on retry, e.g. "Showtime is busy" or a rate limit
+TRANSIENT_STATUSES = {401, 403, 408, 409, 425, 429}
+# Regenerated by the server on replay
+SKIPPED_HEADERS = {b"content-length", b"date", b"server", b"set-cookie"}
+PURGE_INTERVAL_SECONDS = 60
+IN_PROGRESS = "in_progress"
+
+replays_total = REGISTRY.counter(
+    "idempotency_replays_total", "Responses replayed for a repeated Idempotency-Key", ("source",)
+)
+rejected_total = REGISTRY.counter(
+    "idempotency_rejected_total", "Idempotency-Key requests refused", ("reason",)
+)
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    expires_at: float
+
+    def encoded_headers(self) -> str:
+        return json.dumps([[name.decode("latin-1"), value.decode("latin-1")] for name, value in self.headers])
+
+    @classmethod
+    def from_row(cls, row: models.IdempotencyKey) -> "StoredResponse":
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(row.headers)]
+        expires_at = row.expires_at.replace(tzinfo=timezone.utc).timestamp()
+        return cls(row.fingerprint, row.status_code, headers, row.body, expires_at)
+
+Claim = Union[None, str, StoredResponse]
+
+class IdempotencyStore:
+    def __init__(self, session_factory=None, ttl: Optional[float] = None, cache_size: Optional[int] = None,
+                 lease: Optional[float] = None):
+        self.session_factory = session_factory
+        self.ttl = ttl if ttl is not None else settings.IDEMPOTENCY_TTL_SECONDS
+        self.lease = lease if lease is not None else settings.IDEMPOTENCY_CLAIM_LEASE_SECONDS
+        self.cache = TTLCache(cache_size if cache_size is not None else settings.IDEMPOTENCY_CACHE_SIZE)
+        self.in_flight: Dict[str, asyncio.Future] = {}
+        self._last_purge = 0.0
+
+    def _session_factory(self):
+        if self.session_factory is None:
+            from .database import SessionLocal
+            return SessionLocal
+        return self.session_factory
+
+    def claim(self, key: str, fingerprint: str) -> Claim:
+        """The stored response, IN_PROGRESS if another request holds the key,
+        or None once this request owns it."""
+        now = utcnow()
+        # Only the lease: if this request never finishes, retries can take over
+        expires_at = now + timedelta(seconds=self.lease)
+        with self._session_factory()() as db:
+            self._purge(db, now)
+            row = db.get(models.IdempotencyKey, key)
+            if row is not None and row.expires_at > now:
+                return IN_PROGRESS if row.status_code is None else StoredResponse.from_row(row)
+
+            if row is not None:
+                # Expired, or a lapsed claim, and not purged yet; take it over
+                # unless someone else just did
+                taken = db.execute(
+                    update(models.IdempotencyKey)
+                    .where(models.IdempotencyKey.key == key, models.IdempotencyKey.expires_at <= now)
+                    .values(fingerprint=fingerprint, status_code=None, headers=None, body=None,
+                            created_at=now, expires_at=expires_at)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if not taken:
+                    return IN_PROGRESS
+            else:
+                try:
+                    with db.begin_nested():
+                        db.add(models.IdempotencyKey(
+                            key=key, fingerprint=fingerprint, created_at=now, expires_at=expires_at
+                        ))
+                except IntegrityError:
+                    # Claimed by another worker between the read and the insert
+                    return IN_PROGRESS
+            db.commit()
+        return None
+
+    def save(self, key: str, response: StoredResponse) -> None:
+        with self._session_factory()() as db:
+            db.execute(
+                update(models.IdempotencyKey)
+                .where(models.IdempotencyKey.key == key)
+                .values(
+                    status_code=response.status_code,
+                    headers=response.encoded_headers(),
+                    body=response.body,
+                    expires_at=datetime.fromtimestamp(response.expires_at, timezone.utc).replace(tzinfo=None)
+                )
+            )
+            db.commit()
+        self.cache.set(key, response, response.expires_at)
+
+    def release(self, key: str) -> None:
+        with self._session_factory()() as db:
+            db.execute(
+                delete(models.IdempotencyKey)
+                .where(models.IdempotencyKey.key == key, models.IdempotencyKey.status_code.is_(None))
+            )
+            db.commit()
+
+    def _purge(self, db, now) -> None:
+        if time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = time.monotonic()
+        db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at <= now))
+        db.commit()
+
+store = IdempotencyStore()
+
+def _caller(request: Request) -> str:
+    token = request.cookies.get("access_token")
+    if token:
+        try:
+            return "user:" + auth.decode_access_token(token).username
+        except HTTPException:
+            pass
+    return "ip:" + ratelimit.client_ip(request)
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+def _stored(status_code: int) -> bool:
+    return status_code < 500 and status_code not in TRANSIENT_STATUSES
+
+async def _refuse(scope, receive, send, status_code: int, detail: str, reason: str, headers=None) -> None:
+    rejected_total.inc(reason=reason)
+    await JSONResponse({"detail": detail}, status_code=status_code, headers=headers)(scope, receive, send)
+
+async def _replay(scope, receive, send, response: StoredResponse, fingerprint: str, source: str) -> None:
+    if response.fingerprint != fingerprint:
+        await _refuse(
+            scope, receive, send, status.HTTP_422_UNPROCESSABLE_ENTITY,
+            "Idempotency-Key was already used for a different request", "mismatch"
+        )
+        return
+    replays_total.inc(source=source)
+    headers = response.headers + [
+        (b"content-length", str(len(response.body)).encode()),
+        (b"idempotent-replayed", b"true"),
+    ]
+    await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+    await send({"type": "http.response.body", "body": response.body})
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware; requests without the header, or to other routes,
+    pass straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not settings.IDEMPOTENCY_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = _header(scope, HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        route = matched_route(scope)
+        if route not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+            await _refuse(
+                scope, receive, send, status.HTTP_400_BAD_REQUEST,
+                f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters", "invalid"
+            )
+            return
+
+        body = await _read_body(receive)
+        caller = _caller(Request(scope))
+        key = hashlib.sha256(b"\n".join([caller.encode(), route.encode(), idempotency_key])).hexdigest()
+        fingerprint = hashlib.sha256(
+            b"\n".join([scope["path"].encode(), scope["query_string"], body])
+        ).hexdigest()
+
+        body_sent = False
+
+        async def replay_body():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self._handle(scope, replay_body, send, key, fingerprint)
+
+    async def _handle(self, scope, receive, send, key: str, fingerprint: str) -> None:
+        while key in store.in_flight:
+            # The same key is running in this worker: share its answer
+            response = await asyncio.shield(store.in_flight[key])
+            if response is not None:
+                await _replay(scope, receive, send, response, fingerprint, "coalesced")
+                return
+            # Not stored (an error or transient answer), so try again ourselves
+
+        cached = store.cache.get(key)
+        if cached is not None:
+            await _replay(scope, receive, send, cached, fingerprint, "cache")
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        store.in_flight[key] = future
+        response = None
+        try:
+            claim = await run_in_threadpool(store.claim, key, fingerprint)
+            if claim == IN_PROGRESS:
+                await _refuse(
+                    scope, receive, send, status.HTTP_409_CONFLICT,
+                    "A request with this Idempotency-Key is still in progress", "in_progress",
+                    headers={"Retry-After": "1"}
+                )
+            elif claim is not None:
+                response = claim
+                store.cache.set(key, response, response.expires_at)
+                await _replay(scope, receive, send, response, fingerprint, "database")
+            else:
+                response = await self._run(scope, receive, send, key, fingerprint)
+        finally:
+            del store.in_flight[key]
+            future.set_result(response)
+
+    async def _run(self, scope, receive, send, key: str, fingerprint: str) -> Optional[StoredResponse]:
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except BaseException:
+            await run_in_threadpool(store.release, key)
+            raise
+
+        status_code = start.get("status", 500)
+        if not _stored(status_code):
+            await run_in_threadpool(store.release, key)
+            return None
+        headers = [(name, value) for name, value in start.get("headers", []) if name.lower() not in SKIPPED_HEADERS]
+        response = StoredResponse(fingerprint, status_code, headers, b"".join(chunks), time.time() + store.ttl)
+        try:
+            await run_in_threadpool(store.save, key, response)
+        except Exception:
+            # The client already has its answer; free the key rather than
+            # leaving retries stuck behind an "in progress" claim
+            logger.exception("Could not store idempotent response")
+            await run_in_threadpool(store.release, key)
+            return None
+        return response
@@ -0,0 +1,164 @@
+"""Per-request timing: route latency, in-flight requests and SQL work.
+
+The middleware keeps a `RequestStats` in a context variable for the life of
+a request. SQLAlchemy cursor events and `phase()` blocks add to it from any
+thread the request runs on (the threadpool copies the context, so they all
+see the same object). Routes built with `TimedRoute` time their endpoint
+function as the "handler" phase, apart from dependencies and response
+rendering; `serialization.dumps` times itself as "serialization". Everything lands in metrics.REGISTRY for /metrics;
+with DEBUG on, the breakdown is also returned as a Server-Timing header.
+"""
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .config import settings
+from .metrics import REGISTRY
+from .profiling import slow_queries
+
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "unmatched"
+
+requests_in_flight = REGISTRY.gauge("http_requests_in_flight", "Requests currently being served")
+requests_total = REGISTRY.counter(
+    "http_requests_total", "Requests served", ("method", "route", "status")
+)
+request_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds", "Request latency including the response body", ("method", "route")
+)
+request_queries = REGISTRY.histogram(
+    "http_request_db_queries", "SQL statements executed per request", ("method", "route"), buckets=COUNT_BUCKETS
+)
+request_db_seconds = REGISTRY.histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request", ("method", "route")
+)
+phase_seconds = REGISTRY.histogram(
+    "http_request_phase_seconds", "Time spent in a named part of the request", ("phase",)
+)
+query_seconds = REGISTRY.histogram("db_query_duration_seconds", "Duration of single SQL statements")
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        phase_seconds.observe(elapsed, phase=name)
+        stats = _current.get()
+        if stats is not None:
+            stats.add_phase(name, elapsed)
+
+def timed_endpoint(endpoint):
+    """`endpoint` wrapped in the "handler" phase, keeping its signature and
+    whether it is a coroutine, which FastAPI reads to call it."""
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            with phase("handler"):
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            with phase("handler"):
+                return endpoint(*args, **kwargs)
+    return wrapper
+
+class TimedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    query_seconds.observe(elapsed)
+    slow_queries.record(statement, parameters, elapsed, executemany)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute does not fire for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+def server_timing(stats: RequestStats, total: float) -> str:
+    parts = [
+        f"app;dur={total * 1000:.2f}",
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} queries"',
+    ]
+    parts.extend(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stats.phases.items())
+    return ", ".join(parts)
+
+def route_template(scope) -> str:
+    # The route's path template keeps label cardinality bounded
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware; avoids the extra task and body copying of
+    BaseHTTPMiddleware so the overhead is a few counter updates."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.DEBUG:
+                    timing = server_timing(stats, time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", timing.encode("latin-1"))
+                    ]
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_flight.dec()
+            _current.reset(token)
+            method, route = scope["method"], route_template(scope)
+            requests_total.inc(method=method, route=route, status=status_code)
+            request_seconds.observe(elapsed, method=method, route=route)
+            request_queries.observe(stats.queries, method=method, route=route)
+            request_db_seconds.observe(stats.db_seconds, method=method, route=route)
@@ -0,0 +1,203 @@
+"""Live seat counts pushed over Server-Sent Events and WebSockets.
+
+Writers never talk to subscribers directly. `booking.reserve` and
+`booking.release_seats` stage the seat count their UPDATE returned on the
+session, and an `after_commit` listener hands the committed counts to the
+in-process `feed` (rolled-back counts are dropped). Movies nobody watches
+are skipped before anything is staged.
+
+The feed coalesces: counts published within LIVE_COALESCE_MS of each other
+are fanned out once, latest value per movie. Each subscriber keeps only the
+latest unsent count per movie, so a slow client gets fewer, bigger jumps
+instead of an ever-growing queue, and a publisher never waits on a client.
+Events carry the absolute count plus the change since the last count that
+client was sent.
+
+Subscribers are small slotted objects with no task of their own, so an idle
+connection costs little more than the server's own per-connection state.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+from .metrics import REGISTRY
+from .serialization import dumps
+
+STAGED_KEY = "live_seat_counts"
+KEEPALIVE = b": keepalive\n\n"
+
+events_total = REGISTRY.counter("live_seat_events_total", "Seat count updates sent to subscribers", ("transport",))
+rejected_total = REGISTRY.counter("live_subscribers_rejected_total", "Subscriptions refused at LIVE_MAX_SUBSCRIBERS")
+
+class Subscriber:
+    __slots__ = ("movie_ids", "sent", "pending", "_waiter")
+
+    def __init__(self, movie_ids: Optional[Iterable[int]], snapshot: Dict[int, int]):
+        # None follows every movie, including ones created later
+        self.movie_ids = frozenset(movie_ids) if movie_ids else None
+        self.sent = dict(snapshot)
+        self.pending: Dict[int, int] = {}
+        self._waiter: Optional[asyncio.Future] = None
+
+    def offer(self, movie_id: int, available_seats: int) -> None:
+        self.pending[movie_id] = available_seats
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def next_updates(self, timeout: float) -> List[dict]:
+        """Wait for updates; an empty list after `timeout` seconds of quiet."""
+        if not self.pending:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError:
+                return []
+            finally:
+                self._waiter = None
+        pending, self.pending = self.pending, {}
+        updates = []
+        for movie_id, available_seats in pending.items():
+            previous = self.sent.get(movie_id)
+            if previous == available_seats:
+                continue
+            self.sent[movie_id] = available_seats
+            updates.append({
+                "movie_id": movie_id,
+                "available_seats": available_seats,
+                "delta": None if previous is None else available_seats - previous
+            })
+        return updates
+
+class SeatFeed:
+    def __init__(self, coalesce: Optional[float] = None, max_subscribers: Optional[int] = None):
+        self.coalesce = coalesce if coalesce is not None else settings.LIVE_COALESCE_MS / 1000
+        self.max_subscribers = max_subscribers or settings.LIVE_MAX_SUBSCRIBERS
+        self.subscribers = 0
+        self._by_movie: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._everything: Set[Subscriber] = set()
+        self._pending: Dict[int, int] = {}
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def watching(self, movie_id: int) -> bool:
+        return bool(self._everything) or movie_id in self._by_movie
+
+    def check_capacity(self) -> None:
+        if self.subscribers >= self.max_subscribers:
+            rejected_total.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live subscribers, please retry",
+                headers={"Retry-After": "5"}
+            )
+
+    def subscribe(self, subscriber: Subscriber) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.subscribers += 1
+        if subscriber.movie_ids is None:
+            self._everything.add(subscriber)
+        for movie_id in subscriber.movie_ids or ():
+            self._by_movie[movie_id].add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers -= 1
+        self._everything.discard(subscriber)
+        for movie_id in subscriber.movie_ids or ():
+            watchers = self._by_movie.get(movie_id)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers:
+                    del self._by_movie[movie_id]
+
+    def publish(self, movie_id: int, available_seats: int) -> None:
+        """Thread-safe; callable from the threadpool after a commit."""
+        loop = self._loop
+        if loop is None or not self.watching(movie_id):
+            return
+        with self._lock:
+            self._pending[movie_id] = available_seats
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        try:
+            loop.call_soon_threadsafe(loop.call_later, self.coalesce, self._flush)
+        except RuntimeError:
+            # The loop has closed (shutdown, or a finished test client)
+            with self._lock:
+                self._pending.clear()
+                self._flush_scheduled = False
+
+    def _flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flush_scheduled = False
+        for movie_id, available_seats in pending.items():
+            for subscriber in self._by_movie.get(movie_id, ()):
+                subscriber.offer(movie_id, available_seats)
+            for subscriber in self._everything:
+                subscriber.offer(movie_id, available_seats)
+
+feed = SeatFeed()
+REGISTRY.gauge("live_subscribers", "Open SSE and WebSocket seat subscriptions", callback=lambda: feed.subscribers)
+
+def stage(db: Session, movie_id: int, available_seats: int) -> None:
+    """Publish `available_seats` for `movie_id` once `db` commits."""
+    if feed.watching(movie_id):
+        db.info.setdefault(STAGED_KEY, {})[movie_id] = available_seats
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    for movie_id, available_seats in session.info.pop(STAGED_KEY, {}).items():
+        feed.publish(movie_id, available_seats)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _after_rollback(session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop(STAGED_KEY, None)
+
+def snapshot(db: Session, movie_ids: Optional[List[int]]) -> Dict[int, int]:
+    if not movie_ids:
+        return {}
+    rows = db.execute(
+        select(models.Movie.id, models.Movie.available_seats).where(models.Movie.id.in_(movie_ids))
+    )
+    return dict(rows.all())
+
+def _snapshot_event(counts: Dict[int, int]) -> bytes:
+    return dumps([{"movie_id": movie_id, "available_seats": seats} for movie_id, seats in counts.items()])
+
+async def sse(movie_ids: Optional[List[int]], counts: Dict[int, int]) -> AsyncIterator[bytes]:
+    subscriber = Subscriber(movie_ids, counts)
+    feed.subscribe(subscriber)
+    try:
+        yield b"event: snapshot\ndata: " + _snapshot_event(counts) + b"\n\n"
+        while True:
+            updates = await subscriber.next_updates(settings.LIVE_KEEPALIVE_SECONDS)
+            if not updates:
+                yield KEEPALIVE
+                continue
+            events_total.inc(len(updates), transport="sse")
+            yield b"".join(b"event: seats\ndata: " + dumps(update) + b"\n\n" for update in updates)
+    finally:
+        feed.unsubscribe(subscriber)
+
+async def websocket_stream(websocket: WebSocket, movie_ids: Optional[List[int]], counts: Dict[int, int]) -> None:
+    subscriber = Subscriber(movie_ids, counts)
+    feed.subscribe(subscriber)
+    try:
+        await websocket.send_text('{"event":"snapshot","data":' + _snapshot_event(counts).decode() + "}")
+        while True:
+            updates = await subscriber.next_updates(settings.LIVE_KEEPALIVE_SECONDS)
+            # An empty list doubles as the keepalive, and notices closed sockets
+            await websocket.send_text(dumps({"event": "seats", "data": updates}).decode())
+            events_total.inc(len(updates), transport="websocket")
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        feed.unsubscribe(subscriber)
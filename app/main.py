@@ -1,20 +1,41 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Response, Cookie, Query, Request, WebSocket
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from . import models, schemas, auth
-from .database import engine, Base, get_db
+from . import booking as booking_engine
+from . import catalogue, bulk_import, history, seatmap, holds, instrumentation, profiling, serialization, passwords, ratelimit
+from . import analytics, idempotency, live, migrations, sharding
+from .batcher import batcher
+from .metrics import REGISTRY
+from .database import call, close, get_db, get_engine, read_db, replicas
 from .config import settings
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create database tables
-    Base.metadata.create_all(bind=engine)
+    # Startup: create or migrate the schema. With DB_SCHEMA_SETUP=none the
+    # primary engine is not even built until the first query
+    if settings.DB_SCHEMA_SETUP != "none":
+        migrations.setup_schema(get_engine())
+        for shard in sharding.shards:
+            migrations.setup_schema(shard.engine)
+    holds.sweeper.start()
+    if settings.BOOKING_BATCH_ENABLED:
+        batcher.start()
+    replicas.start()
+    auth.revocations.start()
     yield
-    # Shutdown: Add cleanup code here if needed
-    pass
+    # Shutdown: stop background tasks
+    await auth.revocations.stop()
+    await replicas.stop()
+    await holds.sweeper.stop()
+    await batcher.stop()
+    passwords.pool.shutdown()
+    sharding.shards.shutdown()
 
 app = FastAPI(
     title="Movie Booking API",
@@ -22,6 +43,11 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan
 )
+# Routes time their endpoint function as the "handler" phase
+app.router.route_class = instrumentation.TimedRoute
+
+# Innermost, so replayed responses still pass through CORS and timing
+app.add_middleware(idempotency.IdempotencyMiddleware)
 
 # CORS middleware configuration
 app.add_middleware(
@@ -32,12 +58,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Route-filtered profiling; a no-op unless an admin starts a session
+app.add_middleware(profiling.ProfilingMiddleware)
+# Outermost, so the timings include CORS handling
+if settings.METRICS_ENABLED:
+    app.add_middleware(instrumentation.InstrumentationMiddleware)
+
 @app.get("/", status_code=status.HTTP_200_OK)
 def read_root():
     return {"status": "success", "message": "Movie Booking API is running"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 # Auth routes
-@app.post("/auth/signup", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
+@app.post(
+    "/auth/signup",
+    response_model=schemas.User,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(ratelimit.limit_signup)]
+)
 def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db_user = db.query(models.User).filter(models.User.username == user.username).first()
     if db_user:
@@ -53,7 +94,12 @@ def signup(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.refresh(db_user)
     return db_user
 
-@app.post("/auth/create-admin", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
+@app.post(
+    "/auth/create-admin",
+    response_model=schemas.User,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(ratelimit.limit_signup)]
+)
 def create_admin(admin: schemas.AdminCreate, db: Session = Depends(get_db)):
     # Check if the admin key matches the one in the environment
     if admin.admin_key != settings.ADMIN_PASSWORD:
@@ -76,13 +122,13 @@ def create_admin(admin: schemas.AdminCreate, db: Session = Depends(get_db)):
     db.refresh(db_user)
     return db_user
 
-@app.post("/auth/login", response_model=schemas.Token)
+@app.post("/auth/login", response_model=schemas.Token, dependencies=[Depends(ratelimit.limit_login)])
 async def login(
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db = Depends(auth.auth_db)
 ):
-    user = auth.authenticate_user(db, form_data.username, form_data.password)
+    user = await auth.authenticate(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -91,7 +137,7 @@ async def login(
         )
 
     access_token = auth.create_access_token(
-        data={"sub": user.username},
+        data={"sub": user.username, "uid": user.id, "ver": user.token_version},
         user_is_admin=user.is_admin
     )
 
@@ -103,74 +149,270 @@ async def login(
     }
 
 @app.post("/auth/logout")
-async def logout(response: Response):
+async def logout(
+    response: Response,
+    access_token: Optional[str] = Cookie(None),
+    db = Depends(auth.auth_db)
+):
+    await call(db, auth.revoke_access_token, access_token)
     response.delete_cookie("access_token")
     return {"message": "Successfully logged out"}
 
+@app.post("/auth/logout-all")
+async def logout_everywhere(
+    response: Response,
+    current_user: models.User = Depends(auth.current_user),
+    db = Depends(auth.auth_db)
+):
+    await call(db, auth.revoke_user_tokens, current_user.id)
+    response.delete_cookie("access_token")
+    return {"message": "Logged out of every session"}
+
+@app.post("/admin/users/{user_id}/revoke-tokens", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_user_tokens(
+    user_id: int,
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db = Depends(auth.auth_db)
+):
+    if not await call(db, auth.revoke_user_tokens, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
 @app.post("/admin/movies", response_model=schemas.Movie, status_code=status.HTTP_201_CREATED)
 def create_movie(
     movie: schemas.MovieCreate,
     current_user: models.User = Depends(auth.get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    db_movie = models.Movie(
-        title=movie.title,
-        showtime=movie.showtime,
-        available_seats=movie.available_seats
+    if sharding.shards:
+        db_movie = sharding.create_movie(db, movie.model_dump())
+    else:
+        db_movie = models.Movie(
+            title=movie.title,
+            showtime=movie.showtime,
+            available_seats=movie.available_seats
+        )
+        db.add(db_movie)
+        db.commit()
+        db.refresh(db_movie)
+    catalogue.invalidate()
+    live.feed.publish(db_movie.id, db_movie.available_seats)
+
+    return db_movie
+
+@app.post("/admin/movies/bulk", response_model=schemas.ImportReport)
+async def bulk_import_movies(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(1000, ge=1, le=10000),
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    importer = bulk_import.MovieImporter(db, batch_size=batch_size)
+    fmt = format or bulk_import.detect_format(request.headers.get("content-type"))
+    return await bulk_import.import_stream(importer, request.stream(), fmt)
+
+@app.post("/admin/profiling/sample", response_class=PlainTextResponse)
+async def sample_profile(
+    profile_request: schemas.ProfileRequest,
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    profile = await profiling.profiler.run(
+        profile_request.seconds,
+        profile_request.interval_ms / 1000,
+        profile_request.routes,
+        profile_request.fraction
     )
+    return PlainTextResponse(profile.collapsed(), headers={"X-Profile-Samples": str(profile.samples)})
 
-    db.add(db_movie)
-    db.commit()
-    db.refresh(db_movie)
+@app.get("/admin/profiling/slow-queries", response_model=List[schemas.SlowQuery])
+def view_slow_queries(
+    clear: bool = False,
+    current_user: models.User = Depends(auth.get_current_admin_user)
+):
+    entries = profiling.slow_queries.entries()
+    if clear:
+        profiling.slow_queries.clear()
+    return entries
 
-    return db_movie
+@app.get("/admin/analytics/sales", response_model=List[schemas.SalesBucket])
+async def sales_report(
+    movie_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket: str = Query("hour", pattern="^(hour|day)$"),
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db: Session = Depends(read_db)
+):
+    # Reads the hourly rollup, never the bookings table
+    return analytics.buckets(await call(db, sharding.sales, movie_id, since, until), bucket)
+
+def _top_users(db: Session, limit: int):
+    return analytics.name_users(db, sharding.top_users(db, limit))
+
+@app.get("/admin/analytics/top-users", response_model=List[schemas.UserSales])
+async def top_users_report(
+    limit: int = Query(10, ge=1, le=settings.ANALYTICS_TOP_USERS_MAX),
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db: Session = Depends(read_db)
+):
+    return await call(db, _top_users, limit)
 
 @app.get("/movies", response_model=List[schemas.Movie])
-def view_movies(
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+async def view_movies(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=settings.CATALOGUE_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    title: Optional[str] = Query(None, description="Title prefix"),
+    starts_after: Optional[datetime] = None,
+    starts_before: Optional[datetime] = None,
+    has_seats: Optional[bool] = None,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(read_db)
 ):
-    return db.query(models.Movie).all()
+    query = catalogue.MovieQuery(
+        limit=limit,
+        cursor=cursor,
+        title=title,
+        starts_after=starts_after,
+        starts_before=starts_before,
+        has_seats=has_seats
+    )
+    return await call(db, catalogue.render, query, request.headers.get("if-none-match"), fetch=sharding.fetch_movies)
+
+@app.get("/movies/live", response_class=StreamingResponse)
+async def live_seats(
+    movie_id: Optional[List[int]] = Query(None, max_length=settings.LIVE_MAX_MOVIES),
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(read_db)
+):
+    live.feed.check_capacity()
+    counts = await call(db, sharding.snapshot, movie_id)
+    # Hand the connection back before the stream starts
+    await close(db)
+    return StreamingResponse(
+        live.sse(movie_id, counts),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.websocket("/movies/live/ws")
+async def live_seats_ws(
+    websocket: WebSocket,
+    movie_id: Optional[List[int]] = Query(None, max_length=settings.LIVE_MAX_MOVIES),
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(read_db)
+):
+    live.feed.check_capacity()
+    counts = await call(db, sharding.snapshot, movie_id)
+    await close(db)
+    await websocket.accept()
+    await live.websocket_stream(websocket, movie_id, counts)
 
 @app.post("/movies/{movie_id}/book", response_model=schemas.Booking)
-def book_movie(
+async def book_movie(
     movie_id: int,
     booking: schemas.BookingCreate,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(sharding.get_booking_db)
 ):
-    movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
-    if not movie:
+    if settings.BOOKING_BATCH_ENABLED:
+        return await batcher.book(current_user.id, movie_id, booking.seats)
+    return await call(db, booking_engine.book_seats, current_user.id, movie_id, booking.seats)
+
+@app.post("/admin/movies/{movie_id}/seatmap", response_model=schemas.SeatMap, status_code=status.HTTP_201_CREATED)
+async def create_seat_map(
+    movie_id: int,
+    layout: schemas.SeatMapCreate,
+    current_user: models.User = Depends(auth.get_current_admin_user),
+    db: Session = Depends(sharding.get_movie_db)
+):
+    occupancy = await call(db, seatmap.create, movie_id, layout)
+    catalogue.invalidate()
+    return seatmap.availability(movie_id, occupancy)
+
+@app.get("/movies/{movie_id}/seats", response_model=schemas.SeatMap)
+async def view_seats(
+    movie_id: int,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(sharding.get_movie_read_db)
+):
+    return seatmap.availability(movie_id, await call(db, seatmap.get, movie_id))
+
+@app.get("/movies/{movie_id}/seats/best", response_model=schemas.BestSeats)
+async def best_seats(
+    movie_id: int,
+    count: int = Query(..., ge=1),
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(sharding.get_movie_read_db)
+):
+    occupancy = await call(db, seatmap.get, movie_id)
+    mask = seatmap.best_adjacent(occupancy, count)
+    if mask is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Movie not found"
+            detail=f"No {count} adjacent seats available"
         )
+    return {"seats": seatmap.mask_labels(occupancy, mask)}
 
-    if movie.available_seats < booking.seats:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Only {movie.available_seats} seats available"
-        )
+@app.post("/movies/{movie_id}/seats/book", response_model=schemas.Booking)
+async def book_specific_seats(
+    movie_id: int,
+    selection: schemas.SeatSelection,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(sharding.get_booking_db)
+):
+    return await call(db, booking_engine.book_specific_seats, current_user.id, movie_id, selection.seats)
 
-    db_booking = models.Booking(
-        user_id=current_user.id,
-        movie_id=movie_id,
-        seats=booking.seats
-    )
-    movie.available_seats -= booking.seats
+@app.post("/movies/{movie_id}/holds", response_model=schemas.Hold, status_code=status.HTTP_201_CREATED)
+async def hold_seats(
+    movie_id: int,
+    hold: schemas.HoldCreate,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(sharding.get_booking_db)
+):
+    return await call(db, holds.create_hold, current_user.id, movie_id, hold.seats)
 
-    db.add(db_booking)
-    db.commit()
-    db.refresh(db_booking)
-    return db_booking
+@app.post("/holds/{hold_id}/confirm", response_model=schemas.Booking)
+async def confirm_hold(
+    hold_id: int,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(sharding.get_hold_db)
+):
+    return await call(db, holds.confirm_hold, hold_id, current_user.id)
+
+@app.delete("/holds/{hold_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def release_hold(
+    hold_id: int,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(sharding.get_hold_db)
+):
+    await call(db, holds.release_hold, hold_id, current_user.id)
 
 @app.get("/movies/history", response_model=List[schemas.Booking])
-def view_history(
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+async def view_history(
+    limit: Optional[int] = Query(None, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(read_db)
+):
+    bookings, next_cursor = await call(db, sharding.fetch_history, current_user.id, limit, cursor)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    # response_model still documents the schema; the rows are encoded directly
+    return serialization.JSONBytesResponse(history.page_json(bookings), headers=headers)
+
+@app.get("/movies/history/export")
+async def export_history(
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(read_db)
 ):
-    return db.query(models.Booking).filter(models.Booking.user_id == current_user.id).all()
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        await sharding.export_history(db, current_user.id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=booking-history.{format}"}
+    )
 
 @app.get("/auth/me", response_model=schemas.User)
-def get_current_user_info(current_user: models.User = Depends(auth.get_current_user)):
+async def get_current_user_info(current_user: models.User = Depends(auth.current_user)):
     return current_user
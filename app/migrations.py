@@ -0,0 +1,82 @@
+"""Versioned schema migrations (Alembic), usable without the alembic CLI.
+
+    python -m app.migrations upgrade              # to the latest revision
+    python -m app.migrations upgrade 0001         # or to a given one
+    python -m app.migrations downgrade 0001
+    python -m app.migrations stamp 0001           # adopt a create_all database
+    python -m app.migrations current
+
+`alembic upgrade head` from the project root does the same. New revisions go
+in migrations/versions (`alembic revision --autogenerate -m "..."`).
+"""
+import argparse
+import os
+import sys
+from typing import Optional
+
+from .config import settings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def alembic_config(url: Optional[str] = None, connection=None):
+    from alembic.config import Config
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.attributes["url"] = url or settings.DATABASE_URL
+    config.attributes["configure_logger"] = False
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+def upgrade(url: Optional[str] = None, revision: str = "head") -> None:
+    from alembic import command
+    command.upgrade(alembic_config(url), revision)
+
+def downgrade(url: Optional[str], revision: str) -> None:
+    from alembic import command
+    command.downgrade(alembic_config(url), revision)
+
+def stamp(url: Optional[str], revision: str) -> None:
+    from alembic import command
+    command.stamp(alembic_config(url), revision)
+
+def current(url: Optional[str] = None) -> Optional[str]:
+    from alembic.runtime.migration import MigrationContext
+    from sqlalchemy import create_engine
+
+    engine = create_engine(url or settings.DATABASE_URL)
+    try:
+        with engine.connect() as connection:
+            return MigrationContext.configure(connection).get_current_revision()
+    finally:
+        engine.dispose()
+
+def setup_schema(engine) -> None:
+    """Startup schema step chosen by DB_SCHEMA_SETUP; "none" does nothing."""
+    if settings.DB_SCHEMA_SETUP == "migrate":
+        upgrade(engine.url.render_as_string(hide_password=False))
+    elif settings.DB_SCHEMA_SETUP == "create_all":
+        from .database import Base
+        from . import models  # noqa: F401
+        Base.metadata.create_all(bind=engine)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply or inspect schema migrations")
+    parser.add_argument("command", choices=("upgrade", "downgrade", "stamp", "current"))
+    parser.add_argument("revision", nargs="?", default="head")
+    parser.add_argument("--database-url", help="Defaults to DATABASE_URL")
+    args = parser.parse_args(argv)
+
+    if args.command == "current":
+        print(current(args.database_url) or "none")
+    elif args.command == "upgrade":
+        upgrade(args.database_url, args.revision)
+    elif args.command == "downgrade":
+        downgrade(args.database_url, args.revision)
+    else:
+        stamp(args.database_url, args.revision)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
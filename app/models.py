@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime, timezone
@@ -10,6 +10,8 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     password = Column(String)
     is_admin = Column(Boolean, default=False)
+    # Bumped to invalidate every token issued before it
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     bookings = relationship("Booking", back_populates="user")
 
 class Movie(Base):
@@ -21,6 +23,11 @@ class Movie(Base):
     available_seats = Column(Integer)
     bookings = relationship("Booking", back_populates="movie")
 
+    __table_args__ = (
+        # Catalogue order and keyset cursor
+        Index("ix_movies_showtime_id", "showtime", "id"),
+    )
+
 class Booking(Base):
     __tablename__ = "bookings"
 
@@ -29,5 +36,114 @@ class Booking(Base):
     movie_id = Column(Integer, ForeignKey("movies.id"))
     booking_time = Column(DateTime, default=lambda: datetime.now(timezone.utc))
     seats = Column(Integer)
+    # Comma-separated, on showtimes with a seat map
+    seat_labels = Column(String, nullable=True)
     user = relationship("User", back_populates="bookings")
     movie = relationship("Movie", back_populates="bookings")
+
+    __table_args__ = (
+        Index("ix_bookings_user_id_booking_time", "user_id", "booking_time"),
+        Index("ix_bookings_movie_id", "movie_id"),
+    )
+
+class SeatMap(Base):
+    __tablename__ = "seat_maps"
+
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    rows = Column(Integer, nullable=False)
+    seats_per_row = Column(Integer, nullable=False)
+    # Bit (row * seats_per_row + seat) is set when that seat is taken
+    occupancy = Column(LargeBinary, nullable=False)
+    version = Column(Integer, nullable=False, default=0)
+
+class SeatHold(Base):
+    __tablename__ = "seat_holds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    movie_id = Column(Integer, ForeignKey("movies.id"), nullable=False)
+    seats = Column(Integer, nullable=False)
+    # Comma-separated labels when the showtime has a seat map
+    seat_labels = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="held")
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_seat_holds_status_expires_at", "status", "expires_at"),
+    )
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # sha256 of caller, route and the client's Idempotency-Key header
+    key = Column(String(64), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    # NULL while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    headers = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Logouts and per-user revocations, replayed by every worker process
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    id = Column(Integer, primary_key=True)
+    # A logged-out token, or a user whose tokens older than `version` are void
+    token_id = Column(String, nullable=True)
+    user_id = Column(Integer, nullable=True)
+    version = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    # Once past, every token the row covers has expired
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Shard directory, kept on the primary database when DB_SHARD_URLS is set
+class MovieShard(Base):
+    __tablename__ = "movie_shards"
+
+    movie_id = Column(Integer, primary_key=True, autoincrement=False)
+    shard = Column(Integer, nullable=False)
+    # Set while the rebalancer copies the showtime; writes wait it out
+    moving = Column(Boolean, nullable=False, default=False)
+
+class UserShard(Base):
+    __tablename__ = "user_shards"
+
+    # Shards holding at least one of the user's bookings or holds
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+
+class IdBlock(Base):
+    __tablename__ = "id_blocks"
+
+    # Next unallocated id per table, so rows keep their id across shards
+    name = Column(String, primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+# Sales rollups, maintained in the booking transaction (see app.analytics)
+class SalesHourly(Base):
+    __tablename__ = "sales_hourly"
+
+    movie_id = Column(Integer, primary_key=True, autoincrement=False)
+    # Start of the UTC hour the bookings were made in
+    hour = Column(DateTime, primary_key=True)
+    bookings = Column(Integer, nullable=False)
+    seats = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_sales_hourly_hour", "hour"),
+    )
+
+class UserSales(Base):
+    __tablename__ = "user_sales"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    bookings = Column(Integer, nullable=False)
+    seats = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Top users without sorting the table
+        Index("ix_user_sales_bookings", "bookings"),
+    )
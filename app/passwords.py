@@ -0,0 +1,150 @@
+"""Password hashing with stdlib scrypt or PBKDF2 on a bounded worker pool.
+
+Stored format is `scheme$params$salt$hash`, so cost changes only affect new
+hashes and `needs_rehash` spots rows hashed with old parameters. Rows that
+do not match a known scheme are legacy plaintext; they still verify (in
+constant time) and are rehashed on the next successful login.
+
+hashlib releases the GIL while it derives keys, so a small thread pool runs
+hashes in parallel without blocking the event loop. The pool accepts at
+most PASSWORD_HASH_MAX_PENDING queued or running hashes and answers 503
+beyond that, instead of letting logins pile up behind each other.
+"""
+import asyncio
+import base64
+import binascii
+import functools
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from .config import settings
+from .metrics import REGISTRY
+
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+hash_seconds = REGISTRY.histogram("password_hash_seconds", "Time to hash or verify one password")
+hash_rejected_total = REGISTRY.counter(
+    "password_hash_rejected_total", "Password hashes refused because the pool queue was full"
+)
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # OpenSSL needs about 128 * r * (n + p + 2) bytes; allow some headroom
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, dklen=KEY_BYTES, maxmem=128 * r * (n + p + 2) + (1 << 20)
+    )
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=KEY_BYTES)
+
+def current_params() -> str:
+    if settings.PASSWORD_HASH_SCHEME == PBKDF2:
+        return f"{PBKDF2}${settings.PASSWORD_PBKDF2_ITERATIONS}"
+    return f"{SCRYPT}${settings.PASSWORD_SCRYPT_N}${settings.PASSWORD_SCRYPT_R}${settings.PASSWORD_SCRYPT_P}"
+
+def hash_password(password: str) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    params = current_params()
+    return f"{params}${_b64(salt)}${_b64(_derive(password, params, salt))}"
+
+def _derive(password: str, params: str, salt: bytes) -> bytes:
+    scheme, *costs = params.split("$")
+    if scheme == PBKDF2:
+        (iterations,) = costs
+        return _pbkdf2(password, salt, int(iterations))
+    n, r, p = costs
+    return _scrypt(password, salt, int(n), int(r), int(p))
+
+def is_hashed(stored: str) -> bool:
+    return stored.startswith((SCRYPT + "$", PBKDF2 + "$"))
+
+def verify(password: str, stored: str) -> bool:
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode(), stored.encode())
+    # A malformed row (or plaintext that happens to start like a hash) fails
+    # the login instead of raising
+    try:
+        params, salt, expected = stored.rsplit("$", 2)
+        derived = _derive(password, params, base64.b64decode(salt, validate=True))
+        expected = base64.b64decode(expected, validate=True)
+    except (ValueError, binascii.Error):
+        return False
+    return hmac.compare_digest(derived, expected)
+
+def needs_rehash(stored: str) -> bool:
+    return not is_hashed(stored) or stored.rsplit("$", 2)[0] != current_params()
+
+@functools.lru_cache(maxsize=4)
+def _dummy_hash(params: str) -> str:
+    return hash_password("not a real password")
+
+def dummy_hash() -> str:
+    """A hash at the current cost, verified against when the user does not
+    exist so unknown usernames take as long as wrong passwords."""
+    return _dummy_hash(current_params())
+
+class HashPool:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                hash_rejected_total.inc()
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent password checks, please retry",
+                    headers={"Retry-After": "1"}
+                )
+            self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+            executor = self._executor
+        try:
+            return executor.submit(self._timed, fn, *args)
+        except RuntimeError:
+            self._done()
+            raise
+
+    def _timed(self, fn: Callable, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            hash_seconds.observe(time.perf_counter() - start)
+            # Before the future resolves, so callers never see a stale count
+            self._done()
+
+    def _done(self) -> None:
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, fn: Callable, *args):
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def call(self, fn: Callable, *args):
+        # For sync routes, which already run on the threadpool
+        return self._submit(fn, *args).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+pool = HashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+REGISTRY.gauge("password_hash_pending", "Password hashes queued or running", callback=lambda: pool.pending)
@@ -0,0 +1,173 @@
+"""Opt-in sampling profiler and slow-query log for admins.
+
+The sampler is a daemon thread that snapshots every thread's Python stack
+(`sys._current_frames`) each interval and counts them in collapsed-stack
+format (`frame;frame;frame count`), which flamegraph.pl, speedscope and
+inferno read directly. Idle threads (parked event loop, waiting threadpool
+workers) are skipped.
+
+A session either samples everything for N seconds or, when routes are
+given, only while a sampled request on one of those routes is in flight.
+Stacks are per thread, not per request, so concurrent requests on other
+routes can appear in a route-filtered profile.
+"""
+import asyncio
+import random
+import sys
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import HTTPException, status
+from starlette.routing import Match
+from . import schemas
+from .config import settings
+
+IDLE_MODULES = {"threading", "selectors"}
+MAX_PARAMETER_LENGTH = 200
+
+def frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+def collapse(frame) -> Optional[str]:
+    if frame.f_globals.get("__name__") in IDLE_MODULES:
+        return None
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Profile:
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class Session:
+    def __init__(self, interval: float, routes: Optional[List[str]] = None, fraction: float = 1.0):
+        self.interval = interval
+        self.routes = set(routes) if routes else None
+        self.fraction = fraction
+        self.profile = Profile()
+        self.active_requests = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def wants(self, route_path: str) -> bool:
+        return route_path in self.routes and random.random() < self.fraction
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.routes is not None and not self.active_requests:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = collapse(frame)
+                if stack is not None:
+                    self.profile.stacks[stack] += 1
+                    self.profile.samples += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        self._stop.set()
+        self._thread.join()
+        return self.profile
+
+class Profiler:
+    """At most one sampling session at a time per worker."""
+
+    def __init__(self):
+        self.session: Optional[Session] = None
+
+    async def run(self, seconds: float, interval: float, routes: Optional[List[str]] = None,
+                  fraction: float = 1.0) -> Profile:
+        if not settings.PROFILING_ENABLED:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profiling is disabled"
+            )
+        if self.session is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A profiling session is already running"
+            )
+        session = self.session = Session(interval, routes, fraction)
+        session.start()
+        try:
+            await asyncio.sleep(min(seconds, settings.PROFILE_MAX_SECONDS))
+        finally:
+            self.session = None
+            profile = session.stop()
+        return profile
+
+profiler = Profiler()
+
+def matched_route(scope) -> Optional[str]:
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return None
+
+class ProfilingMiddleware:
+    """Marks requests on the session's routes as in flight; a no-op unless
+    a route-filtered session is running."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = profiler.session
+        if scope["type"] != "http" or session is None or session.routes is None:
+            await self.app(scope, receive, send)
+            return
+        path = matched_route(scope)
+        if path is None or not session.wants(path):
+            await self.app(scope, receive, send)
+            return
+        session.active_requests += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.active_requests -= 1
+
+def _short(value) -> str:
+    text = repr(value)
+    if len(text) > MAX_PARAMETER_LENGTH:
+        return text[:MAX_PARAMETER_LENGTH] + "..."
+    return text
+
+class SlowQueryLog:
+    """The most recent statements slower than SLOW_QUERY_MS, newest last."""
+
+    def __init__(self, maxlen: int):
+        self._entries = deque(maxlen=maxlen)
+
+    def record(self, statement: str, parameters, seconds: float, executemany: bool = False) -> None:
+        if settings.SLOW_QUERY_MS <= 0 or seconds * 1000 < settings.SLOW_QUERY_MS:
+            return
+        if executemany and parameters:
+            # keep the first parameter set only
+            parameters = {"rows": len(parameters), "first": parameters[0]}
+        self._entries.append(schemas.SlowQuery(
+            statement=statement,
+            parameters=_short(parameters),
+            duration_ms=round(seconds * 1000, 3),
+            at=datetime.now(timezone.utc)
+        ))
+
+    def entries(self) -> List[schemas.SlowQuery]:
+        return list(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+slow_queries = SlowQueryLog(settings.SLOW_QUERY_LOG_SIZE)
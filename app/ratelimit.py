@@ -0,0 +1,140 @@
+"""Token-bucket rate limits for the auth endpoints.
+
+A limit such as "20/60" allows a burst of 20 requests, refilled at 20 per
+60 seconds. Buckets live in a pluggable store:
+
+- MemoryStore (default): per-process, sharded by key hash so concurrent
+  requests rarely share a lock, and LRU-evicted beyond RATE_LIMIT_MAX_KEYS.
+  An evicted bucket has usually refilled anyway.
+- RedisStore: shared by all workers; one Lua script per check keeps the
+  read-refill-take atomic, and keys expire once their bucket is full again.
+  Any client with an async `eval(script, numkeys, *keys_and_args)` works.
+
+The limits are route-level dependencies, which FastAPI resolves before the
+endpoint's own parameters, so a rejected request never opens a session.
+"""
+import math
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from .config import settings
+from .metrics import REGISTRY
+
+rejected_total = REGISTRY.counter("rate_limit_rejected_total", "Requests refused by a rate limit", ("limit",))
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """"20/60" -> (burst of 20, 20/60 tokens per second)."""
+    requests, _, seconds = rate.partition("/")
+    capacity = int(requests)
+    return capacity, capacity / float(seconds or 1)
+
+class MemoryStore:
+    def __init__(self, max_keys: int, shards: int = 16, clock=time.monotonic):
+        self.clock = clock
+        self._shard_size = max(1, max_keys // shards)
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+
+    def _shard(self, key: str):
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        """Take one token; 0 when allowed, else seconds until one is available."""
+        lock, buckets = self._shard(key)
+        now = self.clock()
+        with lock:
+            tokens, updated = buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            buckets[key] = (tokens, now)
+            if len(buckets) > self._shard_size:
+                buckets.popitem(last=False)
+        return wait
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for _, buckets in self._shards)
+
+    def clear(self) -> None:
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+# KEYS[1] bucket; ARGV capacity, rate, now. Returns the wait in milliseconds.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return math.ceil(wait * 1000)
+"""
+
+class RedisStore:
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = "ratelimit:"):
+        if client is None:
+            import redis.asyncio
+            client = redis.asyncio.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        wait_ms = await self.client.eval(TAKE_SCRIPT, 1, self.prefix + key, capacity, rate, time.time())
+        return int(wait_ms) / 1000
+
+    def clear(self) -> None:
+        pass
+
+def create_store():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisStore(url=settings.RATE_LIMIT_REDIS_URL)
+    return MemoryStore(settings.RATE_LIMIT_MAX_KEYS, settings.RATE_LIMIT_SHARDS)
+
+store = create_store()
+
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+async def enforce(checks: List[Tuple[str, str, str]]) -> None:
+    """Take a token from every (limit name, key, rate) bucket; 429 if any is empty."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    for name, key, rate in checks:
+        capacity, per_second = parse_rate(rate)
+        wait = await store.take(f"{name}:{key}", capacity, per_second)
+        if wait > 0:
+            rejected_total.inc(limit=name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many attempts, please retry later",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+async def limit_login(request: Request, form_data: OAuth2PasswordRequestForm = Depends()) -> None:
+    await enforce([
+        ("login_ip", client_ip(request), settings.RATE_LIMIT_LOGIN_PER_IP),
+        ("login_user", form_data.username.lower(), settings.RATE_LIMIT_LOGIN_PER_USERNAME),
+    ])
+
+async def limit_signup(request: Request) -> None:
+    await enforce([("signup_ip", client_ip(request), settings.RATE_LIMIT_SIGNUP_PER_IP)])
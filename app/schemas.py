@@ -1,6 +1,6 @@
-from pydantic import BaseModel, ConfigDict, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class Token(BaseModel):
     access_token: str
@@ -9,6 +9,10 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: Optional[str] = None
     is_admin: Optional[bool] = None
+    user_id: Optional[int] = None
+    token_id: Optional[str] = None
+    version: int = 0
+    expires_at: Optional[float] = None
 
 class UserBase(BaseModel):
     username: str
@@ -54,4 +58,86 @@ class Booking(BookingBase):
     user_id: int
     movie_id: int
     booking_time: datetime
+    seat_labels: Optional[List[str]] = None
     model_config = ConfigDict(from_attributes=True)
+
+    @field_validator('seat_labels', mode='before')
+    @classmethod
+    def split_labels(cls, v):
+        return v.split(",") if isinstance(v, str) else v
+
+class SeatMapCreate(BaseModel):
+    rows: int = Field(gt=0, le=100)
+    seats_per_row: int = Field(gt=0, le=100)
+
+class SeatMap(BaseModel):
+    movie_id: int
+    rows: int
+    seats_per_row: int
+    available: int
+    # One string per row, "." for a free seat and "X" for a taken one
+    layout: List[str]
+
+class SeatSelection(BaseModel):
+    seats: List[str] = Field(min_length=1)
+
+    @field_validator('seats')
+    @classmethod
+    def validate_unique(cls, v):
+        if len(set(label.upper() for label in v)) != len(v):
+            raise ValueError('Seats must not repeat')
+        return v
+
+class BestSeats(BaseModel):
+    seats: List[str]
+
+class HoldCreate(BookingBase):
+    pass
+
+class Hold(BaseModel):
+    id: int
+    movie_id: int
+    seats: int
+    seat_labels: Optional[List[str]] = None
+    status: str
+    expires_at: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator('seat_labels', mode='before')
+    @classmethod
+    def split_labels(cls, v):
+        return v.split(",") if isinstance(v, str) else v
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[ImportRowError] = []
+
+class ProfileRequest(BaseModel):
+    seconds: float = Field(10, gt=0)
+    interval_ms: float = Field(5, ge=1, le=1000)
+    # Route templates such as "/movies/{movie_id}/book"; all threads when omitted
+    routes: Optional[List[str]] = None
+    fraction: float = Field(1.0, gt=0, le=1)
+
+class SlowQuery(BaseModel):
+    statement: str
+    parameters: str
+    duration_ms: float
+    at: datetime
+
+class SalesBucket(BaseModel):
+    movie_id: int
+    start: datetime
+    bookings: int
+    seats: int
+
+class UserSales(BaseModel):
+    user_id: int
+    username: Optional[str] = None
+    bookings: int
+    seats: int
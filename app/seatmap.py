@@ -0,0 +1,282 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from . import models, schemas
+from .cache import TTLCache
+from .config import settings
+
+LABEL_PATTERN = re.compile(r"^([A-Z]+)(\d+)$")
+MAX_CLAIM_ATTEMPTS = 5
+RENDER_TABLE = str.maketrans("01", ".X")
+
+@dataclass(frozen=True)
+class Occupancy:
+    """A showtime's seat map: one bit per seat, set when the seat is taken."""
+    rows: int
+    seats_per_row: int
+    bits: int
+    version: int
+
+    @property
+    def capacity(self) -> int:
+        return self.rows * self.seats_per_row
+
+    @property
+    def row_mask(self) -> int:
+        return (1 << self.seats_per_row) - 1
+
+    def free_in_row(self, row: int) -> int:
+        return ~(self.bits >> (row * self.seats_per_row)) & self.row_mask
+
+    def available(self) -> int:
+        return self.capacity - bin(self.bits).count("1")
+
+    def to_bytes(self) -> bytes:
+        return self.bits.to_bytes((self.capacity + 7) // 8, "little")
+
+    @classmethod
+    def from_row(cls, seat_map: models.SeatMap) -> "Occupancy":
+        return cls(
+            rows=seat_map.rows,
+            seats_per_row=seat_map.seats_per_row,
+            bits=int.from_bytes(seat_map.occupancy, "little"),
+            version=seat_map.version
+        )
+
+def row_label(row: int) -> str:
+    label = ""
+    row += 1
+    while row:
+        row, remainder = divmod(row - 1, 26)
+        label = chr(ord("A") + remainder) + label
+    return label
+
+def seat_label(occupancy: Occupancy, bit: int) -> str:
+    row, seat = divmod(bit, occupancy.seats_per_row)
+    return f"{row_label(row)}{seat + 1}"
+
+def parse_label(occupancy: Occupancy, label: str) -> int:
+    match = LABEL_PATTERN.match(label.strip().upper())
+    if match:
+        row = 0
+        for char in match.group(1):
+            row = row * 26 + ord(char) - ord("A") + 1
+        row, seat = row - 1, int(match.group(2)) - 1
+        if 0 <= row < occupancy.rows and 0 <= seat < occupancy.seats_per_row:
+            return row * occupancy.seats_per_row + seat
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Unknown seat {label}"
+    )
+
+def seats_mask(occupancy: Occupancy, labels: Iterable[str]) -> int:
+    mask = 0
+    for label in labels:
+        mask |= 1 << parse_label(occupancy, label)
+    return mask
+
+def mask_labels(occupancy: Occupancy, mask: int) -> List[str]:
+    labels = []
+    while mask:
+        low = mask & -mask
+        labels.append(seat_label(occupancy, low.bit_length() - 1))
+        mask ^= low
+    return labels
+
+def render(occupancy: Occupancy) -> List[str]:
+    width = occupancy.seats_per_row
+    return [
+        format((occupancy.bits >> (row * width)) & occupancy.row_mask, f"0{width}b")[::-1].translate(RENDER_TABLE)
+        for row in range(occupancy.rows)
+    ]
+
+def best_adjacent(occupancy: Occupancy, count: int) -> Optional[int]:
+    """Mask of the `count` adjacent free seats closest to the middle of the house."""
+    width = occupancy.seats_per_row
+    if count > width:
+        return None
+    middle_row = (occupancy.rows - 1) / 2
+    middle_seat = (width - count) / 2
+    best = None
+    for row in range(occupancy.rows):
+        free = occupancy.free_in_row(row)
+        # bit s of `starts` is set when seats s .. s+count-1 are all free
+        starts = free
+        for offset in range(1, count):
+            starts &= free >> offset
+        while starts:
+            low = starts & -starts
+            seat = low.bit_length() - 1
+            score = (abs(row - middle_row), abs(seat - middle_seat))
+            if best is None or score < best[0]:
+                best = (score, row, seat)
+            starts ^= low
+    if best is None:
+        return None
+    _, row, seat = best
+    return ((1 << count) - 1) << (row * width + seat)
+
+def any_free(occupancy: Occupancy, count: int) -> Optional[int]:
+    """Mask of the first `count` free seats, adjacent or not."""
+    free = ~occupancy.bits & ((1 << occupancy.capacity) - 1)
+    mask = 0
+    for _ in range(count):
+        if not free:
+            return None
+        low = free & -free
+        mask |= low
+        free ^= low
+    return mask
+
+# Occupancy per movie for the read endpoints; writes always re-read the row
+cache = TTLCache(settings.SEAT_MAP_CACHE_SIZE)
+
+def _remember(movie_id: int, occupancy: Occupancy) -> None:
+    cache.set(movie_id, occupancy, time.time() + settings.SEAT_MAP_CACHE_TTL_SECONDS)
+
+def forget(movie_id: int) -> None:
+    cache.pop(movie_id)
+
+def _not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Seat map not found"
+    )
+
+def load(db: Session, movie_id: int) -> Occupancy:
+    seat_map = db.get(models.SeatMap, movie_id, populate_existing=True)
+    if seat_map is None:
+        raise _not_found()
+    occupancy = Occupancy.from_row(seat_map)
+    _remember(movie_id, occupancy)
+    return occupancy
+
+def get(db: Session, movie_id: int) -> Occupancy:
+    occupancy = cache.get(movie_id)
+    if occupancy is None:
+        occupancy = load(db, movie_id)
+    return occupancy
+
+def create(db: Session, movie_id: int, layout: schemas.SeatMapCreate) -> Occupancy:
+    movie = db.get(models.Movie, movie_id)
+    if movie is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Movie not found"
+        )
+    if db.get(models.SeatMap, movie_id) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Seat map already exists"
+        )
+    booked = db.execute(
+        select(func.count()).select_from(models.Booking).where(models.Booking.movie_id == movie_id)
+    ).scalar_one()
+    if booked:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Movie already has bookings"
+        )
+    # Any hold still "held", even one past its deadline that the sweeper has
+    # not reached, gives its seats back later; with available_seats reset to
+    # capacity below they would be counted twice
+    held = db.execute(
+        select(func.count()).select_from(models.SeatHold)
+        .where(models.SeatHold.movie_id == movie_id, models.SeatHold.status == "held")
+    ).scalar_one()
+    if held:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Movie has seats on hold"
+        )
+
+    occupancy = Occupancy(rows=layout.rows, seats_per_row=layout.seats_per_row, bits=0, version=0)
+    db.add(models.SeatMap(
+        movie_id=movie_id,
+        rows=occupancy.rows,
+        seats_per_row=occupancy.seats_per_row,
+        occupancy=occupancy.to_bytes(),
+        version=0
+    ))
+    movie.available_seats = occupancy.capacity
+    db.commit()
+    _remember(movie_id, occupancy)
+    return occupancy
+
+def _store(db: Session, movie_id: int, occupancy: Occupancy, bits: int) -> bool:
+    result = db.execute(
+        update(models.SeatMap)
+        .where(models.SeatMap.movie_id == movie_id, models.SeatMap.version == occupancy.version)
+        .values(
+            occupancy=bits.to_bytes((occupancy.capacity + 7) // 8, "little"),
+            version=occupancy.version + 1
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 1:
+        forget(movie_id)
+        return True
+    return False
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="Seat map is busy, please retry"
+    )
+
+def claim(db: Session, movie_id: int, choose) -> List[str]:
+    """Mark seats taken with a compare-and-swap on the seat map version.
+
+    `choose(occupancy)` returns the mask to take, or raises. It is re-run on
+    the fresh seat map whenever a concurrent writer wins the race. Returns
+    the labels of the claimed seats.
+    """
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        occupancy = load(db, movie_id)
+        mask = choose(occupancy)
+        if _store(db, movie_id, occupancy, occupancy.bits | mask):
+            return mask_labels(occupancy, mask)
+    raise _busy()
+
+def release(db: Session, movie_id: int, labels: List[str]) -> None:
+    for _ in range(MAX_CLAIM_ATTEMPTS):
+        occupancy = load(db, movie_id)
+        if _store(db, movie_id, occupancy, occupancy.bits & ~seats_mask(occupancy, labels)):
+            return
+    raise _busy()
+
+def choose_labels(labels: List[str]):
+    def choose(occupancy: Occupancy) -> int:
+        mask = seats_mask(occupancy, labels)
+        taken = occupancy.bits & mask
+        if taken:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Seats already taken: {', '.join(mask_labels(occupancy, taken))}"
+            )
+        return mask
+    return choose
+
+def choose_best(count: int):
+    def choose(occupancy: Occupancy) -> int:
+        mask = best_adjacent(occupancy, count) or any_free(occupancy, count)
+        if mask is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Only {occupancy.available()} seats available"
+            )
+        return mask
+    return choose
+
+def availability(movie_id: int, occupancy: Occupancy) -> schemas.SeatMap:
+    return schemas.SeatMap(
+        movie_id=movie_id,
+        rows=occupancy.rows,
+        seats_per_row=occupancy.seats_per_row,
+        available=occupancy.available(),
+        layout=render(occupancy)
+    )
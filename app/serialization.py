@@ -0,0 +1,50 @@
+"""JSON bytes straight from column tuples, skipping per-row model validation.
+
+List endpoints select only the columns of their response schema and encode
+the rows with orjson when it is installed (stdlib json otherwise). The
+output matches what Pydantic would produce for the same schema: compact
+separators, ISO 8601 datetimes with "Z" for UTC, fields in schema order.
+"""
+import json
+from datetime import datetime
+from typing import Iterable, Sequence, Type
+from fastapi import Response
+from pydantic import BaseModel
+from .instrumentation import phase
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+def _isoformat(value: datetime) -> str:
+    text = value.isoformat()
+    if value.utcoffset() is not None and value.utcoffset().total_seconds() == 0:
+        text = text[:-6] + "Z"
+    return text
+
+def _default(value):
+    if isinstance(value, datetime):
+        return _isoformat(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    with phase("serialization"):
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        return json.dumps(content, separators=(",", ":"), ensure_ascii=False, default=_default).encode()
+
+def fields(schema: Type[BaseModel]) -> Sequence[str]:
+    return tuple(schema.model_fields)
+
+def rows_json(rows: Iterable[Sequence], names: Sequence[str]) -> bytes:
+    return dumps([dict(zip(names, row)) for row in rows])
+
+class JSONBytesResponse(Response):
+    """Like JSONResponse, but renders with `dumps` and passes bytes through."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
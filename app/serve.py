@@ -0,0 +1,194 @@
+"""Production launcher: schema setup once, then forked uvicorn workers.
+
+    python -m app.serve                        # SERVER_* settings
+    python -m app.serve --workers 8 --port 9000
+
+The parent imports the app, runs the DB_SCHEMA_SETUP step for the primary
+and every shard, binds the listening socket with SERVER_BACKLOG and forks
+SERVER_WORKERS workers (0 = one per CPU). Workers start from the parent's
+memory, so the imported code is shared copy-on-write instead of loaded once
+per worker, and their lifespan skips the schema step. Each worker serves the
+shared socket with uvloop and httptools when they are installed.
+
+The parent imports with the garbage collector off and freezes everything it
+built before forking; workers turn the collector back on, so it never
+touches the inherited objects.
+
+SIGTERM or SIGINT drains: workers stop accepting, finish in-flight requests
+for up to SERVER_GRACEFUL_TIMEOUT_SECONDS, run their shutdown and exit. A
+worker that dies is replaced. Without os.fork (Windows) one worker runs.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Dict, Optional
+
+from .config import settings
+
+# Alongside uvicorn's own messages, with its formatting
+logger = logging.getLogger("uvicorn.error")
+
+# uvicorn's exit code when the app fails to start; the launcher gives up
+STARTUP_FAILURE = 3
+# A worker that dies sooner than this after starting is replaced after a pause
+MIN_WORKER_LIFETIME_SECONDS = 1.0
+# Lifespan shutdown time allowed on top of the graceful timeout
+SHUTDOWN_MARGIN_SECONDS = 5.0
+
+def worker_count(requested: int = 0) -> int:
+    """`requested`, or one worker per CPU this process may run on."""
+    if requested > 0:
+        return requested
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def prepare():
+    """Import the app and run the schema step, once, before forking."""
+    from . import database, migrations, sharding
+    from .main import app
+
+    if settings.DB_SCHEMA_SETUP != "none":
+        engine = database.get_engine()
+        migrations.setup_schema(engine)
+        for shard in sharding.shards:
+            migrations.setup_schema(shard.engine)
+        # Pooled connections must not be shared across fork
+        engine.dispose()
+        for shard in sharding.shards:
+            shard.engine.dispose()
+    # Workers inherit this and skip the step in their lifespan
+    settings.DB_SCHEMA_SETUP = "none"
+    return app
+
+def server_config(app, host: str, port: int):
+    import uvicorn
+
+    return uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        # uvloop and httptools when installed, asyncio and h11 otherwise
+        loop="auto",
+        http="auto",
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT_SECONDS,
+        access_log=settings.SERVER_ACCESS_LOG,
+    )
+
+class Supervisor:
+    """Forks uvicorn servers on one listening socket and keeps them running."""
+
+    def __init__(self, config, workers: int):
+        self.config = config
+        self.workers = workers
+        self.children: Dict[int, float] = {}
+        self.stopping = False
+        self.deadline: Optional[float] = None
+        self.exit_code = 0
+        self.sock = None
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children[pid] = time.monotonic()
+            return
+        code = STARTUP_FAILURE
+        try:
+            # uvicorn installs its own draining handlers
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, signal.SIG_DFL)
+            # The inherited objects stay frozen; only the worker's own are collected
+            gc.enable()
+            import uvicorn
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[self.sock])
+            code = 0 if server.started else STARTUP_FAILURE
+        except BaseException:
+            logger.exception("Worker %d failed", os.getpid())
+        finally:
+            os._exit(code)
+
+    def stop(self, signum=None, frame=None) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        self.deadline = time.monotonic() + settings.SERVER_GRACEFUL_TIMEOUT_SECONDS + SHUTDOWN_MARGIN_SECONDS
+        logger.info("Draining %d workers", len(self.children))
+        self.signal_children(signal.SIGTERM)
+
+    def signal_children(self, signum: int) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self, sock) -> int:
+        self.sock = sock
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.stop)
+        # Move the preloaded objects into the permanent generation, out of
+        # collections whose writes to object headers would copy their pages
+        # into every worker
+        gc.freeze()
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("Started %d workers (parent %d)", self.workers, os.getpid())
+
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if self.deadline is not None and time.monotonic() > self.deadline:
+                    logger.warning("Killing %d workers still draining", len(self.children))
+                    self.signal_children(signal.SIGKILL)
+                    self.deadline = None
+                time.sleep(0.1)
+                continue
+            started = self.children.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == STARTUP_FAILURE:
+                logger.error("Worker %d could not start; stopping", pid)
+                self.exit_code = STARTUP_FAILURE
+                self.stop()
+                continue
+            logger.warning("Worker %d exited with %d; starting another", pid, code)
+            if time.monotonic() - started < MIN_WORKER_LIFETIME_SECONDS:
+                time.sleep(MIN_WORKER_LIFETIME_SECONDS)
+            self.spawn()
+        sock.close()
+        return self.exit_code
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the API under forked uvicorn workers")
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS, help="0 = one per CPU")
+    args = parser.parse_args(argv)
+
+    # No collections while importing, so the objects the workers inherit are
+    # not left with freed holes in their pages; each worker turns GC back on
+    gc.disable()
+    app = prepare()
+    config = server_config(app, args.host, args.port)
+    workers = worker_count(args.workers)
+    if workers == 1 or not hasattr(os, "fork"):
+        gc.enable()
+        import uvicorn
+        server = uvicorn.Server(config)
+        server.run()
+        return 0 if server.started else STARTUP_FAILURE
+    return Supervisor(config, workers).run(config.bind_socket())
+
+if __name__ == "__main__":
+    sys.exit(main())
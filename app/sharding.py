@@ -0,0 +1,623 @@
+"""Showtime sharding: each movie's seat count, seat map, holds and bookings
+live together on one of the DB_SHARD_URLS databases.
+
+The primary database (DATABASE_URL) keeps users, idempotency keys and the
+shard directory:
+
+- movie_shards maps a movie to the shard that owns it. Workers cache a
+  placement for DB_SHARD_PLACEMENT_TTL_SECONDS.
+- user_shards lists the shards a user has booked or held seats on, so
+  history only asks those shards.
+- id_blocks hands workers ranges of movie, booking and hold ids, so a row
+  keeps one id whichever shard it moves to.
+
+A booking only writes to the owning shard: the seat decrement, seat map
+claim and booking insert commit in one shard transaction, and showtimes on
+different shards never share a write path. The catalogue and history are
+scatter-gathered across shards in parallel and merged into the order a
+single database would have returned.
+
+Showtimes move between shards with the rebalancer:
+
+    python -m app.sharding status
+    python -m app.sharding move 42 1          # movie 42 to shard 1
+    python -m app.sharding rebalance --dry-run
+    python -m app.sharding adopt              # movies still on the primary
+
+Without DB_SHARD_URLS the dependencies here hand out the primary session
+(an AsyncSession with DB_ASYNC) and nothing else changes. Shard sessions and
+the primary session beside them are always sync.
+"""
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, asynccontextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+from . import models, analytics, auth, catalogue, history, live
+from .cache import TTLCache
+from .config import settings
+from .database import Base, create_labelled_engine, primary_db, read_db
+from .metrics import REGISTRY
+from .pagination import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SHARD_KEY = "shard"
+ID_BLOCK_SIZE = 1000
+DIRECTORY_CACHE_SIZE = 100000
+# Models whose ids come from id_blocks when they are written to a shard
+ALLOCATED_IDS = {models.Movie: "movies", models.Booking: "bookings", models.SeatHold: "seat_holds"}
+# A showtime's rows, parents first
+SHOWTIME_TABLES = (
+    (models.Movie.__table__, models.Movie.id),
+    (models.SeatMap.__table__, models.SeatMap.movie_id),
+    (models.SeatHold.__table__, models.SeatHold.movie_id),
+    (models.Booking.__table__, models.Booking.movie_id),
+    (models.SalesHourly.__table__, models.SalesHourly.movie_id),
+)
+
+shard_sessions_total = REGISTRY.counter("db_shard_sessions_total", "Shard sessions opened", ("shard",))
+scatter_width = REGISTRY.histogram(
+    "db_shard_scatter_width", "Shards read by one scatter-gather query", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+showtimes_moved_total = REGISTRY.counter("db_shard_showtimes_moved_total", "Showtimes moved by the rebalancer")
+
+class Shard:
+    def __init__(self, index: int, url: str):
+        self.index = index
+        self.engine = create_labelled_engine(url, f"shard{index}")
+        self.sessionmaker = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine, info={SHARD_KEY: index}
+        )
+
+    def session(self) -> Session:
+        shard_sessions_total.inc(shard=str(self.index))
+        return self.sessionmaker()
+
+class IdAllocator:
+    """Ids for shard rows, reserved from the primary ID_BLOCK_SIZE at a time."""
+
+    def __init__(self, shard_map: "ShardMap", block_size: int = ID_BLOCK_SIZE):
+        self.shard_map = shard_map
+        self.block_size = block_size
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, name: str, count: int = 1) -> List[int]:
+        ids: List[int] = []
+        with self._lock:
+            while len(ids) < count:
+                start, end = self._blocks.get(name, (0, 0))
+                if start >= end:
+                    start, end = self._reserve(name, max(self.block_size, count - len(ids)))
+                taken = min(end - start, count - len(ids))
+                ids.extend(range(start, start + taken))
+                self._blocks[name] = (start + taken, end)
+        return ids
+
+    def _reserve(self, name: str, size: int) -> Tuple[int, int]:
+        with self.shard_map.primary_session() as db:
+            for _ in range(2):
+                end = db.execute(
+                    update(models.IdBlock)
+                    .where(models.IdBlock.name == name)
+                    .values(next_id=models.IdBlock.next_id + size)
+                    .returning(models.IdBlock.next_id)
+                ).scalar_one_or_none()
+                if end is not None:
+                    db.commit()
+                    return end - size, end
+                try:
+                    with db.begin_nested():
+                        db.add(models.IdBlock(name=name, next_id=self._floor(db, name)))
+                except IntegrityError:
+                    # Another worker created the counter first
+                    pass
+        raise RuntimeError(f"Could not reserve {name} ids")
+
+    def _floor(self, db: Session, name: str) -> int:
+        # Start above every id already in use, on the primary or any shard
+        table = Base.metadata.tables[name]
+        highest = [db.execute(select(func.max(table.c.id))).scalar() or 0]
+        for shard in self.shard_map:
+            with shard.session() as shard_db:
+                highest.append(shard_db.execute(select(func.max(table.c.id))).scalar() or 0)
+        return max(highest) + 1
+
+class ShardMap:
+    def __init__(self, urls: List[str], session_factory=None):
+        self.shards = [Shard(index, url) for index, url in enumerate(urls)]
+        # Primary sessions for the directory when no request session is at hand
+        self.session_factory = session_factory
+        self.ids = IdAllocator(self)
+        self.placements = TTLCache(DIRECTORY_CACHE_SIZE)
+        self.known_users = TTLCache(DIRECTORY_CACHE_SIZE)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.shards)
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    def __iter__(self) -> Iterator[Shard]:
+        return iter(self.shards)
+
+    def __getitem__(self, index: int) -> Shard:
+        return self.shards[index]
+
+    def primary_session(self):
+        if self.session_factory is None:
+            from .database import SessionLocal
+            return SessionLocal()
+        return self.session_factory()
+
+    def place(self, movie_id: int) -> int:
+        """Shard for a new showtime; the rebalancer moves it later if needed."""
+        return movie_id % len(self.shards)
+
+    def placement(self, db: Session, movie_id: int) -> Tuple[int, bool]:
+        """(owning shard, moving) for a movie, or 404."""
+        cached = self.placements.get(movie_id)
+        if cached is None:
+            row = db.execute(
+                select(models.MovieShard.shard, models.MovieShard.moving)
+                .where(models.MovieShard.movie_id == movie_id)
+            ).first()
+            if row is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Movie not found"
+                )
+            cached = (row.shard, row.moving)
+            self.placements.set(movie_id, cached, time.time() + settings.DB_SHARD_PLACEMENT_TTL_SECONDS)
+        return cached
+
+    def owner(self, db: Session, movie_id: int) -> int:
+        """The shard to write `movie_id` to; 503 while the showtime moves."""
+        index, moving = self.placement(db, movie_id)
+        if moving:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Showtime is being moved, please retry",
+                headers={"Retry-After": "1"}
+            )
+        return index
+
+    def register_user(self, db: Session, user_id: int, index: int) -> None:
+        """Record that `user_id` has rows on shard `index`, once per worker."""
+        if self.known_users.get((user_id, index)):
+            return
+        if db.get(models.UserShard, (user_id, index)) is None:
+            try:
+                with db.begin_nested():
+                    db.add(models.UserShard(user_id=user_id, shard=index))
+            except IntegrityError:
+                pass
+            db.commit()
+        self.known_users.set((user_id, index), True, float("inf"))
+
+    def user_shards(self, db: Session, user_id: int) -> List[int]:
+        indexes = db.execute(
+            select(models.UserShard.shard).where(models.UserShard.user_id == user_id).order_by(models.UserShard.shard)
+        ).scalars().all()
+        return [index for index in indexes if index < len(self.shards)]
+
+    def gather(self, indexes: Iterable[int], fn: Callable[[Session], T]) -> List[T]:
+        """Run `fn` with a session on each shard, in parallel, in index order."""
+        indexes = list(indexes)
+        scatter_width.observe(len(indexes))
+
+        def run(index: int) -> T:
+            with self.shards[index].session() as db:
+                return fn(db)
+
+        if len(indexes) <= 1:
+            return [run(index) for index in indexes]
+        return list(self._executor().map(run, indexes))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=4 * len(self.shards), thread_name_prefix="shard-gather"
+                )
+            return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        for shard in self.shards:
+            shard.engine.dispose()
+
+shards = ShardMap([url.strip() for url in settings.DB_SHARD_URLS.split(",") if url.strip()])
+
+@event.listens_for(Session, "before_flush")
+def _allocate_ids(session, flush_context, instances):
+    if session.info.get(SHARD_KEY) is None:
+        return
+    for obj in session.new:
+        name = ALLOCATED_IDS.get(type(obj))
+        if name is not None and obj.id is None:
+            obj.id = shards.ids.take(name)[0]
+
+def assign_ids(db: Session, name: str, rows: List[dict]) -> None:
+    """Give rows bound for a Core insert on a shard their ids up front."""
+    if db.info.get(SHARD_KEY) is not None:
+        for row, row_id in zip(rows, shards.ids.take(name, len(rows))):
+            row["id"] = row_id
+
+# Dependencies. Unsharded, each one is the primary session it was given.
+# Sharded, the primary session is sync and the lookups go to the threadpool.
+
+@asynccontextmanager
+async def _shard_session(index: int):
+    shard_db = shards[index].session()
+    try:
+        yield shard_db
+    finally:
+        await run_in_threadpool(shard_db.close)
+
+async def get_movie_db(movie_id: int, db: Session = Depends(primary_db)):
+    if not shards:
+        yield db
+        return
+    index, _ = await run_in_threadpool(shards.placement, db, movie_id)
+    async with _shard_session(index) as shard_db:
+        yield shard_db
+
+async def get_movie_read_db(movie_id: int, db: Session = Depends(read_db)):
+    if not shards:
+        yield db
+        return
+    index, _ = await run_in_threadpool(shards.placement, db, movie_id)
+    async with _shard_session(index) as shard_db:
+        yield shard_db
+
+async def get_booking_db(
+    movie_id: int,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(primary_db)
+):
+    """The owning shard, for requests that book or hold seats."""
+    if not shards:
+        yield db
+        return
+    index = await run_in_threadpool(shards.owner, db, movie_id)
+    # Before the booking exists, so history never misses it
+    await run_in_threadpool(shards.register_user, db, current_user.id, index)
+    async with _shard_session(index) as shard_db:
+        yield shard_db
+
+async def get_hold_db(
+    hold_id: int,
+    current_user: models.User = Depends(auth.current_user),
+    db: Session = Depends(primary_db)
+):
+    if not shards:
+        yield db
+        return
+
+    def find(shard_db: Session) -> Optional[int]:
+        return shard_db.execute(
+            select(models.SeatHold.movie_id)
+            .where(models.SeatHold.id == hold_id, models.SeatHold.user_id == current_user.id)
+        ).scalar_one_or_none()
+
+    def owner() -> Optional[int]:
+        found = [movie_id for movie_id in shards.gather(shards.user_shards(db, current_user.id), find) if movie_id]
+        return shards.owner(db, found[0]) if found else None
+
+    index = await run_in_threadpool(owner)
+    if index is None:
+        # The primary has no holds, so the hold routes answer 404
+        yield db
+        return
+    async with _shard_session(index) as shard_db:
+        yield shard_db
+
+# Scatter-gather reads
+
+def merge_pages(pages: List[Tuple[list, Optional[str]]], limit: Optional[int], key, reverse: bool = False):
+    """Merge per-shard keyset pages, each already in `key` order, into one."""
+    rows = heapq.merge(*(page for page, _ in pages), key=key, reverse=reverse)
+    if limit is None:
+        return list(rows), None
+    page = list(itertools.islice(rows, limit))
+    more = any(next_cursor for _, next_cursor in pages) or sum(len(rows) for rows, _ in pages) > limit
+    return page, encode_cursor(*key(page[-1])) if more and page else None
+
+def fetch_movies(db: Session, query: catalogue.MovieQuery):
+    if not shards:
+        return catalogue.fetch_movies(db, query)
+    pages = shards.gather(range(len(shards)), lambda shard_db: catalogue.fetch_movies(shard_db, query))
+    return merge_pages(pages, query.limit, key=lambda row: (row.showtime, row.id))
+
+def fetch_history(db: Session, user_id: int, limit: Optional[int], cursor: Optional[str] = None):
+    if not shards:
+        return history.fetch_page(db, user_id, limit, cursor)
+    pages = shards.gather(
+        shards.user_shards(db, user_id),
+        lambda shard_db: history.fetch_page(shard_db, user_id, limit, cursor)
+    )
+    return merge_pages(pages, limit, key=lambda row: (row.booking_time, row.id), reverse=True)
+
+def _merged_history_rows(indexes: List[int], user_id: int) -> Iterator:
+    with ExitStack() as stack:
+        streams = [history.history_rows(stack.enter_context(shards[index].session()), user_id) for index in indexes]
+        yield from heapq.merge(*streams, key=lambda row: (row.booking_time, row.id), reverse=True)
+
+async def export_history(db: Session, user_id: int, fmt: str):
+    if not shards:
+        return history.export_rows(db, user_id, fmt)
+    indexes = await run_in_threadpool(shards.user_shards, db, user_id)
+    return history.render_export(_merged_history_rows(indexes, user_id), fmt)
+
+def snapshot(db: Session, movie_ids: Optional[List[int]]) -> Dict[int, int]:
+    if not shards or not movie_ids:
+        return live.snapshot(db, movie_ids)
+    by_shard = defaultdict(list)
+    for movie_id in movie_ids:
+        try:
+            by_shard[shards.placement(db, movie_id)[0]].append(movie_id)
+        except HTTPException:
+            continue
+    counts: Dict[int, int] = {}
+    for part in shards.gather(by_shard, lambda shard_db: live.snapshot(shard_db, by_shard[shard_db.info[SHARD_KEY]])):
+        counts.update(part)
+    return counts
+
+def sales(db: Session, movie_id: Optional[int], since, until) -> List[models.SalesHourly]:
+    if not shards:
+        return analytics.sales(db, movie_id, since, until)
+    indexes = range(len(shards)) if movie_id is None else [shards.placement(db, movie_id)[0]]
+    pages = shards.gather(indexes, lambda shard_db: analytics.sales(shard_db, movie_id, since, until))
+    return [row for page in pages for row in page]
+
+def top_users(db: Session, limit: int) -> List[Tuple[int, int, int]]:
+    """Sharded, the candidates are each shard's top `limit` users, summed
+    over every shard; a user spread thinly over many shards can be missed."""
+    if not shards:
+        return analytics.top_users(db, limit)
+    everywhere = range(len(shards))
+    candidates = sorted({
+        row[0] for page in shards.gather(everywhere, lambda shard_db: analytics.top_users(shard_db, limit))
+        for row in page
+    })
+    totals = defaultdict(lambda: [0, 0])
+    for page in shards.gather(everywhere, lambda shard_db: analytics.top_users(shard_db, limit, candidates)):
+        for user_id, bookings, seats in page:
+            totals[user_id][0] += bookings
+            totals[user_id][1] += seats
+    ranked = sorted(totals.items(), key=lambda item: (-item[1][0], item[0]))[:limit]
+    return [(user_id, bookings, seats) for user_id, (bookings, seats) in ranked]
+
+# Writes that create showtimes
+
+def _forget_movies(db: Session, movie_ids: List[int]) -> None:
+    """Drop directory rows whose shard insert failed."""
+    db.rollback()
+    db.execute(delete(models.MovieShard).where(models.MovieShard.movie_id.in_(movie_ids)))
+    db.commit()
+
+def create_movie(db: Session, values: dict) -> models.Movie:
+    """Insert a movie on its shard; the primary only records where it is.
+
+    The directory row commits first, so no shard holds a movie the directory
+    cannot find, and is deleted again if the shard insert fails.
+    """
+    movie_id = shards.ids.take("movies")[0]
+    index = shards.place(movie_id)
+    db.add(models.MovieShard(movie_id=movie_id, shard=index, moving=False))
+    db.commit()
+    try:
+        with shards[index].session() as shard_db:
+            movie = models.Movie(id=movie_id, **values)
+            shard_db.add(movie)
+            shard_db.commit()
+            shard_db.refresh(movie)
+            shard_db.expunge(movie)
+    except Exception:
+        _forget_movies(db, [movie_id])
+        raise
+    return movie
+
+def insert_movies(db: Session, batch: List[dict]) -> None:
+    """Bulk insert, one executemany per shard."""
+    by_shard = defaultdict(list)
+    for movie_id, movie in zip(shards.ids.take("movies", len(batch)), batch):
+        by_shard[shards.place(movie_id)].append({**movie, "id": movie_id})
+    db.execute(insert(models.MovieShard), [
+        {"movie_id": movie["id"], "shard": index, "moving": False}
+        for index, movies in by_shard.items() for movie in movies
+    ])
+    db.commit()
+    pending = dict(by_shard)
+    try:
+        for index, movies in by_shard.items():
+            with shards[index].session() as shard_db:
+                shard_db.execute(insert(models.Movie), movies)
+                shard_db.commit()
+            del pending[index]
+    except Exception:
+        _forget_movies(db, [movie["id"] for movies in pending.values() for movie in movies])
+        raise
+
+# Rebalancing
+
+def _copy_showtime(source: Session, target: Session, movie_id: int) -> Tuple[int, set]:
+    """Copy a showtime's rows; returns (rows copied, users with rows)."""
+    copied, users = 0, set()
+    for table, column in SHOWTIME_TABLES:
+        rows = [dict(row) for row in source.execute(select(table).where(column == movie_id)).mappings()]
+        if rows:
+            target.execute(insert(table), rows)
+            copied += len(rows)
+            users.update(row["user_id"] for row in rows if "user_id" in row)
+    return copied, users
+
+def _delete_showtime(db: Session, movie_id: int) -> None:
+    for table, column in reversed(SHOWTIME_TABLES):
+        db.execute(delete(table).where(column == movie_id))
+
+def move_showtime(primary: Session, movie_id: int, target: int, settle: Optional[float] = None) -> int:
+    """Move a showtime to shard `target`, returning the rows moved.
+
+    Writes are refused (503) from the moment the directory marks the
+    showtime as moving; `settle` (default DB_SHARD_PLACEMENT_TTL_SECONDS)
+    lets every worker's cached placement catch up before copying. The copy
+    holds the source movie's row lock (on SQLite, the whole source shard),
+    so a booking that was already running finishes first. The source rows
+    are deleted once the directory points at the target.
+    """
+    placement = primary.get(models.MovieShard, movie_id)
+    if placement is None:
+        raise ValueError(f"Movie {movie_id} is not on any shard")
+    source = placement.shard
+    if source == target:
+        return 0
+
+    placement.moving = True
+    primary.commit()
+    shards.placements.pop(movie_id)
+    time.sleep(settings.DB_SHARD_PLACEMENT_TTL_SECONDS if settle is None else settle)
+
+    with shards[source].session() as source_db, shards[target].session() as target_db:
+        try:
+            source_db.execute(
+                update(models.Movie).where(models.Movie.id == movie_id)
+                .values(available_seats=models.Movie.available_seats)
+            )
+            copied, users = _copy_showtime(source_db, target_db, movie_id)
+            target_db.commit()
+            for user_id in users:
+                shards.register_user(primary, user_id, target)
+        except Exception:
+            target_db.rollback()
+            source_db.rollback()
+            placement.moving = False
+            primary.commit()
+            raise
+        placement.shard, placement.moving = target, False
+        primary.commit()
+        _delete_showtime(source_db, movie_id)
+        source_db.commit()
+        # Per-user totals are split across shards; recount the users who moved
+        for db in (source_db, target_db):
+            analytics.rebuild(db, user_ids=list(users))
+
+    shards.placements.pop(movie_id)
+    catalogue.invalidate()
+    showtimes_moved_total.inc()
+    logger.info("Moved movie %d from shard %d to shard %d (%d rows)", movie_id, source, target, copied)
+    return copied
+
+def adopt(primary: Session) -> int:
+    """Move movies created before sharding from the primary to their shards."""
+    movie_ids = primary.execute(
+        select(models.Movie.id).where(~models.Movie.id.in_(select(models.MovieShard.movie_id)))
+    ).scalars().all()
+    for movie_id in movie_ids:
+        index = shards.place(movie_id)
+        with shards[index].session() as shard_db:
+            _, users = _copy_showtime(primary, shard_db, movie_id)
+            shard_db.commit()
+            analytics.rebuild(shard_db, user_ids=list(users))
+        for user_id in users:
+            shards.register_user(primary, user_id, index)
+        primary.add(models.MovieShard(movie_id=movie_id, shard=index, moving=False))
+        _delete_showtime(primary, movie_id)
+        primary.commit()
+        analytics.rebuild(primary, user_ids=list(users))
+    return len(movie_ids)
+
+def shard_loads() -> Dict[int, Dict[int, int]]:
+    """Bookings per movie on each shard; movies without bookings count 0."""
+    def load(db: Session) -> Dict[int, int]:
+        rows = db.execute(
+            select(models.Movie.id, func.count(models.Booking.id))
+            .outerjoin(models.Booking, models.Booking.movie_id == models.Movie.id)
+            .group_by(models.Movie.id)
+        ).all()
+        return dict(rows)
+    return dict(enumerate(shards.gather(range(len(shards)), load)))
+
+def plan_rebalance(loads: Dict[int, Dict[int, int]]) -> List[Tuple[int, int, int]]:
+    """Greedy (movie, source, target) moves that even out bookings per shard.
+
+    Each step moves the movie on the busiest shard whose load is closest to
+    half the gap to the quietest shard, while that still narrows the gap.
+    """
+    movies = {index: dict(load) for index, load in loads.items()}
+    totals = {index: sum(load.values()) for index, load in movies.items()}
+    moves = []
+    while len(totals) > 1:
+        busiest = max(totals, key=totals.get)
+        quietest = min(totals, key=totals.get)
+        gap = totals[busiest] - totals[quietest]
+        candidates = [
+            (abs(gap / 2 - load), movie_id, load)
+            for movie_id, load in movies[busiest].items() if 0 < load < gap
+        ]
+        if not candidates:
+            break
+        _, movie_id, load = min(candidates)
+        movies[quietest][movie_id] = movies[busiest].pop(movie_id)
+        totals[busiest] -= load
+        totals[quietest] += load
+        moves.append((movie_id, busiest, quietest))
+    return moves
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect and rebalance showtime shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Movies and bookings per shard")
+    move = commands.add_parser("move", help="Move one showtime to another shard")
+    move.add_argument("movie_id", type=int)
+    move.add_argument("shard", type=int)
+    rebalance = commands.add_parser("rebalance", help="Even out bookings across shards")
+    rebalance.add_argument("--dry-run", action="store_true")
+    commands.add_parser("adopt", help="Move movies still on the primary to their shards")
+    args = parser.parse_args(argv)
+
+    if not shards:
+        print("DB_SHARD_URLS is not set", file=sys.stderr)
+        return 1
+
+    with shards.primary_session() as primary:
+        if args.command == "status":
+            loads = shard_loads()
+            print(json.dumps({
+                f"shard{index}": {"movies": len(load), "bookings": sum(load.values())}
+                for index, load in loads.items()
+            }, indent=2))
+        elif args.command == "move":
+            print(json.dumps({"movie_id": args.movie_id, "rows": move_showtime(primary, args.movie_id, args.shard)}))
+        elif args.command == "adopt":
+            print(json.dumps({"adopted": adopt(primary)}))
+        else:
+            moves = plan_rebalance(shard_loads())
+            for movie_id, source, target in moves:
+                print(json.dumps({"movie_id": movie_id, "from": source, "to": target}))
+                if not args.dry_run:
+                    move_showtime(primary, movie_id, target)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""Compare the sync (threadpool) and async (AsyncSession) request paths.
+
+    python -m benchmarks.auth_path --requests 2000 --concurrency 50
+
+Requests rotate through login, the token lookup, the catalogue, a one-seat
+booking and a history page. Each mode runs in its own interpreter because
+DB_ASYNC is read at import time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+def run_mode(requests: int, concurrency: int) -> dict:
+    import httpx
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from app import models
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(models.User(username="bench", password="bench"))
+        movie = models.Movie(title="Bench", showtime=datetime(2030, 1, 1), available_seats=requests)
+        db.add(movie)
+        db.commit()
+        movie_id = movie.id
+
+    async def drive():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/auth/login", data={"username": "bench", "password": "bench"})
+            token = response.json()["access_token"]
+            semaphore = asyncio.Semaphore(concurrency)
+
+            cookies = {"access_token": token}
+            routes = (
+                lambda: client.post("/auth/login", data={"username": "bench", "password": "bench"}),
+                lambda: client.get("/auth/me", cookies=cookies),
+                lambda: client.get("/movies", cookies=cookies),
+                lambda: client.post(f"/movies/{movie_id}/book", json={"seats": 1}, cookies=cookies),
+                lambda: client.get("/movies/history", params={"limit": 20}, cookies=cookies),
+            )
+
+            async def one(i):
+                async with semaphore:
+                    r = await routes[i % len(routes)]()
+                    r.raise_for_status()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            return time.perf_counter() - start
+
+    elapsed = asyncio.run(drive())
+    return {
+        "db_async": os.environ.get("DB_ASYNC") == "true",
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(requests / elapsed, 1),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_mode(args.requests, args.concurrency)))
+        return 0
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for db_async in ("false", "true"):
+            # Every request comes from one client, which the login rate limit would stop
+            env = dict(os.environ, DB_ASYNC=db_async, RATE_LIMIT_ENABLED="false",
+                       DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'auth_bench.db')}")
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.auth_path", "--worker",
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                env=env, check=True, capture_output=True, text=True
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
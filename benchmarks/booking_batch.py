@@ -0,0 +1,123 @@
+"""Bookings/second: one commit per request vs the write-behind batcher.
+
+    python -m benchmarks.booking_batch --bookings 2000 --concurrency 1 8 32 128
+    python -m benchmarks.booking_batch --database-url postgresql://... --movies 4
+
+Both paths run on one event loop the way the app does: per-request bookings
+on the threadpool, batched ones through BookingBatcher. Each run checks
+that the seats sold match the bookings made.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.batcher import BookingBatcher
+from app.booking import book_seats
+from app.database import Base
+from benchmarks.loadtest import percentile
+
+def setup(database_url: str, movies: int, capacity: int):
+    connect_args = {"check_same_thread": False, "timeout": 60} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args, pool_size=64, max_overflow=0)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session() as db:
+        user = models.User(username="bench", password="bench")
+        showtimes = [
+            models.Movie(title=f"Sale {i}", showtime=datetime.now(timezone.utc) + timedelta(days=1),
+                         available_seats=capacity)
+            for i in range(movies)
+        ]
+        db.add(user)
+        db.add_all(showtimes)
+        db.commit()
+        return engine, Session, user.id, [movie.id for movie in showtimes]
+
+def per_request(Session):
+    def book(user_id, movie_id, seats):
+        with Session() as db:
+            return book_seats(db, user_id, movie_id, seats)
+
+    async def submit(user_id, movie_id, seats):
+        return await run_in_threadpool(book, user_id, movie_id, seats)
+    return submit
+
+async def drive(submit, user_id, movie_ids, bookings: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], {"booked": 0, "rejected": 0, "error": 0}
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await submit(user_id, movie_ids[i % len(movie_ids)], 1)
+                outcomes["booked"] += 1
+            except HTTPException:
+                outcomes["rejected"] += 1
+            except Exception:
+                outcomes["error"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(bookings)))
+    return time.perf_counter() - start, sorted(latencies), outcomes
+
+def run(database_url: str, mode: str, bookings: int, concurrency: int, movies: int) -> dict:
+    engine, Session, user_id, movie_ids = setup(database_url, movies, capacity=bookings)
+
+    async def main():
+        if mode == "batched":
+            batcher = BookingBatcher(session_factory=Session)
+            result = await drive(batcher.book, user_id, movie_ids, bookings, concurrency)
+            await batcher.stop()
+            return result
+        return await drive(per_request(Session), user_id, movie_ids, bookings, concurrency)
+
+    elapsed, latencies, outcomes = asyncio.run(main())
+    with Session() as db:
+        sold = db.execute(select(func.coalesce(func.sum(models.Booking.seats), 0))).scalar_one()
+        left = db.execute(select(func.sum(models.Movie.available_seats))).scalar_one()
+    engine.dispose()
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "bookings_per_s": round(bookings / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        **outcomes,
+        "consistent": sold == outcomes["booked"] and sold + left == bookings * movies,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--movies", type=int, default=1, help="Showtimes the bookings are spread over")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'booking_batch.db')}"
+        for concurrency in args.concurrency:
+            for mode in ("per_request", "batched"):
+                results.append(run(database_url, mode, args.bookings, concurrency, args.movies))
+
+    print(json.dumps({"database": database_url.split(":", 1)[0], "bookings": args.bookings,
+                      "movies": args.movies, "results": results}, indent=2))
+    return 0 if all(result["consistent"] and not result["error"] for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Fire many parallel bookings at a single movie and check nothing is oversold.
+
+    python -m benchmarks.booking_contention --bookings 5000 --concurrency 64
+
+`--mode legacy` runs the old read-check-write booking for comparison.
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.booking import book_seats
+from app.database import Base
+
+def legacy_book(db, user_id, movie_id, seats):
+    movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+    if movie.available_seats < seats:
+        raise HTTPException(status_code=400, detail="sold out")
+    movie.available_seats -= seats
+    db.add(models.Booking(user_id=user_id, movie_id=movie_id, seats=seats))
+    db.commit()
+
+def run(database_url: str, bookings: int, concurrency: int, capacity: int,
+        seats_per_booking: int, mode: str) -> dict:
+    connect_args = {"check_same_thread": False, "timeout": 60} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args, pool_size=concurrency, max_overflow=0)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with Session() as db:
+        user = models.User(username="bench", password="bench")
+        movie = models.Movie(
+            title="Premiere",
+            showtime=datetime.now(timezone.utc) + timedelta(days=1),
+            available_seats=capacity
+        )
+        db.add_all([user, movie])
+        db.commit()
+        user_id, movie_id = user.id, movie.id
+
+    book = book_seats if mode == "atomic" else legacy_book
+
+    def attempt(_):
+        with Session() as db:
+            try:
+                book(db, user_id, movie_id, seats_per_booking)
+                return "booked"
+            except HTTPException:
+                return "rejected"
+            except Exception:
+                return "error"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(attempt, range(bookings)))
+    elapsed = time.perf_counter() - start
+
+    with Session() as db:
+        remaining = db.execute(
+            select(models.Movie.available_seats).where(models.Movie.id == movie_id)
+        ).scalar_one()
+        sold = db.execute(
+            select(func.coalesce(func.sum(models.Booking.seats), 0)).where(models.Booking.movie_id == movie_id)
+        ).scalar_one()
+    engine.dispose()
+
+    return {
+        "mode": mode,
+        "database": engine.url.get_backend_name(),
+        "bookings": bookings,
+        "concurrency": concurrency,
+        "capacity": capacity,
+        "booked": outcomes.count("booked"),
+        "rejected": outcomes.count("rejected"),
+        "errors": outcomes.count("error"),
+        "seats_sold": sold,
+        "seats_remaining": remaining,
+        "oversold": sold > capacity or sold + remaining != capacity,
+        "elapsed_s": round(elapsed, 3),
+        "bookings_per_s": round(bookings / elapsed, 1),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default="sqlite:///./bench_booking.db")
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--capacity", type=int, default=1000)
+    parser.add_argument("--seats-per-booking", type=int, default=1)
+    parser.add_argument("--mode", choices=["atomic", "legacy"], default="atomic")
+    args = parser.parse_args(argv)
+
+    result = run(args.database_url, args.bookings, args.concurrency, args.capacity,
+                 args.seats_per_booking, args.mode)
+    print(json.dumps(result, indent=2))
+    return 1 if result["oversold"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
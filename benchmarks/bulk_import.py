@@ -0,0 +1,85 @@
+"""Rows/second for loading a movie schedule: one commit per row vs bulk import.
+
+    python -m benchmarks.bulk_import --rows 20000
+    python -m benchmarks.bulk_import --database-url postgresql://... --rows 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.bulk_import import MovieImporter
+from app.database import Base
+
+def synthetic_rows(count: int):
+    start = datetime(2030, 1, 1, 10, 0)
+    for i in range(count):
+        yield i + 1, {
+            "title": f"Showtime {i}",
+            "showtime": (start + timedelta(minutes=15 * i)).isoformat(),
+            "available_seats": 100 + i % 200,
+        }
+
+def per_row(Session, rows: int) -> float:
+    start = time.perf_counter()
+    with Session() as db:
+        for _, row in synthetic_rows(rows):
+            movie = models.Movie(
+                title=row["title"],
+                showtime=datetime.fromisoformat(row["showtime"]),
+                available_seats=row["available_seats"]
+            )
+            db.add(movie)
+            db.commit()
+            db.refresh(movie)
+    return time.perf_counter() - start
+
+def bulk(Session, rows: int, batch_size: int) -> float:
+    start = time.perf_counter()
+    with Session() as db:
+        importer = MovieImporter(db, batch_size=batch_size)
+        importer.add_many(synthetic_rows(rows))
+        importer.finish()
+    return time.perf_counter() - start
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--per-row-rows", type=int, default=2000,
+                        help="Rows for the (slow) one-commit-per-row baseline")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bulk.db')}"
+        engine = create_engine(url)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        results = []
+        for name, rows, run in (
+            ("per_row_commit", args.per_row_rows, lambda: per_row(Session, args.per_row_rows)),
+            ("bulk_import", args.rows, lambda: bulk(Session, args.rows, args.batch_size)),
+        ):
+            Base.metadata.drop_all(bind=engine)
+            Base.metadata.create_all(bind=engine)
+            elapsed = run()
+            results.append({
+                "mode": name,
+                "database": engine.url.get_backend_name(),
+                "rows": rows,
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_s": round(rows / elapsed, 1),
+            })
+        engine.dispose()
+    print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""Compare two loadtest JSON results and flag regressions.
+
+    python -m benchmarks.compare results/base.json results/head.json --threshold 10
+
+Exits non-zero when any endpoint's p50/p95/p99 latency grew, or its RPS
+dropped, by more than the threshold percentage.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+def compare(base: dict, head: dict, threshold: float) -> list:
+    rows = []
+    for name, after in sorted(head["endpoints"].items()):
+        before = base["endpoints"].get(name)
+        if before is None:
+            continue
+        for key in LATENCY_KEYS + ("rps",):
+            old, new = before[key], after[key]
+            change = ((new - old) / old * 100) if old else 0.0
+            worse = change > threshold if key in LATENCY_KEYS else change < -threshold
+            rows.append({"endpoint": name, "metric": key, "base": old, "head": new,
+                         "change_pct": round(change, 1), "regression": worse})
+    return rows
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as handle:
+        base = json.load(handle)
+    with open(args.head) as handle:
+        head = json.load(handle)
+
+    rows = compare(base, head, args.threshold)
+    for row in rows:
+        flag = "REGRESSION" if row["regression"] else ""
+        print(f"{row['endpoint']:<26} {row['metric']:<7} {row['base']:>10} -> {row['head']:>10} "
+              f"({row['change_pct']:+.1f}%) {flag}")
+    return 1 if any(row["regression"] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
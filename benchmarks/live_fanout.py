@@ -0,0 +1,65 @@
+"""Memory per idle live subscriber and time to fan one update out.
+
+    python -m benchmarks.live_fanout --subscribers 50000 --movies 200
+
+Each subscriber is parked in `next_updates` like an idle SSE/WebSocket
+client. Memory is what tracemalloc attributes to the feed, the subscribers
+and the task parked on each; the server's own per-connection state comes on
+top.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+
+from app.live import SeatFeed, Subscriber
+
+async def run(subscribers: int, movies: int, rounds: int) -> dict:
+    feed = SeatFeed(coalesce=0, max_subscribers=subscribers)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    clients = [Subscriber([i % movies], {i % movies: 1000}) for i in range(subscribers)]
+    for client in clients:
+        feed.subscribe(client)
+    waiters = [asyncio.ensure_future(client.next_updates(3600)) for client in clients]
+    await asyncio.sleep(0)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+
+    fanout = []
+    for seats in range(999, 999 - rounds, -1):
+        start = time.perf_counter()
+        for movie_id in range(movies):
+            feed.publish(movie_id, seats)
+        feed._flush()
+        fanout.append(time.perf_counter() - start)
+        # Let the woken clients take their updates and park again
+        await asyncio.sleep(0)
+        for i, client in enumerate(clients):
+            if waiters[i].done():
+                waiters[i] = asyncio.ensure_future(client.next_updates(3600))
+
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    return {
+        "subscribers": subscribers,
+        "movies": movies,
+        "bytes_per_subscriber": round(per_subscriber),
+        "fanout_ms_all_movies": round(min(fanout) * 1000, 2),
+        "offers_per_s": round(subscribers / min(fanout)),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=50000)
+    parser.add_argument("--movies", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(run(args.subscribers, args.movies, args.rounds)), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Latency and throughput benchmark for the whole API.
+
+Virtual users log in, then loop over a weighted mix of list movies / book /
+history requests. The app runs in-process over ASGI or under uvicorn with
+several workers. Per-endpoint p50/p95/p99 latency and RPS are written as JSON
+so runs from different commits can be compared with benchmarks.compare.
+
+    python -m benchmarks.loadtest --target inprocess --users 50 --duration 20
+    python -m benchmarks.loadtest --target uvicorn --workers 4 --output results/uvicorn.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List
+
+DEFAULT_MIX = "movies=5,book=2,history=3"
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = int(weight or 1)
+    unknown = set(weights) - {"movies", "book", "history", "me"}
+    if unknown:
+        raise ValueError(f"Unknown mix entries: {', '.join(sorted(unknown))}")
+    return weights
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # nearest-rank
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> dict:
+    endpoints = {}
+    for name in sorted(set(samples) | set(errors)):
+        values = sorted(samples.get(name, []))
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "total_requests": total,
+        "total_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+async def virtual_user(client, user_index: int, movie_ids: List[int], mix: Dict[str, int],
+                       deadline: float, samples, errors, rng: random.Random) -> None:
+    from benchmarks import seed as seeding
+
+    async def timed(name, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception:
+            errors[name] += 1
+            return None
+        if response.status_code >= 400:
+            errors[name] += 1
+        else:
+            samples[name].append(time.perf_counter() - start)
+        return response
+
+    response = await timed("POST /auth/login", "POST", "/auth/login",
+                           data={"username": seeding.username(user_index), "password": seeding.PASSWORD})
+    if response is None or response.status_code != 200:
+        return
+    client.cookies.set("access_token", response.json()["access_token"])
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.perf_counter() < deadline:
+        action = rng.choices(names, weights)[0]
+        if action == "movies":
+            await timed("GET /movies", "GET", "/movies", params={"limit": 50})
+        elif action == "book":
+            movie_id = rng.choice(movie_ids)
+            await timed("POST /movies/{id}/book", "POST", f"/movies/{movie_id}/book", json={"seats": 1})
+        elif action == "history":
+            await timed("GET /movies/history", "GET", "/movies/history", params={"limit": 50})
+        elif action == "me":
+            await timed("GET /auth/me", "GET", "/auth/me")
+
+async def drive(make_client, users: int, seeded_users: int, movie_ids: List[int], mix: Dict[str, int],
+                duration: float, seed_value: int) -> dict:
+    samples: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    clients = [make_client() for _ in range(users)]
+    start = time.perf_counter()
+    deadline = start + duration
+    try:
+        await asyncio.gather(*(
+            virtual_user(client, i % seeded_users, movie_ids, mix, deadline, samples, errors,
+                         random.Random(seed_value + i))
+            for i, client in enumerate(clients)
+        ))
+    finally:
+        for client in clients:
+            await client.aclose()
+    return summarize(samples, errors, time.perf_counter() - start)
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _wait_for_server(url: str, process, timeout: float = 30.0) -> None:
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if httpx.get(url + "/").status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("uvicorn did not start in time")
+
+def run(target: str, database_url: str, users: int, duration: float, mix: Dict[str, int], workers: int,
+        seed_users: int, seed_movies: int, seed_bookings: int, seed_value: int = 42) -> dict:
+    import httpx
+
+    # app.config reads DATABASE_URL at import time, so point it at the
+    # benchmark database before anything imports the app
+    os.environ["DATABASE_URL"] = database_url
+    # All virtual users share one client IP, which the login rate limit would stop
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    from benchmarks import seed as seeding
+
+    seeded = seeding.seed(database_url, seed_users, seed_movies, seed_bookings, seed_value=seed_value)
+    movie_ids = list(range(1, seed_movies + 1))
+    config = {
+        "target": target,
+        "workers": workers if target == "uvicorn" else 1,
+        "users": users,
+        "duration_s": duration,
+        "mix": mix,
+        "seed": seeded,
+        "database": database_url.split(":", 1)[0],
+    }
+
+    if target == "inprocess":
+        from app.main import app
+        transport = httpx.ASGITransport(app=app)
+
+        def make_client():
+            return httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+
+        result = asyncio.run(drive(make_client, users, seed_users, movie_ids, mix, duration, seed_value))
+    else:
+        port = _free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = dict(os.environ, DATABASE_URL=database_url, RATE_LIMIT_ENABLED="false")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(workers), "--log-level", "warning"],
+            env=env
+        )
+        try:
+            _wait_for_server(base_url, process)
+            limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+
+            def make_client():
+                return httpx.AsyncClient(base_url=base_url, limits=limits)
+
+            result = asyncio.run(drive(make_client, users, seed_users, movie_ids, mix, duration, seed_value))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+    return {"meta": _meta(), "config": config, **result}
+
+def _meta() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "cpus": os.cpu_count(),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn worker processes")
+    parser.add_argument("--database-url", help="Defaults to a throwaway SQLite file")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted actions, e.g. movies=5,book=2,history=3")
+    parser.add_argument("--seed-users", type=int, default=200)
+    parser.add_argument("--seed-movies", type=int, default=50)
+    parser.add_argument("--seed-bookings", type=int, default=5000)
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        result = run(args.target, database_url, args.users, args.duration, parse_mix(args.mix), args.workers,
+                     args.seed_users, args.seed_movies, args.seed_bookings)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""Seed users, movies and bookings for benchmarks at a configurable scale.
+
+    python -m benchmarks.seed --database-url sqlite:///./bench.db --users 1000 --movies 200 --bookings 20000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+
+PASSWORD = "loadpass"
+
+def username(i: int) -> str:
+    return f"loaduser{i}"
+
+def seed(database_url: str, users: int, movies: int, bookings: int, seats_per_movie: int = 100000,
+         batch_size: int = 5000, seed_value: int = 42) -> dict:
+    engine = create_engine(database_url)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(seed_value)
+    start = time.perf_counter()
+
+    def chunks(rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    showtime = datetime(2030, 1, 1, 10, 0)
+    with Session() as db:
+        for batch in chunks({"username": username(i), "password": PASSWORD, "is_admin": False}
+                            for i in range(users)):
+            db.execute(insert(models.User), batch)
+        for batch in chunks({"title": f"Load Movie {i}", "showtime": showtime + timedelta(minutes=30 * i),
+                             "available_seats": seats_per_movie} for i in range(movies)):
+            db.execute(insert(models.Movie), batch)
+        db.commit()
+
+        user_ids = db.execute(select(models.User.id)).scalars().all()
+        movie_ids = db.execute(select(models.Movie.id)).scalars().all()
+        booked_at = datetime(2029, 1, 1)
+        for batch in chunks({"user_id": rng.choice(user_ids), "movie_id": rng.choice(movie_ids),
+                             "seats": rng.randint(1, 4), "booking_time": booked_at + timedelta(seconds=i)}
+                            for i in range(bookings if user_ids and movie_ids else 0)):
+            db.execute(insert(models.Booking), batch)
+        db.commit()
+    engine.dispose()
+
+    return {
+        "users": users,
+        "movies": movies,
+        "bookings": bookings,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--movies", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=20000)
+    args = parser.parse_args(argv)
+    print(json.dumps(seed(args.database_url, args.users, args.movies, args.bookings), indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Rows/second for serializing a movie list: ORM rows validated through
+schemas.Movie (the old /movies path) vs column tuples encoded directly.
+
+    python -m benchmarks.serialization --rows 50000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models, schemas, serialization
+from app.catalogue import MOVIE_COLUMNS, MOVIE_FIELDS
+from app.database import Base
+
+movie_list_adapter = TypeAdapter(List[schemas.Movie])
+
+def seed(Session, rows: int) -> None:
+    start = datetime(2030, 1, 1, 10, 0)
+    with Session() as db:
+        db.execute(insert(models.Movie), [
+            {"title": f"Showtime {i}", "showtime": start + timedelta(minutes=15 * i), "available_seats": 100 + i % 200}
+            for i in range(rows)
+        ])
+        db.commit()
+
+def validated(db) -> bytes:
+    movies = db.execute(select(models.Movie).order_by(models.Movie.showtime, models.Movie.id)).scalars().all()
+    return movie_list_adapter.dump_json(movie_list_adapter.validate_python(movies))
+
+def direct(db) -> bytes:
+    rows = db.execute(select(*MOVIE_COLUMNS).order_by(models.Movie.showtime, models.Movie.id)).all()
+    return serialization.rows_json(rows, MOVIE_FIELDS)
+
+def measure(Session, render, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        with Session() as db:
+            start = time.perf_counter()
+            body = render(db)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {"best_s": round(best, 4), "bytes": len(body)}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{os.path.join(tmp, 'serialization.db')}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine, tables=[models.Movie.__table__])
+        Session = sessionmaker(bind=engine)
+        seed(Session, args.rows)
+
+        with Session() as db:
+            if validated(db) != direct(db):
+                print("Outputs differ", file=sys.stderr)
+                return 1
+        results = {name: measure(Session, render, args.repeat)
+                   for name, render in (("validated", validated), ("direct", direct))}
+        engine.dispose()
+
+    for result in results.values():
+        result["rows_per_s"] = round(args.rows / result["best_s"])
+    print(json.dumps({
+        "rows": args.rows,
+        "encoder": "orjson" if serialization.orjson is not None else "json",
+        **results,
+        "speedup": round(results["validated"]["best_s"] / results["direct"]["best_s"], 2),
+    }, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
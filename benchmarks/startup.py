@@ -0,0 +1,121 @@
+"""Startup time and per-worker memory: `uvicorn --workers` vs `python -m app.serve`.
+
+    python -m benchmarks.startup --workers 4 --runs 3
+
+uvicorn spawns fresh interpreters that each import the app and run the
+schema step; app.serve does both once and forks. For each launcher this
+reports the time until every worker has finished startup, the time to drain
+on SIGTERM, and the average RSS and PSS of a worker (Linux only). PSS splits
+shared pages between the processes sharing them, so it is the better measure
+of what each extra worker really costs.
+
+The database is migrated before timing: uvicorn workers migrating an empty
+database at the same time fail on each other's tables.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+LAUNCHERS = {
+    "uvicorn": lambda port, workers: [
+        sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers),
+    ],
+    "app.serve": lambda port, workers: [
+        sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+    ],
+}
+READY = "Application startup complete"
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def children(pid: int) -> List[int]:
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name can contain spaces; the parent pid follows it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            with open(f"/proc/{entry}/cmdline") as f:
+                cmdline = f.read()
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid and "resource_tracker" not in cmdline:
+            found.append(int(entry))
+    return found
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    usage = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss"):
+                usage[name.lower()] = int(rest.split()[0])
+    return usage
+
+def run_once(launcher: str, workers: int, env: dict) -> dict:
+    with tempfile.TemporaryFile("w+") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            LAUNCHERS[launcher](_free_port(), workers), env=env, stdout=log, stderr=subprocess.STDOUT, text=True
+        )
+        try:
+            while True:
+                log.seek(0)
+                if log.read().count(READY) >= workers:
+                    break
+                if process.poll() is not None or time.perf_counter() - start > 60:
+                    log.seek(0)
+                    raise RuntimeError(f"{launcher} did not start:\n{log.read()}")
+                time.sleep(0.01)
+            ready = time.perf_counter() - start
+            # Let the workers settle before sampling their memory
+            time.sleep(1)
+            usage = [memory_kb(pid) for pid in children(process.pid)] if sys.platform == "linux" else []
+        finally:
+            stop = time.perf_counter()
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+        return {
+            "ready_s": ready,
+            "drain_s": time.perf_counter() - stop,
+            "worker_rss_kb": statistics.mean(u["rss"] for u in usage) if usage else None,
+            "worker_pss_kb": statistics.mean(u["pss"] for u in usage) if usage else None,
+        }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for launcher in LAUNCHERS:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, launcher + '.db')}",
+                       DB_SCHEMA_SETUP="migrate")
+            subprocess.run([sys.executable, "-m", "app.migrations", "upgrade"], env=env, check=True)
+            runs = [run_once(launcher, args.workers, env) for _ in range(args.runs)]
+            result = {"launcher": launcher, "workers": args.workers, "runs": args.runs}
+            for key in runs[0]:
+                values = [run[key] for run in runs if run[key] is not None]
+                result[key] = round(statistics.median(values), 3) if values else None
+            results.append(result)
+    print(json.dumps(results, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""Indexes for per-movie booking lookups and the showtime-ordered catalogue
+
+- bookings(movie_id): per-movie reports and seat reconciliation no longer
+  scan every booking.
+- movies(showtime, id): the catalogue's ORDER BY showtime, id, its showtime
+  range filters and its keyset cursor walk the index instead of sorting.
+
+History's bookings(user_id, booking_time) index is added in 0005.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _concurrently() -> dict:
+    # Build without blocking bookings on a live PostgreSQL database; that
+    # cannot run inside a transaction, hence the autocommit block
+    if op.get_bind().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True}
+    return {}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index("ix_bookings_movie_id", "bookings", ["movie_id"], **_concurrently())
+        op.create_index("ix_movies_showtime_id", "movies", ["showtime", "id"], **_concurrently())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_movies_showtime_id", table_name="movies", **_concurrently())
+        op.drop_index("ix_bookings_movie_id", table_name="bookings", **_concurrently())
@@ -0,0 +1,54 @@
+"""Shard directory tables
+
+- movie_shards: the shard owning each showtime, and whether it is moving.
+- user_shards: the shards a user has bookings or holds on, for history.
+- id_blocks: id ranges handed out to workers, so ids are unique across shards.
+
+They stay empty unless DB_SHARD_URLS is set.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "movie_shards",
+        sa.Column("movie_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("shard", sa.Integer(), nullable=False),
+        sa.Column("moving", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("movie_id"),
+    )
+    op.create_table(
+        "user_shards",
+        sa.Column("user_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("shard", sa.Integer(), autoincrement=False, nullable=False),
+        sa.PrimaryKeyConstraint("user_id", "shard"),
+    )
+    op.create_table(
+        "id_blocks",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("next_id", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("id_blocks")
+    op.drop_table("user_shards")
+    op.drop_table("movie_shards")
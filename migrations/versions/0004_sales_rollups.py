@@ -0,0 +1,53 @@
+"""Sales rollup tables for the admin analytics endpoints
+
+- sales_hourly: bookings and seats per movie per UTC hour.
+- user_sales: bookings and seats per user, indexed for top-N reads.
+
+Both are filled by `python -m app.analytics rebuild` for bookings made
+before this revision; new bookings update them in their own transaction.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "sales_hourly",
+        sa.Column("movie_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("hour", sa.DateTime(), nullable=False),
+        sa.Column("bookings", sa.Integer(), nullable=False),
+        sa.Column("seats", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("movie_id", "hour"),
+    )
+    op.create_index("ix_sales_hourly_hour", "sales_hourly", ["hour"])
+    op.create_table(
+        "user_sales",
+        sa.Column("user_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("bookings", sa.Integer(), nullable=False),
+        sa.Column("seats", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index("ix_user_sales_bookings", "user_sales", ["bookings"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_user_sales_bookings", table_name="user_sales")
+    op.drop_table("user_sales")
+    op.drop_index("ix_sales_hourly_hour", table_name="sales_hourly")
+    op.drop_table("sales_hourly")
@@ -0,0 +1,48 @@
+"""Index for the keyset-paginated booking history
+
+- bookings(user_id, booking_time): history pages walk the index.
+
+Databases migrated from an earlier baseline that already built it keep
+theirs.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _concurrently() -> dict:
+    # Build without blocking bookings on a live PostgreSQL database; that
+    # cannot run inside a transaction, hence the autocommit block
+    if op.get_bind().dialect.name == "postgresql":
+        return {"postgresql_concurrently": True}
+    return {}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    indexes = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("bookings")}
+    if "ix_bookings_user_id_booking_time" in indexes:
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_bookings_user_id_booking_time", "bookings", ["user_id", "booking_time"], **_concurrently()
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_bookings_user_id_booking_time", table_name="bookings", **_concurrently())
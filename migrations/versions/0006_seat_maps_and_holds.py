@@ -0,0 +1,64 @@
+"""Seat maps and time-limited seat holds
+
+- seat_maps: one occupancy bitmap per seated movie.
+- seat_holds: holds awaiting confirmation, indexed by (status, expires_at)
+  for the expiry sweeper.
+
+Tables that an earlier baseline already created are left alone.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "seat_maps" not in existing:
+        op.create_table(
+            "seat_maps",
+            sa.Column("movie_id", sa.Integer(), nullable=False),
+            sa.Column("rows", sa.Integer(), nullable=False),
+            sa.Column("seats_per_row", sa.Integer(), nullable=False),
+            sa.Column("occupancy", sa.LargeBinary(), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(["movie_id"], ["movies.id"]),
+            sa.PrimaryKeyConstraint("movie_id"),
+        )
+
+    if "seat_holds" not in existing:
+        op.create_table(
+            "seat_holds",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("movie_id", sa.Integer(), nullable=False),
+            sa.Column("seats", sa.Integer(), nullable=False),
+            sa.Column("seat_labels", sa.String(), nullable=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(["movie_id"], ["movies.id"]),
+            sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_seat_holds_id", "seat_holds", ["id"])
+        op.create_index("ix_seat_holds_status_expires_at", "seat_holds", ["status", "expires_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("seat_holds")
+    op.drop_table("seat_maps")
@@ -0,0 +1,37 @@
+"""Seat labels on bookings
+
+- bookings.seat_labels: the seats a booking holds on a showtime with a seat
+  map, comma-separated. Bookings made before this revision have none.
+
+Skipped when `create_all` already added the column.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("bookings")}
+    if "seat_labels" in columns:
+        return
+    op.add_column("bookings", sa.Column("seat_labels", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("bookings") as batch_op:
+        batch_op.drop_column("seat_labels")
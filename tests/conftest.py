@@ -11,7 +11,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from app.main import app
 from app.database import Base, get_db
 from app.models import User, Movie, Booking
-from app.auth import create_access_token
+from app.auth import create_access_token, token_cache, revocations
+from app import catalogue, seatmap, ratelimit, idempotency
 
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test.db"
 
@@ -30,6 +31,16 @@ def db_engine():
     # Drop all tables after tests
     Base.metadata.drop_all(bind=engine)
 
+@pytest.fixture(autouse=True)
+def reset_caches():
+    yield
+    token_cache.clear()
+    revocations.clear()
+    catalogue.cache.clear()
+    seatmap.cache.clear()
+    ratelimit.store.clear()
+    idempotency.store.cache.clear()
+
 @pytest.fixture(scope="function")
 def db_session(db_engine):
     connection = db_engine.connect()
@@ -0,0 +1,84 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+from fastapi import status
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import analytics, models
+from app.batcher import BookingRequest, apply_batch
+
+pytestmark = pytest.mark.bookings
+
+def rollups(db_session):
+    return analytics.current_rollups(db_session)
+
+def add_booking(db_session, user, movie, seats, booking_time):
+    db_session.add(models.Booking(user_id=user.id, movie_id=movie.id, seats=seats, booking_time=booking_time))
+    db_session.commit()
+
+def test_bookings_update_the_rollups(authenticated_client, db_session, test_user, test_movie):
+    authenticated_client.post(f"/movies/{test_movie.id}/book", json={"seats": 3})
+    hold = authenticated_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 2}).json()
+    authenticated_client.post(f"/holds/{hold['id']}/confirm")
+    apply_batch(db_session, [BookingRequest(test_user.id, test_movie.id, 4)])
+
+    hourly, users = rollups(db_session)
+
+    assert sum(bookings for bookings, _ in hourly.values()) == 3
+    assert sum(seats for _, seats in hourly.values()) == 9
+    assert users[test_user.id] == (3, 9)
+    assert analytics.verify(db_session) == {"sales_hourly": 0, "user_sales": 0}
+
+def test_sales_are_bucketed_by_hour_and_day(db_session, test_user, test_movie):
+    for hour, seats in ((9, 1), (9, 2), (14, 3)):
+        add_booking(db_session, test_user, test_movie, seats, datetime(2030, 1, 1, hour, 30))
+    add_booking(db_session, test_user, test_movie, 5, datetime(2030, 1, 2, 9, 0))
+
+    rows = analytics.sales(db_session, test_movie.id, since=datetime(2030, 1, 1), until=datetime(2030, 1, 2))
+
+    assert [(bucket["start"].hour, bucket["bookings"], bucket["seats"]) for bucket in analytics.buckets(rows, "hour")] == [
+        (9, 2, 3), (14, 1, 3)
+    ]
+    assert [(bucket["start"], bucket["seats"]) for bucket in analytics.buckets(rows, "day")] == [
+        (datetime(2030, 1, 1), 6)
+    ]
+
+def test_top_users_are_ranked_by_bookings(db_session, test_user, test_admin, test_movie):
+    moment = datetime(2030, 1, 1, 12)
+    add_booking(db_session, test_user, test_movie, 1, moment)
+    add_booking(db_session, test_admin, test_movie, 10, moment)
+    add_booking(db_session, test_admin, test_movie, 1, moment)
+
+    ranked = analytics.name_users(db_session, analytics.top_users(db_session, 10))
+
+    assert [(row["username"], row["bookings"], row["seats"]) for row in ranked] == [
+        ("testadmin", 2, 11), ("testuser", 1, 1)
+    ]
+
+def test_verify_finds_drift_and_rebuild_repairs_it(db_session, test_user, test_movie):
+    add_booking(db_session, test_user, test_movie, 2, datetime(2030, 1, 1, 12, 15))
+    db_session.get(models.UserSales, test_user.id).seats = 99
+    db_session.query(models.SalesHourly).delete()
+    db_session.commit()
+
+    assert analytics.verify(db_session) == {"sales_hourly": 1, "user_sales": 1}
+    assert analytics.rebuild(db_session) == {"sales_hourly": 1, "user_sales": 1}
+    assert analytics.verify(db_session) == {"sales_hourly": 0, "user_sales": 0}
+    assert db_session.get(models.SalesHourly, (test_movie.id, datetime(2030, 1, 1, 12))).seats == 2
+
+def test_admin_analytics_endpoints(admin_client, db_session, test_user, test_movie):
+    add_booking(db_session, test_user, test_movie, 4, datetime(2030, 1, 1, 20, 5))
+
+    sales = admin_client.get("/admin/analytics/sales", params={"movie_id": test_movie.id, "bucket": "day"})
+    top = admin_client.get("/admin/analytics/top-users", params={"limit": 1})
+
+    assert sales.status_code == status.HTTP_200_OK
+    assert sales.json() == [{"movie_id": test_movie.id, "start": "2030-01-01T00:00:00", "bookings": 1, "seats": 4}]
+    assert top.json() == [{"user_id": test_user.id, "username": "testuser", "bookings": 1, "seats": 4}]
+    assert admin_client.get("/admin/analytics/sales", params={"bucket": "week"}).status_code == 422
+
+def test_analytics_endpoints_are_admin_only(authenticated_client):
+    assert authenticated_client.get("/admin/analytics/sales").status_code == status.HTTP_403_FORBIDDEN
+    assert authenticated_client.get("/admin/analytics/top-users").status_code == status.HTTP_403_FORBIDDEN
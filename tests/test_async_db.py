@@ -0,0 +1,112 @@
+import pytest
+import sys
+import os
+import asyncio
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
+from app.auth import authenticate, create_access_token, get_current_user_async
+from app.config import settings
+from app.database import Base, async_database_url, get_db
+from app.main import app
+from app.models import Movie, User
+
+pytestmark = pytest.mark.auth
+
+@pytest.mark.unit
+@pytest.mark.parametrize("url,expected", [
+    ("sqlite:///./app.db", "sqlite+aiosqlite:///./app.db"),
+    ("postgresql://user:pw@db:5432/app", "postgresql+asyncpg://user:pw@db:5432/app"),
+    ("sqlite+aiosqlite:///./app.db", "sqlite+aiosqlite:///./app.db"),
+])
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+@pytest.fixture
+def async_session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        async with factory() as db:
+            db.add(User(username="asyncuser", password="asyncpass", is_admin=False))
+            await db.commit()
+        return factory
+
+    yield asyncio.run(setup())
+    asyncio.run(engine.dispose())
+
+def test_authenticate_async(async_session_factory):
+    async def run():
+        async with async_session_factory() as db:
+            assert (await authenticate(db, "asyncuser", "asyncpass")).username == "asyncuser"
+            assert await authenticate(db, "asyncuser", "wrong") is None
+
+    asyncio.run(run())
+
+def test_get_current_user_async(async_session_factory):
+    token = create_access_token(data={"sub": "asyncuser"}, user_is_admin=False)
+
+    async def run():
+        async with async_session_factory() as db:
+            user = await get_current_user_async(access_token=token, db=db)
+            assert user.username == "asyncuser"
+            with pytest.raises(HTTPException):
+                await get_current_user_async(access_token=None, db=db)
+
+    asyncio.run(run())
+
+@pytest.fixture
+def async_client(tmp_path, monkeypatch):
+    # No pooling: the setup and TestClient run on different event loops
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'routes.db'}", poolclass=NullPool)
+    factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with factory() as db:
+            user = User(username="asyncuser", password="x")
+            movie = Movie(title="Async", showtime=datetime(2030, 1, 1), available_seats=10)
+            db.add_all([user, movie])
+            await db.commit()
+            return user.id, movie.id
+
+    user_id, movie_id = asyncio.run(setup())
+
+    async def override():
+        async with factory() as db:
+            yield db
+
+    # The routes get the AsyncSession that DB_ASYNC would hand them; tokens
+    # carry the user, so the sync token lookup is not needed
+    app.dependency_overrides[get_db] = override
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    with TestClient(app) as client:
+        client.cookies.set("access_token", create_access_token({"sub": "asyncuser", "uid": user_id}, False))
+        yield client, movie_id
+    app.dependency_overrides.clear()
+    asyncio.run(engine.dispose())
+
+def test_routes_run_on_an_async_session(async_client):
+    client, movie_id = async_client
+
+    assert client.post(f"/movies/{movie_id}/book", json={"seats": 2}).status_code == 200
+    hold = client.post(f"/movies/{movie_id}/holds", json={"seats": 3}).json()
+    assert client.post(f"/holds/{hold['id']}/confirm").status_code == 200
+
+    assert client.get("/movies").json()[0]["available_seats"] == 5
+    assert [booking["seats"] for booking in client.get("/movies/history").json()] == [3, 2]
+    export = client.get("/movies/history/export", params={"format": "csv"})
+    assert export.text.splitlines()[0] == "id,user_id,movie_id,seats,booking_time"
+    assert len(export.text.splitlines()) == 3
@@ -5,7 +5,8 @@ from fastapi import status
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.auth import verify_password
+from sqlalchemy.orm import sessionmaker
+from app.auth import TokenRevocations, verify_password
 
 pytestmark = pytest.mark.auth
 
@@ -69,3 +70,49 @@ def test_get_current_user(client, user_token):
     )
     assert response.status_code == status.HTTP_200_OK
     assert response.json()["username"] == "testuser"
+
+def test_logout_revokes_token(client, test_user):
+    response = client.post(
+        "/auth/login",
+        data={"username": "testuser", "password": "testpass123"}
+    )
+    token = response.json()["access_token"]
+
+    client.post("/auth/logout", cookies={"access_token": token})
+
+    response = client.get("/auth/me", cookies={"access_token": token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def _login(client, username="testuser", password="testpass123"):
+    response = client.post("/auth/login", data={"username": username, "password": password})
+    return response.json()["access_token"]
+
+def test_logout_everywhere_revokes_every_token(client, test_user):
+    first, second = _login(client), _login(client)
+
+    response = client.post("/auth/logout-all", cookies={"access_token": first})
+    assert response.status_code == status.HTTP_200_OK
+
+    for token in (first, second):
+        assert client.get("/auth/me", cookies={"access_token": token}).status_code == status.HTTP_401_UNAUTHORIZED
+    assert client.get("/auth/me", cookies={"access_token": _login(client)}).status_code == status.HTTP_200_OK
+
+def test_admin_revokes_user_tokens(client, test_user, admin_token):
+    token = _login(client)
+
+    response = client.post(f"/admin/users/{test_user.id}/revoke-tokens", cookies={"access_token": admin_token})
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert client.get("/auth/me", cookies={"access_token": token}).status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post("/admin/users/9999/revoke-tokens", cookies={"access_token": admin_token})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_revocations_reach_other_workers(client, db_session, test_user, admin_token):
+    client.post("/auth/logout", cookies={"access_token": _login(client)})
+    client.post(f"/admin/users/{test_user.id}/revoke-tokens", cookies={"access_token": admin_token})
+
+    # Another worker only sees the table
+    worker = TokenRevocations(session_factory=sessionmaker(bind=db_session.connection()))
+    assert worker.sync() == 2
+    assert worker.version(test_user.id) == 1
+    assert len(worker._denied) == 1
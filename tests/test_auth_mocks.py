@@ -2,12 +2,13 @@ import pytest
 import sys
 import os
 from unittest.mock import MagicMock, patch
-from fastapi import status
+from fastapi import status, HTTPException
 from datetime import datetime, timedelta, timezone
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.auth import create_access_token, get_current_user, authenticate_user
+from app.auth import create_access_token, get_current_user, authenticate_user, Principal, revocations
+from app.config import settings
 from app.models import User
 
 pytestmark = pytest.mark.auth
@@ -21,7 +22,7 @@ def test_create_access_token():
     assert len(token) > 0
 
 @pytest.mark.unit
-@patch('app.auth.jwt.decode')
+@patch('jose.jwt.decode')
 def test_get_current_user_valid_token(mock_decode, db_session):
     mock_decode.return_value = {
         "sub": "testuser",
@@ -86,3 +87,24 @@ def test_authenticate_user_nonexistent_user(db_session):
     result = authenticate_user(db_mock, "nonexistent", "password")
     
     assert result is None
+
+@pytest.mark.unit
+def test_get_current_user_stateless_skips_db(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    token = create_access_token(data={"sub": "testuser", "uid": 42}, user_is_admin=True)
+
+    db_mock = MagicMock()
+    result = get_current_user(access_token=token, db=db_mock)
+
+    assert result == Principal(id=42, username="testuser", is_admin=True)
+    db_mock.query.assert_not_called()
+
+@pytest.mark.unit
+def test_get_current_user_stateless_rejects_revoked_user(monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_STATELESS", True)
+    token = create_access_token(data={"sub": "testuser", "uid": 43}, user_is_admin=False)
+    revocations.revoke_user(43)
+
+    with pytest.raises(HTTPException) as exc_info:
+        get_current_user(access_token=token, db=MagicMock())
+    assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
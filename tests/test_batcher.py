@@ -0,0 +1,88 @@
+import pytest
+import sys
+import os
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime
+from fastapi import HTTPException, status
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import batcher as batching, models, schemas, seatmap
+from app.batcher import BookingBatcher, BookingRequest, apply_batch
+from app.config import settings
+
+pytestmark = pytest.mark.bookings
+
+def requests_for(user, movie, *seats):
+    return [BookingRequest(user.id, movie.id, count) for count in seats]
+
+def test_batch_commits_all_bookings_that_fit(db_session, test_user, test_movie):
+    outcomes = apply_batch(db_session, requests_for(test_user, test_movie, 2, 3, 5))
+
+    assert [outcome.seats for outcome in outcomes] == [2, 3, 5]
+    assert len({outcome.id for outcome in outcomes}) == 3
+    db_session.refresh(test_movie)
+    assert test_movie.available_seats == 90
+    assert db_session.query(models.Booking).filter(models.Booking.movie_id == test_movie.id).count() == 3
+
+def test_batch_fills_in_arrival_order_without_overselling(db_session, test_user, movie_with_low_seats):
+    outcomes = apply_batch(db_session, requests_for(test_user, movie_with_low_seats, 3, 4, 2, 1))
+
+    assert isinstance(outcomes[0], schemas.Booking)
+    assert isinstance(outcomes[1], HTTPException)
+    assert outcomes[1].detail == "Only 2 seats available"
+    assert isinstance(outcomes[2], schemas.Booking)
+    assert isinstance(outcomes[3], HTTPException)
+    assert outcomes[3].detail == "Only 0 seats available"
+    db_session.refresh(movie_with_low_seats)
+    assert movie_with_low_seats.available_seats == 0
+
+def test_batch_isolates_unknown_movies(db_session, test_user, test_movie):
+    batch = [BookingRequest(test_user.id, 99999, 1), BookingRequest(test_user.id, test_movie.id, 1)]
+    outcomes = apply_batch(db_session, batch)
+
+    assert outcomes[0].status_code == status.HTTP_404_NOT_FOUND
+    assert outcomes[1].movie_id == test_movie.id
+
+def test_batch_assigns_seats_on_seated_showtimes(db_session, test_user):
+    movie = models.Movie(title="Seated", showtime=datetime(2030, 1, 1), available_seats=0)
+    db_session.add(movie)
+    db_session.commit()
+    seatmap.create(db_session, movie.id, schemas.SeatMapCreate(rows=1, seats_per_row=4))
+
+    outcomes = apply_batch(db_session, requests_for(test_user, movie, 2, 2, 1))
+
+    assert [type(outcome) for outcome in outcomes] == [schemas.Booking, schemas.Booking, HTTPException]
+    assert seatmap.load(db_session, movie.id).available() == 0
+    stored = db_session.query(models.Booking).filter_by(movie_id=movie.id).order_by(models.Booking.id).all()
+    assert [booking.seat_labels for booking in stored] == [",".join(o.seat_labels) for o in outcomes[:2]]
+
+def test_batcher_resolves_each_future(db_session, test_user, movie_with_low_seats):
+    batcher = BookingBatcher(session_factory=lambda: nullcontext(db_session), window=0.01)
+
+    async def book_all():
+        results = await asyncio.gather(
+            *(batcher.book(test_user.id, movie_with_low_seats.id, 2) for _ in range(3)),
+            return_exceptions=True
+        )
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(book_all())
+
+    assert sum(isinstance(result, schemas.Booking) for result in results) == 2
+    assert sum(isinstance(result, HTTPException) for result in results) == 1
+    assert batching.batch_size.count() >= 1
+
+def test_book_route_uses_batcher_when_enabled(authenticated_client, db_session, test_movie, monkeypatch):
+    monkeypatch.setattr(settings, "BOOKING_BATCH_ENABLED", True)
+    monkeypatch.setattr(batching.batcher, "session_factory", lambda: nullcontext(db_session))
+
+    response = authenticated_client.post(f"/movies/{test_movie.id}/book", json={"seats": 2})
+    too_many = authenticated_client.post(f"/movies/{test_movie.id}/book", json={"seats": 500})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["seats"] == 2
+    assert too_many.status_code == status.HTTP_400_BAD_REQUEST
+    assert too_many.json()["detail"] == "Only 98 seats available"
@@ -52,3 +52,69 @@ def test_view_booking_history(client, test_booking, user_token):
     assert response.status_code == status.HTTP_200_OK
     assert len(response.json()) > 0
     assert response.json()[0]["seats"] == test_booking.seats
+
+def test_booking_reduces_available_seats(authenticated_client, db_session, movie_with_low_seats):
+    response = authenticated_client.post(
+        f"/movies/{movie_with_low_seats.id}/book",
+        json={"seats": 5}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = authenticated_client.post(
+        f"/movies/{movie_with_low_seats.id}/book",
+        json={"seats": 1}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Only 0 seats available" in response.text
+
+@pytest.mark.slow
+def test_concurrent_bookings_never_oversell(tmp_path):
+    from benchmarks.booking_contention import run
+
+    result = run(f"sqlite:///{tmp_path / 'contention.db'}", bookings=200, concurrency=8,
+                 capacity=50, seats_per_booking=1, mode="atomic")
+    assert not result["oversold"]
+    assert result["booked"] == 50
+    assert result["errors"] == 0
+
+@pytest.fixture
+def long_history(db_session, test_user, test_movie):
+    from datetime import datetime, timedelta
+    from app.models import Booking
+    start = datetime(2030, 1, 1, 12, 0)
+    bookings = [
+        Booking(user_id=test_user.id, movie_id=test_movie.id, seats=i + 1,
+                booking_time=start + timedelta(minutes=i))
+        for i in range(5)
+    ]
+    db_session.add_all(bookings)
+    db_session.commit()
+    return bookings
+
+def test_view_booking_history_pagination(authenticated_client, long_history):
+    response = authenticated_client.get("/movies/history", params={"limit": 2})
+    assert [b["seats"] for b in response.json()] == [5, 4]
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = authenticated_client.get("/movies/history", params={"limit": 2, "cursor": cursor})
+    assert [b["seats"] for b in response.json()] == [3, 2]
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = authenticated_client.get("/movies/history", params={"limit": 2, "cursor": cursor})
+    assert [b["seats"] for b in response.json()] == [1]
+    assert "X-Next-Cursor" not in response.headers
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_booking_history(authenticated_client, long_history, fmt):
+    import csv
+    import io
+    import json
+
+    response = authenticated_client.get("/movies/history/export", params={"format": fmt})
+    assert response.status_code == status.HTTP_200_OK
+
+    if fmt == "ndjson":
+        rows = [json.loads(line) for line in response.text.splitlines()]
+    else:
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["seats"]) for row in rows] == [5, 4, 3, 2, 1]
@@ -0,0 +1,64 @@
+import pytest
+import sys
+import os
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.cache import TTLCache
+from app.auth import create_access_token, get_current_user, revoke_access_token, token_cache
+from app.models import User
+
+pytestmark = pytest.mark.unit
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, clock=clock)
+    cache.set("a", 1, expires_at=1010.0)
+
+    assert cache.get("a") == 1
+    clock.now = 1010.0
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, clock=FakeClock())
+    cache.set("a", 1, expires_at=2000.0)
+    cache.set("b", 2, expires_at=2000.0)
+    cache.get("a")
+    cache.set("c", 3, expires_at=2000.0)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+def test_ttl_cache_disabled_when_maxsize_zero():
+    cache = TTLCache(maxsize=0)
+    cache.set("a", 1, expires_at=float("inf"))
+    assert cache.get("a") is None
+
+@pytest.mark.auth
+def test_get_current_user_caches_lookup():
+    token = create_access_token(data={"sub": "cacheduser"}, user_is_admin=False)
+    db_mock = MagicMock()
+    db_mock.query.return_value.filter.return_value.first.return_value = User(
+        id=7, username="cacheduser", password="x", is_admin=False
+    )
+
+    get_current_user(access_token=token, db=db_mock)
+    principal = get_current_user(access_token=token, db=db_mock)
+
+    assert principal.id == 7
+    assert db_mock.query.call_count == 1
+
+    revoke_access_token(db_mock, token)
+    assert len(token_cache) == 0
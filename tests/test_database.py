@@ -0,0 +1,69 @@
+import pytest
+import sys
+import os
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.database import (
+    InstrumentedQueuePool, InstrumentedAsyncQueuePool, engine_options,
+    pool_checkout_seconds, pool_overflow_total, pool_connections_in_use
+)
+
+pytestmark = pytest.mark.unit
+
+def test_engine_options_use_pool_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 12)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 3)
+    options = engine_options("postgresql://user:pw@db/app")
+
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["pool_size"] == 12
+    assert options["max_overflow"] == 3
+    assert options["pool_pre_ping"] == settings.DB_POOL_PRE_PING
+    assert engine_options("postgresql+asyncpg://db/app", is_async=True)["poolclass"] is InstrumentedAsyncQueuePool
+
+def test_engine_options_behind_external_pooler(monkeypatch):
+    monkeypatch.setattr(settings, "DB_EXTERNAL_POOLER", True)
+
+    assert engine_options("postgresql://db/app") == {"poolclass": NullPool}
+    async_options = engine_options("postgresql+asyncpg://db/app", is_async=True)
+    assert async_options["connect_args"]["statement_cache_size"] == 0
+
+def test_engine_options_leave_memory_sqlite_alone():
+    assert engine_options("sqlite://") == {}
+
+def test_instrumented_pool_records_checkouts_and_overflow(tmp_path):
+    class TestPool(InstrumentedQueuePool):
+        metrics_label = "test"
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TestPool,
+                           pool_size=1, max_overflow=1)
+    first = engine.connect()
+    second = engine.connect()
+    second.execute(text("SELECT 1"))
+
+    assert engine.pool.checkedout() == 2
+    assert pool_checkout_seconds.count(pool="test") == 2
+    assert pool_overflow_total.value(pool="test") == 1
+    assert pool_connections_in_use.value(pool="test") == 2
+
+    first.close()
+    assert pool_connections_in_use.value(pool="test") == 1
+    second.close()
+    assert pool_connections_in_use.value(pool="test") == 0
+    engine.dispose()
+
+def test_connections_in_use_are_reported_per_pool(tmp_path):
+    class ShardPool(InstrumentedQueuePool):
+        metrics_label = "shard7"
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=ShardPool, pool_size=1)
+    primary = pool_connections_in_use.value(pool="primary")
+    with engine.connect():
+        assert pool_connections_in_use.value(pool="shard7") == 1
+        assert pool_connections_in_use.value(pool="primary") == primary
+        assert 'db_pool_connections_in_use{pool="shard7"} 1' in pool_connections_in_use.render()
+    engine.dispose()
@@ -0,0 +1,150 @@
+import pytest
+import sys
+import os
+import asyncio
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from fastapi import status
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import holds
+from app.models import Movie, SeatHold
+
+pytestmark = pytest.mark.bookings
+
+def available_seats(db_session, movie):
+    db_session.expire_all()
+    return db_session.get(Movie, movie.id).available_seats
+
+def test_hold_and_confirm(authenticated_client, db_session, test_movie):
+    response = authenticated_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 4})
+    assert response.status_code == status.HTTP_201_CREATED
+    hold = response.json()
+    assert hold["status"] == "held"
+    assert available_seats(db_session, test_movie) == 96
+
+    response = authenticated_client.post(f"/holds/{hold['id']}/confirm")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["seats"] == 4
+    assert available_seats(db_session, test_movie) == 96
+
+    response = authenticated_client.post(f"/holds/{hold['id']}/confirm")
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+def test_release_hold_returns_seats(authenticated_client, db_session, test_movie):
+    hold = authenticated_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 10}).json()
+
+    response = authenticated_client.delete(f"/holds/{hold['id']}")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert available_seats(db_session, test_movie) == 100
+
+def test_hold_on_seated_movie_claims_seats(admin_client, db_session, test_movie):
+    admin_client.post(f"/admin/movies/{test_movie.id}/seatmap", json={"rows": 2, "seats_per_row": 4})
+    hold = admin_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 2}).json()
+    assert hold["seat_labels"] == ["A2", "A3"]
+
+    admin_client.delete(f"/holds/{hold['id']}")
+    assert admin_client.get(f"/movies/{test_movie.id}/seats").json()["layout"] == ["....", "...."]
+
+    hold = admin_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 2}).json()
+    booking = admin_client.post(f"/holds/{hold['id']}/confirm").json()
+    assert booking["seat_labels"] == hold["seat_labels"] == ["A2", "A3"]
+
+def test_seat_map_waits_for_holds_to_settle(admin_client, test_movie):
+    hold = admin_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 3}).json()
+
+    response = admin_client.post(f"/admin/movies/{test_movie.id}/seatmap", json={"rows": 2, "seats_per_row": 4})
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.json()["detail"] == "Movie has seats on hold"
+
+    admin_client.delete(f"/holds/{hold['id']}")
+    response = admin_client.post(f"/admin/movies/{test_movie.id}/seatmap", json={"rows": 2, "seats_per_row": 4})
+    assert response.status_code == status.HTTP_201_CREATED
+    assert admin_client.get(f"/movies/{test_movie.id}/seats").json()["available"] == 8
+
+def test_expired_hold_is_swept(authenticated_client, db_session, test_movie):
+    hold = authenticated_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 5}).json()
+
+    assert holds.expire_due(db_session, now=holds.utcnow()) == 0
+    assert holds.expire_due(db_session, now=holds.utcnow() + timedelta(days=1)) == 1
+    assert available_seats(db_session, test_movie) == 100
+    assert db_session.get(SeatHold, hold["id"]).status == "expired"
+
+    response = authenticated_client.post(f"/holds/{hold['id']}/confirm")
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+def test_hold_not_found_for_other_user(client, db_session, test_movie, user_token, admin_token):
+    client.cookies.set("access_token", user_token)
+    hold = client.post(f"/movies/{test_movie.id}/holds", json={"seats": 1}).json()
+
+    client.cookies.set("access_token", admin_token)
+    response = client.post(f"/holds/{hold['id']}/confirm")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.unit
+def test_sweeper_sleeps_until_next_deadline():
+    sweeper = holds.HoldSweeper(interval=30)
+    assert sweeper.next_delay(now=1000.0) == 30
+
+    sweeper.schedule(datetime(2030, 1, 1))
+    deadline = sweeper._deadlines[0]
+    assert sweeper.next_delay(now=deadline - 5) == 5
+    assert sweeper.next_delay(now=deadline + 5) == 0
+
+@pytest.mark.unit
+def test_sweeper_keeps_one_entry_per_deadline():
+    sweeper = holds.HoldSweeper(interval=30)
+    # Created here, then found again by every sweep until it falls due
+    for _ in range(3):
+        sweeper.schedule(datetime(2030, 1, 1))
+    sweeper.schedule(datetime(2030, 1, 2))
+
+    assert len(sweeper._deadlines) == 2
+
+def test_sweep_counts_unsettled_holds(authenticated_client, db_session, test_user, test_movie):
+    sweeper = holds.HoldSweeper(session_factory=lambda: nullcontext(db_session))
+    hold = authenticated_client.post(f"/movies/{test_movie.id}/holds", json={"seats": 2}).json()
+    # Made by another worker: only in the table
+    db_session.add(SeatHold(user_id=test_user.id, movie_id=test_movie.id, seats=1, status="held",
+                            created_at=holds.utcnow(), expires_at=holds.utcnow() + timedelta(minutes=5)))
+    db_session.commit()
+
+    sweeper._sweep()
+    assert holds.holds_active.value() == 2
+
+    authenticated_client.delete(f"/holds/{hold['id']}")
+    sweeper._sweep()
+    assert holds.holds_active.value() == 1
+
+@pytest.mark.slow
+def test_sweeper_task_expires_due_holds(tmp_path):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.database import Base
+    from app.models import User
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'holds.db'}", connect_args={"check_same_thread": False})
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session() as db:
+        user = User(username="holder", password="x")
+        movie = Movie(title="Held", showtime=datetime(2030, 1, 1), available_seats=7)
+        db.add_all([user, movie])
+        db.commit()
+        now = holds.utcnow()
+        db.add(SeatHold(user_id=user.id, movie_id=movie.id, seats=3, status="held",
+                        created_at=now, expires_at=now - timedelta(seconds=1)))
+        db.commit()
+        movie_id = movie.id
+
+    async def run():
+        sweeper = holds.HoldSweeper(session_factory=Session, interval=0.05)
+        sweeper.start()
+        await asyncio.sleep(0.3)
+        await sweeper.stop()
+
+    asyncio.run(run())
+    with Session() as db:
+        assert db.get(Movie, movie_id).available_seats == 10
+    engine.dispose()
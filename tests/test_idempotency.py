@@ -0,0 +1,181 @@
+import pytest
+import sys
+import os
+import asyncio
+import time
+from contextlib import nullcontext
+from fastapi import status
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import idempotency, models
+from app.idempotency import IdempotencyMiddleware, IdempotencyStore, IN_PROGRESS
+
+pytestmark = pytest.mark.api
+
+@pytest.fixture(autouse=True)
+def idempotency_store(db_session, monkeypatch):
+    monkeypatch.setattr(idempotency.store, "session_factory", lambda: nullcontext(db_session))
+    return idempotency.store
+
+def book(client, movie, seats=2, key="retry-1"):
+    return client.post(f"/movies/{movie.id}/book", json={"seats": seats}, headers={"Idempotency-Key": key})
+
+def test_retried_booking_is_replayed(authenticated_client, db_session, test_movie):
+    first = book(authenticated_client, test_movie)
+    retry = book(authenticated_client, test_movie)
+
+    assert first.status_code == status.HTTP_200_OK
+    assert retry.status_code == status.HTTP_200_OK
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    db_session.refresh(test_movie)
+    assert test_movie.available_seats == 98
+    assert db_session.query(models.Booking).filter_by(movie_id=test_movie.id).count() == 1
+
+def test_replay_survives_the_worker_cache(authenticated_client, idempotency_store, test_movie):
+    first = book(authenticated_client, test_movie)
+    idempotency_store.cache.clear()
+
+    retry = book(authenticated_client, test_movie)
+
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+
+def test_distinct_keys_book_twice(authenticated_client, db_session, test_movie):
+    book(authenticated_client, test_movie, key="a")
+    book(authenticated_client, test_movie, key="b")
+
+    db_session.refresh(test_movie)
+    assert test_movie.available_seats == 96
+
+def test_key_reused_for_another_request_is_rejected(authenticated_client, test_movie):
+    book(authenticated_client, test_movie, seats=2)
+    response = book(authenticated_client, test_movie, seats=3)
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+def test_keys_are_scoped_per_caller(client, db_session, test_user, test_admin, user_token, admin_token, test_movie):
+    client.post(f"/movies/{test_movie.id}/book", json={"seats": 1}, headers={"Idempotency-Key": "same"},
+                cookies={"access_token": user_token})
+    client.post(f"/movies/{test_movie.id}/book", json={"seats": 1}, headers={"Idempotency-Key": "same"},
+                cookies={"access_token": admin_token})
+
+    db_session.refresh(test_movie)
+    assert test_movie.available_seats == 98
+
+def test_client_errors_are_replayed(authenticated_client, db_session, movie_with_low_seats):
+    rejected = book(authenticated_client, movie_with_low_seats, seats=6)
+    movie_with_low_seats.available_seats = 10
+    db_session.commit()
+    replayed = book(authenticated_client, movie_with_low_seats, seats=6)
+
+    assert rejected.status_code == status.HTTP_400_BAD_REQUEST
+    assert replayed.status_code == status.HTTP_400_BAD_REQUEST
+    assert replayed.headers["idempotent-replayed"] == "true"
+
+def test_unauthorized_attempts_release_the_key(client, db_session, test_movie, user_token):
+    unauthorized = book(client, test_movie)
+    client.cookies.set("access_token", user_token)
+    booked = book(client, test_movie)
+
+    assert unauthorized.status_code == status.HTTP_401_UNAUTHORIZED
+    assert booked.status_code == status.HTTP_200_OK
+    assert db_session.query(models.IdempotencyKey).filter(models.IdempotencyKey.status_code.is_(None)).count() == 0
+
+def test_signup_and_create_movie_are_idempotent(client, admin_client, db_session):
+    created = [
+        admin_client.post("/admin/movies", headers={"Idempotency-Key": "m1"}, json={
+            "title": "Retry Movie", "showtime": "2030-01-01T20:00:00Z", "available_seats": 50
+        })
+        for _ in range(2)
+    ]
+    client.cookies.clear()
+    signups = [
+        client.post("/auth/signup", headers={"Idempotency-Key": "s1"},
+                    json={"username": "retrier", "password": "retrypass1"})
+        for _ in range(2)
+    ]
+
+    assert [response.status_code for response in created] == [201, 201]
+    assert created[0].json() == created[1].json()
+    assert db_session.query(models.Movie).filter_by(title="Retry Movie").count() == 1
+    assert [response.status_code for response in signups] == [201, 201]
+    assert signups[1].headers["idempotent-replayed"] == "true"
+
+def test_other_routes_and_requests_without_a_key_pass_through(authenticated_client, db_session, test_movie):
+    authenticated_client.post(f"/movies/{test_movie.id}/book", json={"seats": 1})
+    authenticated_client.get("/movies", headers={"Idempotency-Key": "ignored"})
+
+    assert db_session.query(models.IdempotencyKey).count() == 0
+
+def test_overlong_key_is_rejected(authenticated_client, test_movie):
+    response = book(authenticated_client, test_movie, key="k" * 256)
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_claim_reports_keys_held_elsewhere(db_session):
+    store = IdempotencyStore(session_factory=lambda: nullcontext(db_session), ttl=60)
+
+    assert store.claim("k", "fp") is None
+    assert store.claim("k", "fp") == IN_PROGRESS
+    store.release("k")
+    assert store.claim("k", "fp") is None
+
+def test_expired_keys_can_be_claimed_again(db_session):
+    store = IdempotencyStore(session_factory=lambda: nullcontext(db_session), ttl=-1, lease=-1)
+
+    assert store.claim("k", "fp") is None
+    assert store.claim("k", "other") is None
+    assert db_session.get(models.IdempotencyKey, "k").fingerprint == "other"
+
+def test_stale_claims_lapse_but_saved_responses_last(db_session):
+    store = IdempotencyStore(session_factory=lambda: nullcontext(db_session), ttl=3600, lease=-1)
+
+    # A claim whose request never finished (worker killed) is taken over
+    assert store.claim("crashed", "fp") is None
+    assert store.claim("crashed", "fp") is None
+
+    assert store.claim("done", "fp") is None
+    store.save("done", idempotency.StoredResponse("fp", 201, [], b"{}", time.time() + store.ttl))
+    store.cache.clear()
+    assert isinstance(store.claim("done", "fp"), idempotency.StoredResponse)
+
+def test_concurrent_duplicates_share_one_run(db_session, monkeypatch):
+    monkeypatch.setattr(idempotency, "matched_route", lambda scope: "/auth/signup")
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(await receive())
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 201, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"id":1}'})
+
+    middleware = IdempotencyMiddleware(app)
+
+    async def request():
+        sent = []
+        scope = {
+            "type": "http", "method": "POST", "path": "/auth/signup", "query_string": b"",
+            "headers": [(b"idempotency-key", b"dup")], "client": ("10.0.0.1", 1234),
+        }
+
+        async def receive():
+            return {"type": "http.request", "body": b'{"username":"x"}', "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        await middleware(scope, receive, send)
+        return sent
+
+    async def duplicates():
+        return await asyncio.gather(*(request() for _ in range(3)))
+
+    results = asyncio.run(duplicates())
+
+    assert len(calls) == 1
+    assert [sent[0]["status"] for sent in results] == [201, 201, 201]
+    assert all(sent[1]["body"] == b'{"id":1}' for sent in results)
+    assert sum((b"idempotent-replayed", b"true") in sent[0]["headers"] for sent in results) == 2
@@ -0,0 +1,128 @@
+import pytest
+import sys
+import os
+import asyncio
+import json
+import threading
+from fastapi import status
+from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketDisconnect
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import live
+from app import booking as booking_engine
+from app.live import SeatFeed, Subscriber
+
+pytestmark = pytest.mark.movies
+
+@pytest.fixture(autouse=True)
+def instant_feed(monkeypatch):
+    monkeypatch.setattr(live.feed, "coalesce", 0)
+    return live.feed
+
+def test_subscriber_keeps_only_the_latest_count_per_movie():
+    subscriber = Subscriber([1, 2], {1: 100, 2: 50})
+    for seats in (98, 95, 90):
+        subscriber.offer(1, seats)
+    subscriber.offer(2, 50)
+
+    updates = asyncio.run(subscriber.next_updates(1))
+
+    assert updates == [{"movie_id": 1, "available_seats": 90, "delta": -10}]
+    assert asyncio.run(subscriber.next_updates(0.01)) == []
+
+def test_feed_coalesces_publishes_from_other_threads():
+    feed = SeatFeed(coalesce=0.02, max_subscribers=10)
+
+    async def watch():
+        watcher, bystander = Subscriber([1], {1: 10}), Subscriber([2], {2: 10})
+        feed.subscribe(watcher)
+        feed.subscribe(bystander)
+        threads = [threading.Thread(target=feed.publish, args=(1, seats)) for seats in (9, 8, 7)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+        updates = await watcher.next_updates(1)
+        quiet = await bystander.next_updates(0.05)
+        feed.unsubscribe(watcher)
+        feed.unsubscribe(bystander)
+        return updates, quiet
+
+    updates, quiet = asyncio.run(watch())
+
+    assert updates == [{"movie_id": 1, "available_seats": 7, "delta": -3}]
+    assert quiet == []
+    assert feed.subscribers == 0
+    assert not feed.watching(1)
+
+def test_committed_bookings_are_published_and_rollbacks_are_not(db_engine, db_session, test_user, test_movie):
+    async def watch():
+        subscriber = Subscriber([test_movie.id], {test_movie.id: 100})
+        live.feed.subscribe(subscriber)
+        try:
+            with Session(bind=db_engine) as other:
+                live.stage(other, test_movie.id, 1)
+                other.rollback()
+                other.commit()
+            booking_engine.book_seats(db_session, test_user.id, test_movie.id, 2)
+            return await subscriber.next_updates(1)
+        finally:
+            live.feed.unsubscribe(subscriber)
+
+    updates = asyncio.run(watch())
+
+    assert updates == [{"movie_id": test_movie.id, "available_seats": 98, "delta": -2}]
+
+def test_unwatched_movies_stage_nothing(db_session, test_user, test_movie):
+    booking_engine.book_seats(db_session, test_user.id, test_movie.id, 1)
+
+    assert live.STAGED_KEY not in db_session.info
+
+def test_sse_stream_sends_snapshot_then_deltas(test_movie):
+    async def read():
+        stream = live.sse([test_movie.id], {test_movie.id: 100})
+        snapshot = await stream.__anext__()
+        live.feed.publish(test_movie.id, 97)
+        update = await stream.__anext__()
+        await stream.aclose()
+        return snapshot, update
+
+    snapshot, update = asyncio.run(read())
+
+    assert snapshot.startswith(b"event: snapshot\ndata: ")
+    assert json.loads(snapshot.split(b"data: ")[1]) == [{"movie_id": test_movie.id, "available_seats": 100}]
+    assert update == b'event: seats\ndata: {"movie_id":%d,"available_seats":97,"delta":-3}\n\n' % test_movie.id
+    assert live.feed.subscribers == 0
+
+def test_websocket_pushes_bookings(authenticated_client, test_movie):
+    with authenticated_client.websocket_connect(f"/movies/live/ws?movie_id={test_movie.id}") as websocket:
+        snapshot = websocket.receive_json()
+        authenticated_client.post(f"/movies/{test_movie.id}/book", json={"seats": 3})
+        update = websocket.receive_json()
+
+    assert snapshot == {"event": "snapshot", "data": [{"movie_id": test_movie.id, "available_seats": 100}]}
+    assert update == {"event": "seats", "data": [{"movie_id": test_movie.id, "available_seats": 97, "delta": -3}]}
+
+def test_websocket_without_movies_follows_new_ones(authenticated_client, admin_token):
+    with authenticated_client.websocket_connect("/movies/live/ws") as websocket:
+        assert websocket.receive_json() == {"event": "snapshot", "data": []}
+        created = authenticated_client.post("/admin/movies", cookies={"access_token": admin_token}, json={
+            "title": "Premiere", "showtime": "2030-01-01T20:00:00Z", "available_seats": 80
+        }).json()
+        update = websocket.receive_json()
+
+    assert update["data"] == [{"movie_id": created["id"], "available_seats": 80, "delta": None}]
+
+def test_websocket_requires_authentication(client, test_movie):
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect(f"/movies/live/ws?movie_id={test_movie.id}") as websocket:
+            websocket.receive_json()
+
+def test_subscribers_beyond_the_limit_are_refused(authenticated_client, monkeypatch):
+    monkeypatch.setattr(live.feed, "max_subscribers", 0)
+
+    response = authenticated_client.get("/movies/live")
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "5"
@@ -0,0 +1,94 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import instrumentation
+from app.config import settings
+from app.metrics import Registry
+
+pytestmark = pytest.mark.unit
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    hits = registry.counter("hits_total", "Hits", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    hits.inc(route="/movies")
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    text = registry.render()
+
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{route="/movies"} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+def test_metrics_endpoint_reports_route_latency(authenticated_client, test_movie):
+    before = instrumentation.request_seconds.count(method="GET", route="/movies")
+    authenticated_client.get("/movies")
+
+    response = authenticated_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert instrumentation.request_seconds.count(method="GET", route="/movies") == before + 1
+    assert 'http_requests_total{method="GET",route="/movies",status="200"}' in response.text
+    assert "http_request_db_queries_bucket" in response.text
+
+def test_route_label_uses_path_template(authenticated_client, test_movie):
+    authenticated_client.get(f"/movies/{test_movie.id}/seats")
+
+    text = authenticated_client.get("/metrics").text
+    assert 'route="/movies/{movie_id}/seats"' in text
+    assert f'route="/movies/{test_movie.id}/seats"' not in text
+
+def test_sql_statements_counted_per_request(db_engine):
+    stats = instrumentation.RequestStats()
+    token = instrumentation._current.set(stats)
+    try:
+        with db_engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+            conn.exec_driver_sql("SELECT 2")
+    finally:
+        instrumentation._current.reset(token)
+
+    assert stats.queries == 2
+    assert stats.db_seconds > 0
+
+def test_server_timing_header_only_in_debug(authenticated_client, test_movie, monkeypatch):
+    assert "server-timing" not in authenticated_client.get("/movies").headers
+
+    monkeypatch.setattr(settings, "DEBUG", True)
+    response = authenticated_client.get("/movies")
+
+    timing = response.headers["server-timing"]
+    assert timing.startswith("app;dur=")
+    assert 'db;dur=' in timing and 'queries"' in timing
+
+def test_handler_and_serialization_phases_are_timed(authenticated_client, test_movie, monkeypatch):
+    monkeypatch.setattr(settings, "DEBUG", True)
+
+    timing = authenticated_client.get("/movies").headers["server-timing"]
+
+    assert "handler;dur=" in timing
+    assert "serialization;dur=" in timing
+    exposition = authenticated_client.get("/metrics").text
+    assert 'http_request_phase_seconds_count{phase="handler"}' in exposition
+    assert 'http_request_phase_seconds_count{phase="serialization"}' in exposition
+
+def test_phase_records_into_current_request():
+    stats = instrumentation.RequestStats()
+    token = instrumentation._current.set(stats)
+    try:
+        with instrumentation.phase("jwt"):
+            pass
+        with instrumentation.phase("jwt"):
+            pass
+    finally:
+        instrumentation._current.reset(token)
+
+    assert "jwt" in stats.phases
+    assert instrumentation.server_timing(stats, 0.01).endswith(f"jwt;dur={stats.phases['jwt'] * 1000:.2f}")
@@ -0,0 +1,86 @@
+import pytest
+import sys
+import os
+from sqlalchemy import create_engine, inspect, text
+
+pytest.importorskip("alembic")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from app import migrations
+from app.database import Base
+
+pytestmark = pytest.mark.main
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'migrations.db'}"
+
+def schema_diff(url):
+    engine = create_engine(url)
+    try:
+        with engine.connect() as connection:
+            return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    finally:
+        engine.dispose()
+
+def test_migrations_build_the_same_schema_as_the_models(database_url):
+    migrations.upgrade(database_url)
+
+    assert migrations.current(database_url) == "0009"
+    assert schema_diff(database_url) == []
+
+def test_migrations_downgrade_cleanly(database_url):
+    migrations.upgrade(database_url)
+    migrations.downgrade(database_url, "0001")
+
+    engine = create_engine(database_url)
+    indexes = {index["name"] for index in inspect(engine).get_indexes("bookings")}
+    engine.dispose()
+    assert "ix_bookings_movie_id" not in indexes
+    assert "ix_bookings_user_id_booking_time" not in indexes
+    assert migrations.current(database_url) == "0001"
+
+    migrations.downgrade(database_url, "base")
+    assert migrations.current(database_url) is None
+
+def test_create_all_databases_can_be_adopted(database_url):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    migrations.stamp(database_url, "head")
+
+    assert migrations.current(database_url) == "0009"
+    assert schema_diff(database_url) == []
+
+def test_original_schema_databases_can_be_adopted(database_url):
+    # users, movies and bookings exactly as the first release's create_all
+    # left them: build 0001, then forget that migrations ran
+    migrations.upgrade(database_url, "0001")
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text("INSERT INTO users (id, username, password) VALUES (1, 'early', 'x')"))
+    engine.dispose()
+
+    migrations.stamp(database_url, "0001")
+    migrations.upgrade(database_url)
+
+    assert migrations.current(database_url) == "0009"
+    assert schema_diff(database_url) == []
+
+def test_upgrades_skip_tables_an_earlier_baseline_created(database_url):
+    # Before 0005-0007 existed, 0001 also built the seat, hold and
+    # idempotency tables and the history index
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    migrations.stamp(database_url, "0004")
+
+    migrations.upgrade(database_url)
+
+    assert migrations.current(database_url) == "0009"
+    assert schema_diff(database_url) == []
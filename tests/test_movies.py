@@ -48,3 +48,107 @@ def test_create_movie_as_user(client, movie_data, user_token):
         cookies={"access_token": user_token}
     )
     assert response.status_code == status.HTTP_403_FORBIDDEN
+
+@pytest.fixture
+def many_movies(db_session):
+    from app.models import Movie
+    base = datetime(2030, 1, 1, 18, 0)
+    movies = [
+        Movie(title=f"Feature {i}", showtime=base + timedelta(hours=i), available_seats=i % 3)
+        for i in range(7)
+    ]
+    db_session.add_all(movies)
+    db_session.commit()
+    return movies
+
+def test_get_movies_keyset_pagination(authenticated_client, many_movies):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = authenticated_client.get("/movies", params=params)
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) <= 3
+        seen.extend(movie["title"] for movie in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [f"Feature {i}" for i in range(7)]
+
+def test_get_movies_filters(authenticated_client, many_movies):
+    response = authenticated_client.get("/movies", params={
+        "title": "Feature",
+        "starts_after": "2030-01-01T20:00:00",
+        "has_seats": True
+    })
+    titles = [movie["title"] for movie in response.json()]
+    assert titles == ["Feature 2", "Feature 4", "Feature 5"]
+
+def test_get_movies_invalid_cursor(authenticated_client):
+    response = authenticated_client.get("/movies", params={"cursor": "not-a-cursor"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+def test_get_movies_not_modified(authenticated_client, test_movie):
+    response = authenticated_client.get("/movies")
+    etag = response.headers["ETag"]
+
+    response = authenticated_client.get("/movies", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+def test_booking_invalidates_movie_catalogue(authenticated_client, test_movie):
+    etag = authenticated_client.get("/movies").headers["ETag"]
+
+    authenticated_client.post(f"/movies/{test_movie.id}/book", json={"seats": 3})
+
+    response = authenticated_client.get("/movies", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["available_seats"] == 97
+
+@pytest.mark.api
+def test_bulk_import_ndjson(admin_client):
+    body = "\n".join([
+        '{"title": "Bulk A", "showtime": "2030-02-01T18:00:00", "available_seats": 50}',
+        '{"title": "Bulk B", "showtime": "not a date", "available_seats": 50}',
+        '{not json',
+        '{"title": "Bulk C", "showtime": "2030-02-01T21:00:00", "available_seats": 80}',
+    ])
+    response = admin_client.post(
+        "/admin/movies/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+        params={"batch_size": 1}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    report = response.json()
+    assert report["inserted"] == 2
+    assert report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+
+    titles = [movie["title"] for movie in admin_client.get("/movies", params={"title": "Bulk"}).json()]
+    assert titles == ["Bulk A", "Bulk C"]
+
+def test_bulk_import_csv(admin_client):
+    body = "title,showtime,available_seats\nBulk CSV,2030-03-01T18:00:00,120\nBroken,2030-03-01T19:00:00,lots\n"
+    response = admin_client.post("/admin/movies/bulk", content=body, headers={"Content-Type": "text/csv"})
+    assert response.json()["inserted"] == 1
+    assert response.json()["errors"][0]["row"] == 3
+
+def test_bulk_import_reports_invalid_utf8_rows(admin_client):
+    body = (
+        b'{"title": "Bulk \xff", "showtime": "2030-04-01T18:00:00", "available_seats": 10}\n'
+        b'{"title": "Bulk UTF-8", "showtime": "2030-04-01T19:00:00", "available_seats": 10}\n'
+    )
+    response = admin_client.post("/admin/movies/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["inserted"] == 1
+    assert response.json()["errors"][0]["row"] == 1
+    assert response.json()["errors"][0]["error"].startswith("Invalid UTF-8")
+
+def test_bulk_import_as_user(client, user_token):
+    client.cookies.set("access_token", user_token)
+    response = client.post("/admin/movies/bulk", content="", headers={"Content-Type": "text/csv"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,90 @@
+import pytest
+import sys
+import os
+import threading
+from fastapi import HTTPException, status
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import passwords
+from app.config import settings
+from app.models import User
+
+pytestmark = pytest.mark.auth
+
+@pytest.fixture
+def cheap_cost(monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_SCRYPT_N", 1024)
+    monkeypatch.setattr(settings, "PASSWORD_PBKDF2_ITERATIONS", 1000)
+
+def test_scrypt_hash_round_trip(cheap_cost):
+    hashed = passwords.hash_password("s3cret")
+
+    assert hashed.startswith("scrypt$1024$8$1$")
+    assert "s3cret" not in hashed
+    assert passwords.verify("s3cret", hashed)
+    assert not passwords.verify("wrong", hashed)
+    assert hashed != passwords.hash_password("s3cret")
+
+def test_pbkdf2_scheme(cheap_cost, monkeypatch):
+    monkeypatch.setattr(settings, "PASSWORD_HASH_SCHEME", "pbkdf2_sha256")
+    hashed = passwords.hash_password("s3cret")
+
+    assert hashed.startswith("pbkdf2_sha256$1000$")
+    assert passwords.verify("s3cret", hashed)
+
+def test_needs_rehash_for_plaintext_and_old_cost(cheap_cost, monkeypatch):
+    hashed = passwords.hash_password("s3cret")
+    assert passwords.needs_rehash("s3cret")
+    assert not passwords.needs_rehash(hashed)
+
+    monkeypatch.setattr(settings, "PASSWORD_SCRYPT_N", 2048)
+    assert passwords.needs_rehash(hashed)
+    # old hashes keep verifying with the parameters they were made with
+    assert passwords.verify("s3cret", hashed)
+
+def test_signup_stores_hash(client, db_session, cheap_cost):
+    response = client.post("/auth/signup", json={"username": "hashed", "password": "newpass123"})
+    assert response.status_code == status.HTTP_201_CREATED
+
+    user = db_session.query(User).filter(User.username == "hashed").one()
+    assert user.password.startswith("scrypt$")
+    assert passwords.verify("newpass123", user.password)
+
+def test_login_rehashes_legacy_plaintext(client, db_session, test_user, cheap_cost):
+    assert test_user.password == "testpass123"
+
+    response = client.post("/auth/login", data={"username": "testuser", "password": "testpass123"})
+    assert response.status_code == status.HTTP_200_OK
+
+    db_session.refresh(test_user)
+    assert test_user.password.startswith("scrypt$1024$")
+    response = client.post("/auth/login", data={"username": "testuser", "password": "testpass123"})
+    assert response.status_code == status.HTTP_200_OK
+
+@pytest.mark.parametrize("stored", ["scrypt$", "scrypt$x", "scrypt$1024$8$1$!!$!!", "pbkdf2_sha256$1000$c2FsdA==$%%"])
+def test_malformed_hashes_fail_to_verify(stored):
+    assert passwords.verify("anything", stored) is False
+
+def test_login_with_malformed_hash_is_refused(client, db_session, test_user):
+    test_user.password = "scrypt$not-a-hash"
+    db_session.commit()
+
+    response = client.post("/auth/login", data={"username": "testuser", "password": "scrypt$not-a-hash"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_pool_rejects_when_queue_is_full():
+    pool = passwords.HashPool(workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        blocked = pool._submit(release.wait)
+        with pytest.raises(HTTPException) as exc:
+            pool.call(len, "x")
+        assert exc.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert exc.value.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+    blocked.result()
+    assert pool.call(len, "x") == 1
+    assert pool.pending == 0
+    pool.shutdown()
@@ -0,0 +1,116 @@
+import pytest
+import sys
+import os
+import time
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import profiling
+from app.config import settings
+
+pytestmark = pytest.mark.unit
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_collapse_orders_frames_root_to_leaf():
+    def inner():
+        return profiling.collapse(sys._getframe())
+
+    stack = inner()
+    frames = stack.split(";")
+    assert frames[-1].endswith("test_collapse_orders_frames_root_to_leaf.<locals>.inner")
+    assert frames[-2].endswith(":test_collapse_orders_frames_root_to_leaf")
+
+def test_session_samples_busy_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    session = profiling.Session(interval=0.001)
+    session.start()
+    time.sleep(0.1)
+    profile = session.stop()
+    stop.set()
+    worker.join()
+
+    assert profile.samples > 0
+    assert any("busy_loop" in line for line in profile.collapsed().splitlines())
+    # idle threads, like this one sleeping, never show up
+    assert all(not line.split(";")[-1].startswith("threading:") for line in profile.stacks)
+
+def test_route_session_only_samples_while_route_in_flight():
+    session = profiling.Session(interval=0.001, routes=["/movies/{movie_id}/book"])
+    session.start()
+    time.sleep(0.05)
+    profile = session.stop()
+
+    assert profile.samples == 0
+    assert session.wants("/movies/{movie_id}/book")
+    assert not session.wants("/movies")
+
+def test_profiling_disabled_by_default(admin_client):
+    response = admin_client.post("/admin/profiling/sample", json={"seconds": 0.1})
+    assert response.status_code == 404
+
+def test_profiling_requires_admin(authenticated_client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    response = authenticated_client.post("/admin/profiling/sample", json={"seconds": 0.1})
+    assert response.status_code == 403
+
+def test_profile_returns_collapsed_stacks(admin_client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    try:
+        response = admin_client.post("/admin/profiling/sample", json={"seconds": 0.2, "interval_ms": 1})
+    finally:
+        stop.set()
+        worker.join()
+
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+    line = next(line for line in response.text.splitlines() if "busy_loop" in line)
+    stack, count = line.rsplit(" ", 1)
+    assert int(count) > 0
+
+def test_slow_query_log_records_statements_over_threshold(monkeypatch):
+    log = profiling.SlowQueryLog(maxlen=2)
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 50)
+
+    log.record("SELECT 1", (), 0.01)
+    log.record("SELECT 2", ("x" * 500,), 0.2)
+    log.record("INSERT", [(1,), (2,), (3,)], 0.3, executemany=True)
+    log.record("SELECT 3", (), 0.4)
+
+    entries = log.entries()
+    assert [entry.statement for entry in entries] == ["INSERT", "SELECT 3"]
+    assert "'rows': 3" in entries[0].parameters
+    assert entries[0].duration_ms == 300.0
+
+def test_slow_query_endpoint(admin_client, monkeypatch):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0.000001)
+    profiling.slow_queries.clear()
+    admin_client.get("/movies")
+
+    response = admin_client.get("/admin/profiling/slow-queries", params={"clear": True})
+
+    assert response.status_code == 200
+    assert any("FROM movies" in entry["statement"] for entry in response.json())
+    assert profiling.slow_queries.entries() == []
+
+def test_middleware_marks_requests_on_profiled_routes(admin_client, test_movie):
+    session = profiling.Session(interval=0.0005, routes=["/movies"])
+    profiling.profiler.session = session
+    session.start()
+    try:
+        for _ in range(30):
+            admin_client.get("/movies")
+    finally:
+        profiling.profiler.session = None
+        profile = session.stop()
+
+    assert session.active_requests == 0
+    assert profile.samples > 0
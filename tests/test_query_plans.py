@@ -0,0 +1,51 @@
+import pytest
+import sys
+import os
+from sqlalchemy import event, func, select
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import history, catalogue
+from app.catalogue import MovieQuery
+from app.models import Booking
+
+# The test database is SQLite; these read its EXPLAIN QUERY PLAN output
+pytestmark = pytest.mark.main
+
+def query_plans(db, run):
+    """EXPLAIN QUERY PLAN for every statement `run` executes on `db`."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    bind = db.get_bind()
+    event.listen(bind, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(bind, "before_cursor_execute", capture)
+    connection = db.connection()
+    return [
+        " | ".join(row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters))
+        for statement, parameters in statements
+    ]
+
+def test_history_pages_use_the_user_booking_time_index(db_session, test_booking):
+    plans = query_plans(db_session, lambda: history.fetch_page(db_session, test_booking.user_id, limit=20))
+
+    assert plans and all("USING INDEX ix_bookings_user_id_booking_time" in plan for plan in plans), plans
+    assert not any("TEMP B-TREE" in plan for plan in plans), plans
+
+def test_catalogue_pages_use_the_showtime_index(db_session, test_movie):
+    query = MovieQuery(limit=20, starts_after=test_movie.showtime)
+    plans = query_plans(db_session, lambda: catalogue.fetch_movies(db_session, query))
+
+    assert plans and all("USING INDEX ix_movies_showtime_id" in plan for plan in plans), plans
+    assert not any("TEMP B-TREE" in plan for plan in plans), plans
+
+def test_per_movie_booking_lookups_use_the_movie_index(db_session, test_booking):
+    stmt = select(func.sum(Booking.seats)).where(Booking.movie_id == test_booking.movie_id)
+    plans = query_plans(db_session, lambda: db_session.execute(stmt))
+
+    assert plans and all("ix_bookings_movie_id" in plan for plan in plans), plans
@@ -0,0 +1,103 @@
+import pytest
+import sys
+import os
+import asyncio
+from fastapi import status
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import ratelimit
+from app.config import settings
+from app.database import get_db
+from app.main import app
+
+pytestmark = pytest.mark.auth
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class StandInRedis:
+    """Records eval calls and answers with a fixed wait, like a Redis client would."""
+
+    def __init__(self, wait_ms=0):
+        self.wait_ms = wait_ms
+        self.calls = []
+
+    async def eval(self, script, numkeys, *args):
+        self.calls.append((numkeys, args))
+        return self.wait_ms
+
+def take(store, key, rate="3/3"):
+    return asyncio.run(store.take(key, *ratelimit.parse_rate(rate)))
+
+def test_parse_rate():
+    assert ratelimit.parse_rate("20/60") == (20, 20 / 60)
+
+def test_memory_bucket_bursts_then_refills():
+    clock = FakeClock()
+    store = ratelimit.MemoryStore(max_keys=100, clock=clock)
+
+    assert [take(store, "ip:1") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert take(store, "ip:1") == pytest.approx(1.0)
+    assert take(store, "ip:2") == 0.0
+
+    clock.now += 1.0
+    assert take(store, "ip:1") == 0.0
+    assert take(store, "ip:1") > 0
+
+def test_memory_store_evicts_least_recent_keys():
+    store = ratelimit.MemoryStore(max_keys=8, shards=2)
+    for i in range(100):
+        take(store, f"ip:{i}")
+    assert len(store) <= 8
+
+def test_redis_store_runs_one_script_per_check():
+    client = StandInRedis(wait_ms=1500)
+    store = ratelimit.RedisStore(client=client)
+
+    assert take(store, "login_ip:1.2.3.4", "20/60") == 1.5
+    numkeys, args = client.calls[0]
+    assert numkeys == 1
+    assert args[:3] == ("ratelimit:login_ip:1.2.3.4", 20, 20 / 60)
+
+def test_login_throttled_per_username_before_db(client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_PER_USERNAME", "2/60")
+    opened = []
+    session_override = app.dependency_overrides[get_db]
+
+    def counting_get_db():
+        opened.append(True)
+        return session_override()
+    app.dependency_overrides[get_db] = counting_get_db
+
+    for _ in range(2):
+        response = client.post("/auth/login", data={"username": "testuser", "password": "wrong"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    sessions_before = len(opened)
+
+    response = client.post("/auth/login", data={"username": "TestUser", "password": "testpass123"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["retry-after"]) >= 1
+    assert len(opened) == sessions_before
+
+    # other usernames from the same client are unaffected
+    response = client.post("/auth/login", data={"username": "someoneelse", "password": "x"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+def test_signup_throttled_per_ip(client, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_SIGNUP_PER_IP", "1/60")
+    assert client.post("/auth/signup", json={"username": "first", "password": "pass1234"}).status_code == 201
+
+    response = client.post("/auth/signup", json={"username": "second", "password": "pass1234"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+def test_rate_limits_can_be_disabled(client, test_user, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_PER_USERNAME", "1/60")
+    for _ in range(3):
+        response = client.post("/auth/login", data={"username": "testuser", "password": "wrong"})
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,121 @@
+import pytest
+import sys
+import os
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database
+from app.config import settings
+from app.database import ReplicaSet
+
+pytestmark = pytest.mark.main
+
+def sqlite_url(path) -> str:
+    return f"sqlite:///{path}"
+
+@pytest.fixture
+def routed_app(tmp_path, monkeypatch):
+    """A primary and two replica SQLite files, each labelled with its name."""
+    urls = {}
+    for name in ("primary", "replica0", "replica1"):
+        urls[name] = sqlite_url(tmp_path / f"{name}.db")
+        engine = create_engine(urls[name])
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE whoami (name TEXT)"))
+            connection.execute(text("INSERT INTO whoami VALUES (:name)"), {"name": name})
+        engine.dispose()
+
+    replicas = ReplicaSet([urls["replica0"], urls["replica1"]], interval=60)
+    monkeypatch.setattr(database, "replicas", replicas)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=create_engine(urls["primary"])))
+
+    app = FastAPI()
+
+    def whoami(db):
+        return db.execute(text("SELECT name FROM whoami")).scalar_one()
+
+    @app.post("/write")
+    def write(db=Depends(database.get_db)):
+        db.execute(text("CREATE TABLE IF NOT EXISTS writes (id INTEGER)"))
+        db.commit()
+        return whoami(db)
+
+    @app.post("/failed-write")
+    def failed_write(db=Depends(database.get_db)):
+        db.execute(text("CREATE TABLE IF NOT EXISTS writes (id INTEGER)"))
+        raise HTTPException(status_code=409)
+
+    @app.get("/primary")
+    def primary(db=Depends(database.get_db)):
+        return whoami(db)
+
+    @app.get("/read")
+    def read(db=Depends(database.get_read_db)):
+        return whoami(db)
+
+    with TestClient(app) as client:
+        yield client, replicas
+    for replica in replicas.replicas:
+        replica.engine.dispose()
+
+def test_reads_round_robin_over_replicas(routed_app):
+    client, _ = routed_app
+
+    assert [client.get("/read").json() for _ in range(4)] == ["replica0", "replica1", "replica0", "replica1"]
+
+def test_writes_pin_reads_to_the_primary(routed_app):
+    client, _ = routed_app
+
+    assert client.post("/write").json() == "primary"
+    assert client.get("/read").json() == "primary"
+
+    client.cookies.set(database.PIN_COOKIE, "0")
+    assert client.get("/read").json().startswith("replica")
+
+def test_only_committed_writes_pin(routed_app):
+    client, _ = routed_app
+
+    assert client.post("/failed-write").status_code == 409
+    assert client.get("/primary").json() == "primary"
+
+    assert database.PIN_COOKIE not in client.cookies
+    assert client.get("/read").json().startswith("replica")
+
+def test_pin_lasts_the_configured_window(routed_app, monkeypatch):
+    client, _ = routed_app
+    monkeypatch.setattr(settings, "DB_REPLICA_PIN_SECONDS", 30)
+
+    response = client.post("/write")
+
+    assert "max-age=30" in response.headers["set-cookie"].lower()
+
+def test_unhealthy_replicas_are_skipped(routed_app, tmp_path):
+    client, replicas = routed_app
+    broken = replicas.replicas[1]
+    broken.engine.dispose()
+    broken.engine = create_engine(sqlite_url(tmp_path / "missing" / "replica1.db"))
+
+    replicas.check()
+
+    assert not broken.healthy
+    assert [client.get("/read").json() for _ in range(3)] == ["replica0"] * 3
+
+def test_reads_fall_back_to_the_primary_without_healthy_replicas(routed_app):
+    client, replicas = routed_app
+    for replica in replicas.replicas:
+        replica.mark(False)
+
+    assert client.get("/read").json() == "primary"
+
+    replicas.check()
+    assert client.get("/read").json().startswith("replica")
+
+def test_no_replicas_means_no_pin_cookie(client):
+    response = client.get("/")
+
+    assert database.read_db is database.get_db
+    assert database.PIN_COOKIE not in response.cookies
@@ -0,0 +1,114 @@
+import pytest
+import sys
+import os
+from fastapi import status
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.seatmap import Occupancy, best_adjacent, mask_labels, render, row_label, seats_mask
+
+pytestmark = pytest.mark.bookings
+
+def occupancy(rows, seats_per_row, taken=()):
+    empty = Occupancy(rows=rows, seats_per_row=seats_per_row, bits=0, version=0)
+    return Occupancy(rows=rows, seats_per_row=seats_per_row, bits=seats_mask(empty, taken), version=0)
+
+@pytest.mark.unit
+def test_row_labels():
+    assert [row_label(r) for r in (0, 25, 26, 27)] == ["A", "Z", "AA", "AB"]
+
+@pytest.mark.unit
+def test_render_marks_taken_seats():
+    assert render(occupancy(2, 4, ["A1", "B3"])) == ["X...", "..X."]
+
+@pytest.mark.unit
+def test_best_adjacent_prefers_middle():
+    seats = occupancy(3, 6, ["B3"])
+    assert mask_labels(seats, best_adjacent(seats, 2)) == ["B4", "B5"]
+    assert mask_labels(seats, best_adjacent(seats, 3)) == ["B4", "B5", "B6"]
+    assert mask_labels(seats, best_adjacent(seats, 4)) == ["A2", "A3", "A4", "A5"]
+    assert best_adjacent(seats, 7) is None
+
+@pytest.fixture
+def seated_movie(admin_client, test_movie):
+    response = admin_client.post(f"/admin/movies/{test_movie.id}/seatmap", json={"rows": 3, "seats_per_row": 4})
+    assert response.status_code == status.HTTP_201_CREATED
+    return test_movie
+
+def test_book_specific_seats(authenticated_client, seated_movie):
+    response = authenticated_client.post(f"/movies/{seated_movie.id}/seats/book", json={"seats": ["B2", "B3"]})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["seats"] == 2
+    assert response.json()["seat_labels"] == ["B2", "B3"]
+
+    response = authenticated_client.post(f"/movies/{seated_movie.id}/seats/book", json={"seats": ["B3", "B4"]})
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert "B3" in response.json()["detail"]
+
+    seats = authenticated_client.get(f"/movies/{seated_movie.id}/seats").json()
+    assert seats["layout"] == ["....", ".XX.", "...."]
+    assert seats["available"] == 10
+
+def test_count_booking_assigns_adjacent_seats(authenticated_client, seated_movie):
+    response = authenticated_client.post(f"/movies/{seated_movie.id}/book", json={"seats": 3})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["seat_labels"] == ["B1", "B2", "B3"]
+    assert authenticated_client.get("/movies/history").json()[0]["seat_labels"] == ["B1", "B2", "B3"]
+
+    seats = authenticated_client.get(f"/movies/{seated_movie.id}/seats").json()
+    assert seats["layout"] == ["....", "XXX.", "...."]
+    assert authenticated_client.get("/movies").json()[0]["available_seats"] == 9
+
+def test_best_seats(authenticated_client, seated_movie):
+    response = authenticated_client.get(f"/movies/{seated_movie.id}/seats/best", params={"count": 4})
+    assert response.json() == {"seats": ["B1", "B2", "B3", "B4"]}
+
+def test_unknown_seat(authenticated_client, seated_movie):
+    response = authenticated_client.post(f"/movies/{seated_movie.id}/seats/book", json={"seats": ["Z9"]})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.slow
+def test_concurrent_seat_selection_is_atomic(tmp_path):
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime
+    from fastapi import HTTPException
+    from sqlalchemy import create_engine, func, select
+    from sqlalchemy.orm import sessionmaker
+    from app import booking, models, schemas, seatmap
+    from app.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'seats.db'}",
+                           connect_args={"check_same_thread": False, "timeout": 60})
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with Session() as db:
+        user = models.User(username="buyer", password="x")
+        movie = models.Movie(title="Seated", showtime=datetime(2030, 1, 1), available_seats=0)
+        db.add_all([user, movie])
+        db.commit()
+        user_id, movie_id = user.id, movie.id
+        seatmap.create(db, movie_id, schemas.SeatMapCreate(rows=4, seats_per_row=5))
+
+    labels = [f"{row}{seat}" for row in "ABCD" for seat in range(1, 6)]
+
+    def attempt(i):
+        picks = random.Random(i).sample(labels, 2)
+        with Session() as db:
+            try:
+                booking.book_specific_seats(db, user_id, movie_id, picks)
+                return 2
+            except HTTPException:
+                return 0
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        booked = sum(pool.map(attempt, range(100)))
+
+    with Session() as db:
+        occupancy = seatmap.load(db, movie_id)
+        sold = db.execute(select(func.sum(models.Booking.seats))).scalar_one()
+        remaining = db.get(models.Movie, movie_id).available_seats
+    engine.dispose()
+
+    assert sold == booked == 20 - occupancy.available()
+    assert remaining == occupancy.available()
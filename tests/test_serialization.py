@@ -0,0 +1,51 @@
+import pytest
+import sys
+import os
+from datetime import datetime, timezone
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import TypeAdapter
+from app import serialization, schemas
+from app.main import app
+
+pytestmark = pytest.mark.unit
+
+MOVIES = [
+    ("Café \"Night\"", datetime(2030, 1, 1, 20, 0), 120, 1),
+    ("Matinee", datetime(2030, 1, 2, 14, 30, 0, 250000), 0, 2),
+    ("Premiere", datetime(2030, 1, 3, 21, 0, tzinfo=timezone.utc), 5, 3),
+]
+
+def pydantic_json(rows, schema):
+    names = serialization.fields(schema)
+    adapter = TypeAdapter(List[schema])
+    return adapter.dump_json(adapter.validate_python([dict(zip(names, row)) for row in rows]))
+
+def test_rows_json_matches_pydantic_output():
+    names = serialization.fields(schemas.Movie)
+    assert serialization.rows_json(MOVIES, names) == pydantic_json(MOVIES, schemas.Movie)
+
+def test_stdlib_fallback_matches_pydantic_output(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    names = serialization.fields(schemas.Movie)
+    assert serialization.rows_json(MOVIES, names) == pydantic_json(MOVIES, schemas.Movie)
+
+def test_history_page_matches_schema(authenticated_client, test_booking):
+    response = authenticated_client.get("/movies/history")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    [booking] = response.json()
+    assert list(booking) == list(schemas.Booking.model_fields)
+    assert schemas.Booking.model_validate(booking).id == test_booking.id
+
+def test_openapi_still_documents_response_models():
+    paths = app.openapi()["paths"]
+
+    def response_schema(path):
+        return paths[path]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+
+    assert response_schema("/movies")["items"]["$ref"].endswith("/Movie")
+    assert response_schema("/movies/history")["items"]["$ref"].endswith("/Booking")
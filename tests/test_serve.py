@@ -0,0 +1,67 @@
+import pytest
+import sys
+import os
+import re
+import signal
+import subprocess
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import database, migrations, serve
+from app.config import settings
+
+pytestmark = pytest.mark.main
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def test_worker_count_defaults_to_usable_cpus():
+    assert serve.worker_count(3) == 3
+    assert serve.worker_count(0) >= 1
+
+def test_schema_is_set_up_once_before_forking(monkeypatch):
+    calls = []
+    monkeypatch.setattr(migrations, "setup_schema", calls.append)
+    monkeypatch.setattr(settings, "DB_SCHEMA_SETUP", "migrate")
+
+    app = serve.prepare()
+
+    assert calls == [database.get_engine()]
+    assert settings.DB_SCHEMA_SETUP == "none"
+    assert app.title == "Movie Booking API"
+
+def wait_for(predicate, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.mark.slow
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_workers_are_replaced_and_drained(tmp_path):
+    url = f"sqlite:///{tmp_path / 'serve.db'}"
+    log_path = tmp_path / "serve.log"
+    env = dict(os.environ, DATABASE_URL=url, DB_SCHEMA_SETUP="migrate")
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", "0", "--workers", "2"],
+            cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+    try:
+        def workers():
+            return re.findall(r"Started server process \[(\d+)\]", log_path.read_text())
+
+        assert wait_for(lambda: log_path.read_text().count("Application startup complete") == 2)
+        os.kill(int(workers()[0]), signal.SIGKILL)
+        assert wait_for(lambda: len(workers()) == 3)
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+    assert migrations.current(url) == "0009"
+    assert "could not start" not in log_path.read_text()
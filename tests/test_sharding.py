@@ -0,0 +1,191 @@
+import pytest
+import sys
+import os
+import json
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from fastapi import status
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import models, sharding
+from app.batcher import BookingBatcher, BookingRequest
+from app.database import Base
+from app.sharding import ShardMap
+
+pytestmark = pytest.mark.movies
+
+@pytest.fixture
+def shards(tmp_path, db_session, monkeypatch):
+    """Two SQLite files as shards, with the test session as the primary."""
+    shard_map = ShardMap(
+        [f"sqlite:///{tmp_path / f'shard{index}.db'}" for index in range(2)],
+        session_factory=lambda: nullcontext(db_session)
+    )
+    for shard in shard_map:
+        Base.metadata.create_all(bind=shard.engine)
+    monkeypatch.setattr(sharding, "shards", shard_map)
+    yield shard_map
+    shard_map.shutdown()
+
+@pytest.fixture
+def movies(client, admin_token, shards):
+    start = datetime(2030, 1, 1, 18, 0)
+    client.cookies.set("access_token", admin_token)
+    created = [
+        client.post("/admin/movies", json={
+            "title": f"Showtime {i}", "showtime": (start + timedelta(hours=i)).isoformat(), "available_seats": 100
+        }).json()
+        for i in range(4)
+    ]
+    client.cookies.clear()
+    return created
+
+def book(client, token, movie_id, seats=1):
+    client.cookies.set("access_token", token)
+    return client.post(f"/movies/{movie_id}/book", json={"seats": seats})
+
+def count(shard, model, **criteria):
+    with shard.session() as db:
+        return db.execute(select(func.count()).select_from(model).filter_by(**criteria)).scalar()
+
+def test_movies_are_spread_over_shards_and_listed_in_order(client, user_token, db_session, shards, movies):
+    client.cookies.set("access_token", user_token)
+
+    first = client.get("/movies", params={"limit": 3})
+    rest = client.get("/movies", params={"limit": 3, "cursor": first.headers["x-next-cursor"]})
+
+    assert db_session.query(models.Movie).count() == 0
+    assert [count(shard, models.Movie) for shard in shards] == [2, 2]
+    assert [movie["id"] for movie in first.json() + rest.json()] == [movie["id"] for movie in movies]
+    assert "x-next-cursor" not in rest.headers
+
+def test_bookings_write_only_to_the_owning_shard(client, user_token, test_user, db_session, shards, movies):
+    movie_id = movies[0]["id"]
+    owner = shards[shards.place(movie_id)]
+
+    response = book(client, user_token, movie_id, seats=3)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert count(owner, models.Booking, movie_id=movie_id) == 1
+    with owner.session() as db:
+        assert db.get(models.Movie, movie_id).available_seats == 97
+    assert db_session.query(models.Booking).count() == 0
+    assert shards.user_shards(db_session, test_user.id) == [owner.index]
+
+def test_history_merges_shards_newest_first(client, user_token, shards, movies):
+    booked = [book(client, user_token, movie["id"]).json()["id"] for movie in movies]
+    client.cookies.set("access_token", user_token)
+
+    first = client.get("/movies/history", params={"limit": 3})
+    rest = client.get("/movies/history", params={"limit": 3, "cursor": first.headers["x-next-cursor"]})
+    export = client.get("/movies/history/export")
+
+    assert [booking["id"] for booking in first.json() + rest.json()] == booked[::-1]
+    assert [json.loads(line)["id"] for line in export.text.splitlines()] == booked[::-1]
+    assert len(set(booked)) == len(booked)
+
+def test_holds_are_found_on_their_shard(client, user_token, shards, movies):
+    client.cookies.set("access_token", user_token)
+    held = [client.post(f"/movies/{movie['id']}/holds", json={"seats": 2}).json() for movie in movies[:2]]
+
+    confirmed = client.post(f"/holds/{held[1]['id']}/confirm")
+    released = client.delete(f"/holds/{held[0]['id']}")
+
+    assert confirmed.status_code == status.HTTP_200_OK
+    assert confirmed.json()["movie_id"] == movies[1]["id"]
+    assert released.status_code == status.HTTP_204_NO_CONTENT
+    assert client.post("/holds/999999/confirm").status_code == status.HTTP_404_NOT_FOUND
+
+def test_batched_bookings_commit_per_shard(db_session, test_user, shards, movies):
+    batcher = BookingBatcher()
+    batch = [BookingRequest(test_user.id, movie["id"], 2) for movie in movies] + [
+        BookingRequest(test_user.id, movies[0]["id"], 500)
+    ]
+
+    outcomes = batcher._apply(batch)
+
+    assert [outcome.movie_id for outcome in outcomes[:4]] == [movie["id"] for movie in movies]
+    assert outcomes[4].status_code == status.HTTP_400_BAD_REQUEST
+    assert [count(shard, models.Booking) for shard in shards] == [2, 2]
+
+def test_moving_a_showtime_keeps_its_rows_and_ids(client, user_token, test_user, db_session, shards, movies):
+    movie_id = movies[0]["id"]
+    source = shards.place(movie_id)
+    target = 1 - source
+    booking = book(client, user_token, movie_id, seats=4).json()
+
+    moved = sharding.move_showtime(db_session, movie_id, target, settle=0)
+    after = book(client, user_token, movie_id, seats=1)
+    client.cookies.set("access_token", user_token)
+    history = client.get("/movies/history").json()
+
+    # Movie, booking and its hour of sales
+    assert moved == 3
+    assert count(shards[source], models.Movie, id=movie_id) == 0
+    assert count(shards[target], models.Booking, movie_id=movie_id) == 2
+    assert after.status_code == status.HTTP_200_OK
+    assert booking["id"] in [entry["id"] for entry in history]
+    assert target in shards.user_shards(db_session, test_user.id)
+
+def test_writes_wait_while_a_showtime_moves(client, user_token, db_session, shards, movies):
+    movie_id = movies[0]["id"]
+    db_session.get(models.MovieShard, movie_id).moving = True
+    db_session.commit()
+
+    response = book(client, user_token, movie_id)
+
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["retry-after"] == "1"
+
+def test_plan_rebalance_evens_out_bookings():
+    loads = {0: {1: 50, 2: 30, 3: 20}, 1: {4: 10}, 2: {}}
+    bookings = {1: 50, 2: 30, 3: 20, 4: 10}
+
+    moves = sharding.plan_rebalance(loads)
+
+    totals = {0: 100, 1: 10, 2: 0}
+    for movie_id, source, target in moves:
+        totals[source] -= bookings[movie_id]
+        totals[target] += bookings[movie_id]
+    assert moves == [(1, 0, 2), (3, 0, 1)]
+    assert totals == {0: 30, 1: 30, 2: 50}
+    assert sharding.plan_rebalance({0: {1: 10}, 1: {2: 10}}) == []
+
+def test_adopt_moves_primary_movies_to_shards(db_session, test_movie, test_booking, shards):
+    movie_id = test_movie.id
+
+    assert sharding.adopt(db_session) == 1
+
+    owner = shards[shards.place(movie_id)]
+    assert count(owner, models.Booking, movie_id=movie_id) == 1
+    assert db_session.query(models.Movie).count() == 0
+    assert db_session.get(models.MovieShard, movie_id).shard == owner.index
+
+def test_failed_shard_insert_leaves_no_directory_row(db_session, shards):
+    # Rows already holding the next four ids make every shard insert fail
+    next_id = shards.ids.take("movies")[0] + 1
+    for movie_id in range(next_id, next_id + 4):
+        with shards[shards.place(movie_id)].session() as shard_db:
+            shard_db.add(models.Movie(id=movie_id, title="Taken"))
+            shard_db.commit()
+    showtime = {"showtime": datetime(2030, 1, 1), "available_seats": 10}
+
+    with pytest.raises(IntegrityError):
+        sharding.create_movie(db_session, {"title": "Lost", **showtime})
+    with pytest.raises(IntegrityError):
+        sharding.insert_movies(db_session, [{"title": f"Lost {i}", **showtime} for i in range(3)])
+
+    assert db_session.query(models.MovieShard).count() == 0
+
+def test_unknown_movies_are_not_found(client, user_token, shards):
+    assert book(client, user_token, 999).status_code == status.HTTP_404_NOT_FOUND
+
+def test_top_users_are_summed_across_shards(client, user_token, test_user, db_session, shards, movies):
+    for movie in movies:
+        book(client, user_token, movie["id"], seats=2)
+
+    assert sharding.top_users(db_session, 5) == [(test_user.id, 4, 8)]
+    assert sum(row.seats for row in sharding.sales(db_session, None, None, None)) == 8
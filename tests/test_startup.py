@@ -0,0 +1,43 @@
+import pytest
+import sys
+import os
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytestmark = pytest.mark.main
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Cold import of app.main under -X importtime, which inflates every import.
+# Measured about 1,200 ms in total and 250 ms in app's own modules on one CPU
+IMPORT_BUDGET_MS = 2500
+APP_MODULES_BUDGET_MS = 500
+# Loaded on first use, never at import
+DEFERRED = ("jose", "cryptography", "alembic", "psycopg2", "asyncpg", "aiosqlite")
+
+def import_times(tmp_path):
+    """{module: (self ms, cumulative ms)} for a fresh `import app.main`."""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp_path / 'startup.db'}")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import app.main; from app import database; assert database._engine is None"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    times = {}
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if not line.startswith("import time:") or not fields[1].strip().isdigit():
+            continue
+        times[fields[2].strip()] = (int(fields[0].split(":")[1]) / 1000, int(fields[1]) / 1000)
+    return times
+
+@pytest.mark.slow
+def test_app_import_stays_within_budget(tmp_path):
+    times = import_times(tmp_path)
+
+    app_modules = sum(own for name, (own, _) in times.items() if name.startswith("app."))
+    assert times["app.main"][1] <= IMPORT_BUDGET_MS
+    assert app_modules <= APP_MODULES_BUDGET_MS
+    assert [name for name in times if name.split(".")[0] in DEFERRED] == []